@@ -0,0 +1,90 @@
+"""Compare per-group and fused execution of element-local operations on
+meshes made of a varying number of element groups.
+
+The total number of elements is kept (roughly) fixed, so that a growing
+number of groups means a growing number of kernel launches in per-group
+mode, while fused mode needs one launch per distinct element size.
+"""
+
+from __future__ import division
+from __future__ import print_function
+
+import time
+
+import numpy as np
+
+
+def make_mesh(ngroups, nelements_per_axis):
+    from meshmode.mesh.generation import generate_box_mesh
+    from meshmode.mesh.processing import affine_map, merge_dijsoint_meshes
+
+    n_per_group = max(1, int(round(nelements_per_axis / np.sqrt(ngroups))))
+
+    return merge_dijsoint_meshes([
+        affine_map(
+            generate_box_mesh([np.linspace(0, 1, n_per_group+1)]*2, order=1),
+            A=np.eye(2), b=np.array([2.0*igrp, 0]))
+        for igrp in range(ngroups)])
+
+
+def time_operations(queue, discr, vis_connection, nruns):
+    x = discr.nodes()[0].with_queue(queue)
+
+    def run():
+        discr.num_reference_derivative(queue, (0,), x)
+        discr.quad_weights(queue)
+        vis_connection(queue, x)
+
+    # warm up: build kernels and group tables
+    run()
+    queue.finish()
+
+    start = time.time()
+    for irun in range(nruns):
+        run()
+    queue.finish()
+
+    return (time.time() - start) / nruns
+
+
+def main():
+    import pyopencl as cl
+    from meshmode.discretization import Discretization
+    from meshmode.discretization.poly_element import (
+            InterpolatoryQuadratureSimplexGroupFactory,
+            PolynomialWarpAndBlendGroupFactory)
+    from meshmode.discretization.connection import make_same_mesh_connection
+
+    cl_ctx = cl.create_some_context(interactive=False)
+    queue = cl.CommandQueue(cl_ctx)
+
+    order = 3
+    nruns = 10
+
+    print("%8s %10s %12s %12s %8s" % (
+        "groups", "elements", "per-group", "fused", "speedup"))
+
+    for ngroups in [1, 4, 16, 64, 256]:
+        mesh = make_mesh(ngroups, nelements_per_axis=64)
+
+        timings = []
+        for fuse_groups in [False, True]:
+            discr = Discretization(cl_ctx, mesh,
+                    InterpolatoryQuadratureSimplexGroupFactory(order),
+                    fuse_groups=fuse_groups)
+            vis_discr = Discretization(cl_ctx, mesh,
+                    PolynomialWarpAndBlendGroupFactory(order+1),
+                    fuse_groups=fuse_groups)
+            vis_connection = make_same_mesh_connection(queue, vis_discr, discr)
+
+            timings.append(time_operations(queue, discr, vis_connection, nruns))
+
+        per_group_time, fused_time = timings
+        print("%8d %10d %10.2f ms %10.2f ms %7.2fx" % (
+            ngroups, mesh.nelements,
+            1e3*per_group_time, 1e3*fused_time,
+            per_group_time/fused_time))
+
+
+if __name__ == "__main__":
+    main()
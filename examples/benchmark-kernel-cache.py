@@ -0,0 +1,86 @@
+"""Measure the startup time of fresh processes with a cold and a warm
+persistent kernel cache.
+
+Each run executes this script in a new process, which builds a few
+discretizations and connections and applies them once. The first run
+starts from an empty kernel cache, later runs find the kernels on disk.
+
+:mod:`pyopencl` (and, depending on the version, :mod:`loopy`) keep caches
+of their own in the user cache directory. For cold numbers that include
+those, point ``XDG_CACHE_HOME`` (and ``POCL_CACHE_DIR``, if using POCL)
+at empty directories.
+"""
+
+from __future__ import division
+from __future__ import print_function
+
+import sys
+import time
+
+import numpy as np
+
+
+def run_workload(cache_dir):
+    import pyopencl as cl
+    from meshmode.array_context import PyOpenCLArrayContext
+    from meshmode.mesh.generation import generate_box_mesh
+    from meshmode.discretization import Discretization
+    from meshmode.discretization.poly_element import \
+            InterpolatoryQuadratureSimplexGroupFactory
+    from meshmode.discretization.connection import make_boundary_restriction
+
+    start = time.time()
+
+    cl_ctx = cl.create_some_context(interactive=False)
+    queue = cl.CommandQueue(cl_ctx)
+    actx = PyOpenCLArrayContext(cl_ctx, cache_dir=cache_dir)
+
+    for dim in [2, 3]:
+        for order in [1, 2, 3]:
+            mesh = generate_box_mesh(
+                    [np.linspace(0, 1, 5)]*dim, order=order)
+            group_factory = InterpolatoryQuadratureSimplexGroupFactory(order)
+
+            discr = Discretization(actx, mesh, group_factory)
+            x = discr.nodes()[0].with_queue(queue)
+            discr.quad_weights(queue)
+            discr.num_reference_derivative(queue, (0,), x)
+
+            _, _, bdry_connection = make_boundary_restriction(
+                    queue, discr, group_factory)
+            bdry_connection(queue, x)
+
+    queue.finish()
+
+    return time.time() - start
+
+
+def main():
+    if len(sys.argv) == 3 and sys.argv[1] == "--child":
+        print(run_workload(sys.argv[2]))
+        return
+
+    import subprocess
+    import tempfile
+    import shutil
+
+    nruns = 3
+    cache_dir = tempfile.mkdtemp(prefix="meshmode-kernel-cache-")
+
+    try:
+        for irun in range(nruns):
+            start = time.time()
+            output = subprocess.check_output(
+                    [sys.executable, __file__, "--child", cache_dir])
+            workload_time = float(output.split()[-1])
+            process_time = time.time() - start
+
+            print("%s: workload %.2f s, process %.2f s" % (
+                "cold" if irun == 0 else "warm",
+                workload_time, process_time))
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+if __name__ == "__main__":
+    main()
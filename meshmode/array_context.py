@@ -0,0 +1,1593 @@
+from __future__ import division
+from __future__ import absolute_import
+import six
+
+__copyright__ = "Copyright (C) 2015 Andreas Kloeckner"
+
+__license__ = """
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import numpy as np
+from pytools import memoize_method
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+__doc__ = """
+.. autoclass:: ArrayContext
+.. autoclass:: PyOpenCLArrayContext
+.. autoclass:: NumpyArrayContext
+.. autofunction:: make_array_context
+
+Memory pools
+------------
+
+.. autoclass:: PooledAllocator
+.. autoclass:: MemoryPoolStatistics
+"""
+
+
+# {{{ interface
+
+class ArrayContext(object):
+    """An interface to an array package and its execution model.
+    :class:`meshmode.discretization.Discretization` and
+    :class:`meshmode.discretization.connection.DiscretizationConnection`
+    allocate their arrays and carry out their per-element operations through
+    one of these.
+
+    All methods take a *queue* argument. It is only meaningful for
+    backends that have a notion of one, such as
+    :class:`PyOpenCLArrayContext`, and may be *None* otherwise.
+
+    The methods carrying out per-element operations and reductions also
+    accept a list of events *wait_for* that must complete before they
+    start. The former return the event of their computation, or *None*
+    if they completed synchronously, so that they may be enqueued on an
+    out-of-order queue. :meth:`array_events` and :meth:`add_events` track
+    the events pending on entire arrays.
+
+    .. attribute:: cl_context
+
+        The :class:`pyopencl.Context` in use, or *None* if the
+        array context is not based on OpenCL.
+
+    .. automethod:: empty
+    .. automethod:: make_memory_pool
+    .. automethod:: from_numpy
+    .. automethod:: to_numpy
+    .. automethod:: is_array
+    .. automethod:: shares_memory
+    .. automethod:: stack
+    .. automethod:: astype
+    .. automethod:: temporary_queue
+    .. automethod:: array_events
+    .. automethod:: add_events
+    .. automethod:: apply_element_matrix
+    .. automethod:: apply_scaled_element_matrix
+    .. automethod:: fill_element_weights
+    .. automethod:: resample_elements
+    .. automethod:: apply_fused_element_matrices
+    .. automethod:: fill_fused_element_weights
+    .. automethod:: compute_geometric_factors
+    .. automethod:: apply_grad
+    .. automethod:: apply_div
+    .. automethod:: weighted_sums
+    .. automethod:: max_abs
+    """
+
+    cl_context = None
+
+    def empty(self, queue, shape, dtype, allocator=None):
+        """
+        :arg allocator: *None* or an allocator returned by
+            :meth:`make_memory_pool`.
+        """
+        raise NotImplementedError
+
+    def make_memory_pool(self):
+        """Return a :class:`PooledAllocator` that may be passed to
+        :meth:`empty`, or *None* if this array context does not
+        benefit from pooling its allocations.
+        """
+        return None
+
+    def from_numpy(self, queue, ary):
+        """Return a copy of the :class:`numpy.ndarray` *ary* as an array
+        of this context.
+        """
+        raise NotImplementedError
+
+    def to_numpy(self, queue, ary):
+        raise NotImplementedError
+
+    def is_array(self, ary):
+        """Return *True* if *ary* is an array of this context."""
+        raise NotImplementedError
+
+    def shares_memory(self, ary1, ary2):
+        """Return *True* if the arrays *ary1* and *ary2* of this context
+        may overlap in memory, e.g. because one is a view of the other.
+        """
+        raise NotImplementedError
+
+    def stack(self, queue, arrays):
+        """Return a new array of shape ``(len(arrays),) + shape`` holding
+        the arrays *arrays* of equal *shape*, converted to their common
+        dtype.
+        """
+        raise NotImplementedError
+
+    def astype(self, queue, ary, dtype):
+        """Return a copy of *ary* converted to *dtype*."""
+        raise NotImplementedError
+
+    def temporary_queue(self):
+        """Return a context manager providing a queue for use within a
+        ``with`` block. All work enqueued on it is complete at the end of
+        the block.
+        """
+        raise NotImplementedError
+
+    def array_events(self, ary):
+        """Return a list of the events that must complete before *ary*
+        may be used. Arrays not of this context have none.
+        """
+        return []
+
+    def add_events(self, ary, events):
+        """Record the events *events* (which may contain *None*) as
+        pending on *ary*.
+        """
+        pass
+
+    def apply_element_matrix(self, queue, mat, result, vec, wait_for=None):
+        """Compute ``result[..., k, i] = sum(j, mat[i, j] * vec[..., k, j])``.
+
+        *result* and *vec* are per-element views as returned by
+        :meth:`meshmode.discretization.ElementGroupBase.view`, with either
+        no or one leading axis. *vec* may also be a
+        :class:`numpy.ndarray`. With a leading axis, *mat* is applied to
+        all vectors along it at once.
+        """
+        raise NotImplementedError
+
+    def apply_scaled_element_matrix(self, queue, mat, result, vec, scaling,
+            scale_before, wait_for=None):
+        """Compute ``result[..., k, i] =
+        sum(j, mat[i, j] * scaling[k, j] * vec[..., k, j])`` if
+        *scale_before* is *True*, otherwise ``result[..., k, i] =
+        scaling[k, i] * sum(j, mat[i, j] * vec[..., k, j])``.
+
+        Arguments are as in :meth:`apply_element_matrix`, *scaling* is a
+        per-element array without leading axis, shaped like *vec* or
+        *result*, respectively.
+        """
+        raise NotImplementedError
+
+    def fill_element_weights(self, queue, result, weights, wait_for=None):
+        """Compute ``result[k, i] = weights[i]``."""
+        raise NotImplementedError
+
+    def resample_elements(self, queue, mat, result, vec,
+            source_element_indices, target_element_indices, wait_for=None):
+        """Compute ``result[..., target_element_indices[k], i] =
+        sum(j, mat[i, j] * vec[..., source_element_indices[k], j])``.
+
+        As in :meth:`apply_element_matrix`, *result* and *vec* may have
+        one leading axis.
+        """
+        raise NotImplementedError
+
+    def apply_fused_element_matrices(self, queue, mats, mat_indices,
+            result, vec, result_node_starts, vec_node_starts, wait_for=None):
+        """Compute ``result[..., result_node_starts[k] + i] =
+        sum(j, mats[mat_indices[k], i, j]
+        * vec[..., vec_node_starts[k] + j])``.
+
+        Unlike :meth:`apply_element_matrix`, *result* and *vec* are entire
+        arrays of nodal values (with no or one leading axis), so that
+        elements of many element groups may be processed at once.
+        """
+        raise NotImplementedError
+
+    def fill_fused_element_weights(self, queue, weights, weight_indices,
+            result, node_starts, wait_for=None):
+        """Compute ``result[node_starts[k] + i] =
+        weights[weight_indices[k], i]``.
+        """
+        raise NotImplementedError
+
+    def compute_geometric_factors(self, queue, diff_mats, nodes, results,
+            wait_for=None):
+        """Compute the Jacobian ``jacobian[a, r, k, i] =
+        sum(j, diff_mats[r, i, j] * nodes[a, k, j])`` of one element group
+        along with the quantities derived from it at each node, in one go.
+
+        :arg diff_mats: a :class:`numpy.ndarray` of shape
+            ``(dim, nunit_nodes, nunit_nodes)``.
+        :arg nodes: a per-element view of shape
+            ``(ambient_dim, nelements, nunit_nodes)``.
+        :arg results: a dictionary mapping the names returned by
+            :func:`geometric_factor_names` to per-element views receiving
+            these factors.
+        """
+        raise NotImplementedError
+
+    def apply_grad(self, queue, diff_mats, inverse_jacobian, result, vec,
+            wait_for=None):
+        """Compute ``result[a, k, i] = sum(r, inverse_jacobian[r, a, k, i]
+        * sum(j, diff_mats[r, i, j] * vec[k, j]))``.
+
+        *diff_mats* is as in :meth:`compute_geometric_factors`, the other
+        arguments are per-element views.
+        """
+        raise NotImplementedError
+
+    def apply_div(self, queue, diff_mats, inverse_jacobian, result, vec,
+            wait_for=None):
+        """Compute ``result[k, i] = sum(a, r, inverse_jacobian[r, a, k, i]
+        * sum(j, diff_mats[r, i, j] * vec[a, k, j]))``.
+
+        Arguments are as in :meth:`apply_grad`.
+        """
+        raise NotImplementedError
+
+    def weighted_sums(self, queue, weights, vec, p=None, wait_for=None):
+        """Compute ``sum(i, weights[i] * vec[..., i])``, or, if *p* is not
+        *None*, ``sum(i, weights[i] * abs(vec[..., i])**p)``, in a single
+        pass over *vec*, which may have one leading axis.
+
+        :returns: a :class:`numpy.ndarray` of shape ``vec.shape[:-1]``.
+        """
+        raise NotImplementedError
+
+    def max_abs(self, queue, vec, wait_for=None):
+        """Compute ``max(i, abs(vec[..., i]))``, where *vec* may have one
+        leading axis.
+
+        :returns: a :class:`numpy.ndarray` of shape ``vec.shape[:-1]``.
+        """
+        raise NotImplementedError
+
+# }}}
+
+
+# {{{ memory pools
+
+class MemoryPoolStatistics(object):
+    """
+    .. attribute:: nallocations
+
+    .. attribute:: nreused
+
+        The number of allocations served from memory held by the pool.
+
+    .. attribute:: allocated_bytes
+
+        The total number of bytes handed out by the pool, rounded up to its
+        allocation sizes.
+
+    .. attribute:: reused_bytes
+
+        The part of :attr:`allocated_bytes` served from memory held by
+        the pool.
+
+    .. attribute:: peak_bytes
+
+        The number of bytes the pool has obtained from the underlying
+        allocator. Since the pool holds on to freed memory, this is its
+        peak footprint.
+    """
+
+    def __init__(self):
+        self.nallocations = 0
+        self.nreused = 0
+        self.allocated_bytes = 0
+        self.reused_bytes = 0
+        self.peak_bytes = 0
+
+    def __repr__(self):
+        return ("MemoryPoolStatistics(nallocations=%d, nreused=%d, "
+                "allocated_bytes=%d, reused_bytes=%d, peak_bytes=%d)" % (
+                    self.nallocations, self.nreused,
+                    self.allocated_bytes, self.reused_bytes, self.peak_bytes))
+
+
+class PooledAllocator(object):
+    """An allocator serving allocations from *pool*, which is expected to
+    have the interface of :class:`pyopencl.tools.MemoryPool`, while keeping
+    :class:`MemoryPoolStatistics`.
+
+    .. attribute:: pool
+    .. attribute:: statistics
+
+    .. automethod:: __call__
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.statistics = MemoryPoolStatistics()
+
+    def __call__(self, nbytes):
+        """Return a buffer of at least *nbytes* bytes."""
+        held_blocks = self.pool.held_blocks
+        result = self.pool.allocate(nbytes)
+        size = self.pool.alloc_size(self.pool.bin_number(nbytes))
+
+        stats = self.statistics
+        stats.nallocations += 1
+        stats.allocated_bytes += size
+
+        if self.pool.held_blocks < held_blocks:
+            stats.nreused += 1
+            stats.reused_bytes += size
+        else:
+            stats.peak_bytes += size
+
+        return result
+
+# }}}
+
+
+# {{{ geometric factors
+
+def geometric_factor_names(dim, ambient_dim):
+    """Return the names of the geometric factors available for elements of
+    dimension *dim* in *ambient_dim* dimensions, mapped to the shape of
+    their per-node values:
+
+    * ``jacobian``, ``(ambient_dim, dim)``: derivatives of the coordinates
+      along the reference axes.
+    * ``inverse_jacobian``, ``(dim, ambient_dim)``: the inverse of the
+      Jacobian, or, if ``dim < ambient_dim``, its pseudo-inverse.
+    * ``area_element``, ``()``: the square root of the determinant of the
+      metric tensor.
+    * ``jacobian_determinant``, ``()``: only if ``dim == ambient_dim``.
+    * ``normals``, ``(ambient_dim,)``: unit normals, only if
+      ``dim == ambient_dim - 1``.
+    """
+    result = {
+            "jacobian": (ambient_dim, dim),
+            "inverse_jacobian": (dim, ambient_dim),
+            "area_element": (),
+            }
+    if dim == ambient_dim:
+        result["jacobian_determinant"] = ()
+    if dim == ambient_dim - 1:
+        result["normals"] = (ambient_dim,)
+    return result
+
+
+def _sum(terms):
+    from functools import reduce
+    from operator import add
+    return reduce(add, terms)
+
+
+def _det(mat):
+    n = len(mat)
+    if n == 1:
+        return mat[0][0]
+    elif n == 2:
+        return mat[0][0]*mat[1][1] - mat[0][1]*mat[1][0]
+    elif n == 3:
+        return _sum(
+                mat[0][i]*mat[1][(i+1) % 3]*mat[2][(i+2) % 3]
+                - mat[0][i]*mat[1][(i+2) % 3]*mat[2][(i+1) % 3]
+                for i in range(3))
+    else:
+        raise ValueError("unsupported matrix size: %d" % n)
+
+
+def _adjugate(mat):
+    n = len(mat)
+    if n == 1:
+        return [[1]]
+    elif n == 2:
+        return [[mat[1][1], -mat[0][1]], [-mat[1][0], mat[0][0]]]
+    elif n == 3:
+        return [[
+            mat[(j+1) % 3][(i+1) % 3]*mat[(j+2) % 3][(i+2) % 3]
+            - mat[(j+1) % 3][(i+2) % 3]*mat[(j+2) % 3][(i+1) % 3]
+            for j in range(3)]
+            for i in range(3)]
+    else:
+        raise ValueError("unsupported matrix size: %d" % n)
+
+
+def _geometric_factor_expressions(jac, sqrt):
+    """
+    :arg jac: a nested list such that ``jac[a][r]`` is the derivative of
+        coordinate *a* along reference axis *r*. Entries may be anything
+        supporting arithmetic, such as :class:`numpy.ndarray` instances or
+        :mod:`pymbolic` expressions.
+    :arg sqrt: a square root function applicable to the entries of *jac*.
+    :returns: a dictionary mapping the names from
+        :func:`geometric_factor_names` to (nested lists of) expressions.
+    """
+    ambient_dim = len(jac)
+    dim = len(jac[0])
+
+    result = {"jacobian": jac}
+
+    if dim == ambient_dim:
+        jac_det = _det(jac)
+        adj = _adjugate(jac)
+
+        result["jacobian_determinant"] = jac_det
+        result["area_element"] = sqrt(jac_det*jac_det)
+        result["inverse_jacobian"] = [
+                [adj[r][a] / jac_det for a in range(ambient_dim)]
+                for r in range(dim)]
+    else:
+        metric = [
+                [_sum(jac[a][r]*jac[a][s] for a in range(ambient_dim))
+                    for s in range(dim)]
+                for r in range(dim)]
+        metric_det = _det(metric)
+        metric_adj = _adjugate(metric)
+
+        result["area_element"] = area_element = sqrt(metric_det)
+        result["inverse_jacobian"] = [
+                [_sum(metric_adj[r][s]*jac[a][s] for s in range(dim))
+                    / metric_det
+                    for a in range(ambient_dim)]
+                for r in range(dim)]
+
+        if dim == ambient_dim - 1:
+            if ambient_dim == 2:
+                normal = [jac[1][0], -jac[0][0]]
+            elif ambient_dim == 3:
+                normal = [
+                        jac[(a+1) % 3][0]*jac[(a+2) % 3][1]
+                        - jac[(a+2) % 3][0]*jac[(a+1) % 3][1]
+                        for a in range(3)]
+            else:
+                raise ValueError("unsupported ambient dimension: %d"
+                        % ambient_dim)
+
+            result["normals"] = [n_a / area_element for n_a in normal]
+
+    return result
+
+# }}}
+
+
+# {{{ pyopencl
+
+# {{{ kernels
+
+def _make_element_matrix_kernel():
+    import loopy as lp
+    knl = lp.make_kernel(
+        """{[k,i,j]:
+            0<=k<nelements and
+            0<=i<n_result_nodes and
+            0<=j<n_vec_nodes}""",
+        "result[k,i] = sum(j, mat[i, j] * vec[k, j])",
+        default_offset=lp.auto, name="elementwise_matrix")
+
+    return knl
+
+
+def _make_element_matrix_with_leading_axis_kernel():
+    import loopy as lp
+    knl = lp.make_kernel(
+        """{[d,k,i,j]:
+            0<=d<dims and
+            0<=k<nelements and
+            0<=i<n_result_nodes and
+            0<=j<n_vec_nodes}""",
+        """
+            result[d, k, i] = \
+                sum(j, mat[i, j] * vec[d, k, j])
+            """,
+        name="elementwise_matrix_with_leading_axis",
+        default_offset=lp.auto)
+
+    knl = lp.tag_data_axes(knl, "result",
+            "stride:auto,stride:auto,stride:auto")
+    knl = lp.tag_data_axes(knl, "vec",
+            "stride:auto,stride:auto,stride:auto")
+
+    return knl
+
+
+def _make_scaled_element_matrix_kernel(scale_before, with_leading_axis):
+    import loopy as lp
+
+    if with_leading_axis:
+        domain = """{[d,k,i,j]:
+            0<=d<nvectors and
+            0<=k<nelements and
+            0<=i<n_result_nodes and
+            0<=j<n_vec_nodes}"""
+        result, vec = "result[d, k, i]", "vec[d, k, j]"
+        leading_shape = "nvectors, "
+        name = "scaled_elementwise_matrix_with_leading_axis"
+    else:
+        domain = """{[k,i,j]:
+            0<=k<nelements and
+            0<=i<n_result_nodes and
+            0<=j<n_vec_nodes}"""
+        result, vec = "result[k, i]", "vec[k, j]"
+        leading_shape = ""
+        name = "scaled_elementwise_matrix"
+
+    if scale_before:
+        insn = "%s = sum(j, mat[i, j] * scaling[k, j] * %s)" % (result, vec)
+        scaling_shape = "nelements, n_vec_nodes"
+    else:
+        insn = "%s = scaling[k, i] * sum(j, mat[i, j] * %s)" % (result, vec)
+        scaling_shape = "nelements, n_result_nodes"
+
+    args = [
+            lp.GlobalArg("result", None, offset=lp.auto,
+                shape=leading_shape + "nelements, n_result_nodes"),
+            lp.GlobalArg("vec", None, offset=lp.auto,
+                shape=leading_shape + "nelements, n_vec_nodes"),
+            lp.GlobalArg("scaling", None, offset=lp.auto,
+                shape=scaling_shape),
+            ]
+
+    knl = lp.make_kernel(domain, insn, args + ["..."],
+            name=name, default_offset=lp.auto)
+
+    for arg in args:
+        knl = lp.tag_data_axes(knl, arg.name,
+                ",".join(["stride:auto"] * len(arg.shape)))
+
+    return knl
+
+
+def _make_element_weights_kernel():
+    import loopy as lp
+    knl = lp.make_kernel(
+        "{[k,i]: 0<=k<nelements and 0<=i<ndiscr_nodes}",
+        "result[k,i] = weights[i]",
+        name="quad_weights", default_offset=lp.auto)
+
+    return knl
+
+
+def _make_resample_elements_kernel():
+    import loopy as lp
+    knl = lp.make_kernel(
+        """{[k,i,j]:
+            0<=k<nelements and
+            0<=i<n_to_nodes and
+            0<=j<n_from_nodes}""",
+        "result[target_element_indices[k], i] \
+            = sum(j, resample_mat[i, j] \
+            * vec[source_element_indices[k], j])",
+        [
+            lp.GlobalArg("result", None, offset=lp.auto,
+                shape="nelements_result, n_to_nodes"),
+            lp.GlobalArg("vec", None, offset=lp.auto,
+                shape="nelements_vec, n_from_nodes"),
+            lp.ValueArg("nelements_result", np.int32),
+            lp.ValueArg("nelements_vec", np.int32),
+            "...",
+            ],
+        name="oversample",
+        default_offset=lp.auto)
+
+    return knl
+
+
+def _make_resample_elements_with_leading_axis_kernel():
+    import loopy as lp
+    knl = lp.make_kernel(
+        """{[d,k,i,j]:
+            0<=d<nvectors and
+            0<=k<nelements and
+            0<=i<n_to_nodes and
+            0<=j<n_from_nodes}""",
+        "result[d, target_element_indices[k], i] \
+            = sum(j, resample_mat[i, j] \
+            * vec[d, source_element_indices[k], j])",
+        [
+            lp.GlobalArg("result", None, offset=lp.auto,
+                shape="nvectors, nelements_result, n_to_nodes"),
+            lp.GlobalArg("vec", None, offset=lp.auto,
+                shape="nvectors, nelements_vec, n_from_nodes"),
+            lp.ValueArg("nelements_result", np.int32),
+            lp.ValueArg("nelements_vec", np.int32),
+            "...",
+            ],
+        name="oversample_with_leading_axis",
+        default_offset=lp.auto)
+
+    knl = lp.tag_data_axes(knl, "result",
+            "stride:auto,stride:auto,stride:auto")
+    knl = lp.tag_data_axes(knl, "vec",
+            "stride:auto,stride:auto,stride:auto")
+
+    return knl
+
+
+def _make_fused_element_matrix_kernel():
+    import loopy as lp
+    knl = lp.make_kernel(
+        """{[k,i,j]:
+            0<=k<nelements and
+            0<=i<n_to_nodes and
+            0<=j<n_from_nodes}""",
+        "result[result_node_starts[k] + i] \
+            = sum(j, mats[mat_indices[k], i, j] \
+            * vec[vec_node_starts[k] + j])",
+        [
+            lp.GlobalArg("result", None, offset=lp.auto, shape="nnodes_result"),
+            lp.GlobalArg("vec", None, offset=lp.auto, shape="nnodes_vec"),
+            lp.GlobalArg("mats", None,
+                shape="nmats, n_to_nodes, n_from_nodes"),
+            lp.ValueArg("nnodes_result", np.int32),
+            lp.ValueArg("nnodes_vec", np.int32),
+            "...",
+            ],
+        name="fused_elementwise_matrix",
+        default_offset=lp.auto)
+
+    return knl
+
+
+def _make_fused_element_matrix_with_leading_axis_kernel():
+    import loopy as lp
+    knl = lp.make_kernel(
+        """{[d,k,i,j]:
+            0<=d<nvectors and
+            0<=k<nelements and
+            0<=i<n_to_nodes and
+            0<=j<n_from_nodes}""",
+        "result[d, result_node_starts[k] + i] \
+            = sum(j, mats[mat_indices[k], i, j] \
+            * vec[d, vec_node_starts[k] + j])",
+        [
+            lp.GlobalArg("result", None, offset=lp.auto,
+                shape="nvectors, nnodes_result"),
+            lp.GlobalArg("vec", None, offset=lp.auto, shape="nvectors, nnodes_vec"),
+            lp.GlobalArg("mats", None,
+                shape="nmats, n_to_nodes, n_from_nodes"),
+            lp.ValueArg("nnodes_result", np.int32),
+            lp.ValueArg("nnodes_vec", np.int32),
+            "...",
+            ],
+        name="fused_elementwise_matrix_with_leading_axis",
+        default_offset=lp.auto)
+
+    knl = lp.tag_data_axes(knl, "result", "stride:auto,stride:auto")
+    knl = lp.tag_data_axes(knl, "vec", "stride:auto,stride:auto")
+    return knl
+
+
+def _make_geometric_factors_kernel(dim, ambient_dim):
+    import loopy as lp
+    from pymbolic import var
+
+    jac = [[var("jac_%d_%d" % (a, r)) for r in range(dim)]
+            for a in range(ambient_dim)]
+    factors = _geometric_factor_expressions(jac, var("sqrt"))
+
+    instructions = [
+            "<> jac_%d_%d = sum(j, diff_mats[%d, i, j] * nodes[%d, k, j])"
+            % (a, r, r, a)
+            for a in range(ambient_dim)
+            for r in range(dim)]
+
+    args = [
+            lp.GlobalArg("nodes", None, offset=lp.auto,
+                shape="%d, nelements, nunit_nodes" % ambient_dim),
+            lp.GlobalArg("diff_mats", None,
+                shape="%d, nunit_nodes, nunit_nodes" % dim),
+            ]
+
+    from pytools import indices_in_shape
+    for name, shape in sorted(six.iteritems(
+            geometric_factor_names(dim, ambient_dim))):
+        args.append(lp.GlobalArg(name, None, offset=lp.auto,
+            shape=", ".join(
+                [str(n) for n in shape] + ["nelements", "nunit_nodes"])))
+
+        for idx in indices_in_shape(shape):
+            expr = factors[name]
+            for i_axis in idx:
+                expr = expr[i_axis]
+
+            instructions.append("%s[%s] = %s" % (
+                name, ", ".join([str(i_axis) for i_axis in idx] + ["k", "i"]),
+                expr))
+
+    knl = lp.make_kernel(
+        "{[k,i,j]: 0<=k<nelements and 0<=i<nunit_nodes and 0<=j<nunit_nodes}",
+        instructions,
+        args + ["..."],
+        name="geometric_factors_%dd_in_%dd" % (dim, ambient_dim),
+        default_offset=lp.auto)
+
+    for arg in args:
+        knl = lp.tag_data_axes(knl, arg.name,
+                ",".join(["stride:auto"] * len(arg.shape)))
+
+    return knl
+
+
+def _make_grad_kernel(dim, ambient_dim):
+    instructions = [
+            "<> ref_deriv_%d = sum(j, diff_mats[%d, i, j] * vec[k, j])"
+            % (r, r)
+            for r in range(dim)]
+    instructions.extend(
+            "result[%d, k, i] = %s" % (a, " + ".join(
+                "inverse_jacobian[%d, %d, k, i] * ref_deriv_%d" % (r, a, r)
+                for r in range(dim)))
+            for a in range(ambient_dim))
+
+    return _make_physical_derivative_kernel(dim, ambient_dim, instructions,
+            vec_shape="nelements, nunit_nodes",
+            result_shape="%d, nelements, nunit_nodes" % ambient_dim,
+            name="grad_%dd_in_%dd" % (dim, ambient_dim))
+
+
+def _make_div_kernel(dim, ambient_dim):
+    instructions = [
+            "<> ref_deriv_%d_%d = sum(j, diff_mats[%d, i, j] * vec[%d, k, j])"
+            % (a, r, r, a)
+            for a in range(ambient_dim)
+            for r in range(dim)]
+    instructions.append(
+            "result[k, i] = %s" % " + ".join(
+                "inverse_jacobian[%d, %d, k, i] * ref_deriv_%d_%d"
+                % (r, a, a, r)
+                for a in range(ambient_dim)
+                for r in range(dim)))
+
+    return _make_physical_derivative_kernel(dim, ambient_dim, instructions,
+            vec_shape="%d, nelements, nunit_nodes" % ambient_dim,
+            result_shape="nelements, nunit_nodes",
+            name="div_%dd_in_%dd" % (dim, ambient_dim))
+
+
+def _make_physical_derivative_kernel(dim, ambient_dim, instructions,
+        vec_shape, result_shape, name):
+    import loopy as lp
+
+    args = [
+            lp.GlobalArg("result", None, offset=lp.auto, shape=result_shape),
+            lp.GlobalArg("vec", None, offset=lp.auto, shape=vec_shape),
+            lp.GlobalArg("inverse_jacobian", None, offset=lp.auto,
+                shape="%d, %d, nelements, nunit_nodes" % (dim, ambient_dim)),
+            lp.GlobalArg("diff_mats", None,
+                shape="%d, nunit_nodes, nunit_nodes" % dim),
+            ]
+
+    knl = lp.make_kernel(
+        "{[k,i,j]: 0<=k<nelements and 0<=i<nunit_nodes and 0<=j<nunit_nodes}",
+        instructions,
+        args + ["..."],
+        name=name, default_offset=lp.auto)
+
+    for arg in args:
+        knl = lp.tag_data_axes(knl, arg.name,
+                ",".join(["stride:auto"] * len(arg.shape)))
+
+    return knl
+
+
+_REDUCTION_CHUNK_SIZE = 256
+
+
+def _make_nodal_reduction_kernel(reduction, p):
+    """Make a kernel reducing chunks of :data:`_REDUCTION_CHUNK_SIZE` nodes
+    each, leaving the (short) sum or maximum over chunks to the caller.
+    """
+    import loopy as lp
+
+    node = "vec[d, %d*g + l]" % _REDUCTION_CHUNK_SIZE
+    if p is None:
+        term = node
+    else:
+        term = "abs(%s)**%r" % (node, p)
+
+    if reduction == "sum":
+        term = "weights[%d*g + l] * %s" % (_REDUCTION_CHUNK_SIZE, term)
+
+    args = [
+            lp.GlobalArg("partial_results", None, shape="nvectors, nchunks"),
+            lp.GlobalArg("vec", None, offset=lp.auto, shape="nvectors, nnodes"),
+            ]
+    if reduction == "sum":
+        # not inferred from the accesses, which suggest a whole last chunk
+        args.append(lp.GlobalArg("weights", None, offset=lp.auto,
+            shape="nnodes"))
+
+    knl = lp.make_kernel(
+        """{[d,g,l]:
+            0<=d<nvectors and
+            0<=g<nchunks and
+            0<=l<%d and
+            %d*g + l<nnodes}"""
+        % (_REDUCTION_CHUNK_SIZE, _REDUCTION_CHUNK_SIZE),
+        "partial_results[d, g] = %s(l, %s)" % (reduction, term),
+        args + ["..."],
+        name="nodal_%s" % reduction,
+        default_offset=lp.auto)
+
+    knl = lp.tag_inames(knl, dict(g="g.0", d="g.1"))
+    knl = lp.tag_data_axes(knl, "vec", "stride:auto,stride:auto")
+    return knl
+
+
+def _make_fused_element_weights_kernel():
+    import loopy as lp
+    knl = lp.make_kernel(
+        "{[k,i]: 0<=k<nelements and 0<=i<nunit_nodes}",
+        "result[node_starts[k] + i] = weights[weight_indices[k], i]",
+        [
+            lp.GlobalArg("result", None, offset=lp.auto, shape="nnodes"),
+            lp.GlobalArg("weights", None, shape="nweights, nunit_nodes"),
+            lp.ValueArg("nnodes", np.int32),
+            "...",
+            ],
+        name="fused_weights",
+        default_offset=lp.auto)
+
+    return knl
+
+# }}}
+
+
+# {{{ transformations
+
+# Elementwise kernels, i.e. those with an element axis "k" and a node axis
+# "i", are mapped onto the device by the transformations below. Others (such
+# as the reductions) bring their own.
+
+#: Arguments holding an element-local matrix, which may be prefetched into
+#: local memory and shared by all elements of a work group.
+_PREFETCHABLE_MATRICES = ["mat", "resample_mat", "diff_mats"]
+
+#: Number of timed runs of each kernel variant during autotuning
+_AUTOTUNE_NRUNS = 3
+
+
+def _is_elementwise_kernel(knl):
+    inames = knl.all_inames()
+    return "k" in inames and "i" in inames
+
+
+#: Pairs of parameters giving the numbers of nodes that bound the inames
+#: "i" and "j" in the elementwise kernels.
+_NODE_COUNT_PARAMETERS = [
+        ("n_result_nodes", "n_vec_nodes"),
+        ("n_to_nodes", "n_from_nodes"),
+        ("nunit_nodes", "nunit_nodes"),
+        ]
+
+
+def _prefetchable_matrix(knl):
+    for name in _PREFETCHABLE_MATRICES:
+        if name in knl.arg_dict:
+            return name
+    return None
+
+
+def _node_count_parameters(knl, matrix_shape):
+    """Return a dictionary fixing the numbers of nodes of *knl* to those
+    of its prefetchable matrix, whose shape is *matrix_shape*. Prefetching
+    needs these to be known at code generation time, since OpenCL does not
+    support variable-length local arrays.
+    """
+    params = knl.all_params()
+    for i_param, j_param in _NODE_COUNT_PARAMETERS:
+        if i_param in params and j_param in params:
+            return {i_param: matrix_shape[-2], j_param: matrix_shape[-1]}
+
+    raise ValueError("kernel '%s' has no known node count parameters"
+            % knl.name)
+
+
+def _default_variant(knl):
+    """Return the variant used without autotuning (or if no variant could
+    be tuned): one element per work group, 16 nodes per work item, no
+    prefetching. Prefetching is only used once a tuned variant with it has
+    been built and run successfully.
+    """
+    return (16, 1, False)
+
+
+def _matrix_shape(args):
+    """Return the shape of the prefetchable matrix in the dictionary *args*
+    of kernel arguments, or *None*.
+    """
+    for name in _PREFETCHABLE_MATRICES:
+        if name in args:
+            return args[name].shape
+    return None
+
+
+def _candidate_variants(knl):
+    """Yield tuples ``(nodes_per_group, elements_per_group, prefetch)``."""
+    if _prefetchable_matrix(knl) is not None:
+        prefetch_choices = [False, True]
+    else:
+        prefetch_choices = [False]
+
+    for nodes_per_group in [4, 16, 32]:
+        for elements_per_group in [1, 4, 16]:
+            if nodes_per_group * elements_per_group > 256:
+                continue
+
+            for prefetch in prefetch_choices:
+                yield (nodes_per_group, elements_per_group, prefetch)
+
+
+def _transform_kernel(knl, variant, matrix_shape=None):
+    """
+    :arg matrix_shape: the shape of the prefetchable matrix, required if
+        *variant* prefetches it.
+    """
+    import loopy as lp
+
+    nodes_per_group, elements_per_group, prefetch = variant
+
+    if prefetch:
+        knl = lp.fix_parameters(knl,
+                **_node_count_parameters(knl, matrix_shape))
+
+    knl = lp.split_iname(knl, "i", nodes_per_group, inner_tag="l.0")
+    if elements_per_group == 1:
+        knl = lp.tag_inames(knl, dict(k="g.0"))
+    else:
+        knl = lp.split_iname(knl, "k", elements_per_group,
+                outer_tag="g.0", inner_tag="l.1")
+
+    if prefetch:
+        knl = lp.add_prefetch(knl, _prefetchable_matrix(knl),
+                ["i_outer", "i_inner", "j"], default_tag="l.auto")
+
+    return knl
+
+
+def _bucket_shape(shape):
+    """Keep small axis lengths (such as numbers of unit nodes), but round
+    large ones (such as numbers of elements) up to powers of two.
+    """
+    return tuple(
+            n if n <= 64 else 2**int(np.ceil(np.log2(n)))
+            for n in shape)
+
+
+def _dtype_key(arg_dtypes):
+    return tuple(sorted(
+        (name, np.dtype(dtype).str)
+        for name, dtype in six.iteritems(arg_dtypes)))
+
+
+def _device_key(dev):
+    return (dev.platform.name, dev.platform.version,
+            dev.name, dev.driver_version)
+
+
+def _version_key():
+    # Persistent entries are pickled loopy kernels or refer to meshmode's
+    # transformation variants, so they must not outlive either version.
+    from loopy.version import DATA_MODEL_VERSION
+    from meshmode.version import VERSION
+    return (VERSION, DATA_MODEL_VERSION)
+
+# }}}
+
+
+def _byte_extent(ary):
+    """Return the range of bytes of the buffer of the
+    :class:`pyopencl.array.Array` *ary* that it covers.
+    """
+    start = end = ary.offset
+    for n, stride in zip(ary.shape, ary.strides):
+        if stride < 0:
+            start += (n-1)*stride
+        else:
+            end += (n-1)*stride
+
+    return start, end + ary.dtype.itemsize
+
+
+class _FinishingQueue(object):
+    def __init__(self, queue):
+        self.queue = queue
+
+    def __enter__(self):
+        return self.queue
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.queue.finish()
+
+
+class PyOpenCLArrayContext(ArrayContext):
+    """An array context using :class:`pyopencl.array.Array` instances
+    and :mod:`loopy` kernels.
+
+    Kernels are specialized to the types of their arguments and to the
+    device, and then preprocessed and scheduled by :mod:`loopy`. The result
+    is kept in memory and, unless disabled, in an on-disk cache shared
+    between processes, so that short-lived processes do not pay for
+    scheduling every kernel again. (The OpenCL build of the generated code
+    is cached on disk by :mod:`pyopencl` itself.)
+
+    Elementwise kernels are by default run with one element per work group
+    and 16 nodes per work item, without prefetching. With autotuning
+    enabled, a small space of variants (nodes and elements per work group,
+    prefetching of the element matrix into local memory) is timed on the
+    first invocation for each kernel, argument types, (bucketed) argument
+    shapes and device, and the fastest one is kept, on disk as well unless
+    *persistent_cache* is *False*.
+
+    .. automethod:: __init__
+    """
+
+    def __init__(self, cl_context, persistent_cache=True, cache_dir=None,
+            autotune=False):
+        """
+        :arg persistent_cache: whether to use the on-disk kernel cache.
+        :arg cache_dir: the directory holding the on-disk kernel cache.
+            Defaults to the user cache directory used by
+            :class:`pytools.persistent_dict.PersistentDict`.
+        :arg autotune: whether to choose kernel transformations by timing.
+        """
+        self.cl_context = cl_context
+        self.persistent_cache = persistent_cache
+        self.cache_dir = cache_dir
+        self.autotune = autotune
+
+        self._kernel_cache = {}
+        self._tuned_variants = {}
+        self._queue = None
+
+    def __eq__(self, other):
+        return (type(self) is type(other)
+                and self.cl_context == other.cl_context)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash((type(self), self.cl_context))
+
+    @memoize_method
+    def _persistent_kernel_cache(self):
+        from pytools.persistent_dict import PersistentDict
+        return PersistentDict("meshmode-kernel-cache-v1",
+                container_dir=self.cache_dir)
+
+    @memoize_method
+    def _persistent_tuning_cache(self):
+        from pytools.persistent_dict import PersistentDict
+        return PersistentDict("meshmode-autotune-v1",
+                container_dir=self.cache_dir)
+
+    def _store_persistent(self, cache, key, value, what):
+        try:
+            cache[key] = value
+        except Exception as e:
+            from warnings import warn
+            warn("could not store %s in persistent cache: %s" % (what, e))
+
+    def _get_kernel(self, queue, make_kernel, arg_dtypes, kernel_args=(),
+            variant=None, matrix_shape=None):
+        """
+        :arg make_kernel: a function returning the (untyped) kernel
+        :arg arg_dtypes: a dictionary mapping argument names to their dtypes
+        :arg kernel_args: a tuple of hashable arguments to *make_kernel*
+        :arg variant: the transformation variant for elementwise kernels,
+            as yielded by :func:`_candidate_variants`, or *None* for the
+            default.
+        :arg matrix_shape: the shape of the prefetchable matrix argument,
+            if any. Variants prefetching it are specialized to its size.
+        :returns: the kernel made by *make_kernel*, specialized to
+            *arg_dtypes* and the device of *queue*, transformed, preprocessed
+            and scheduled.
+        """
+        dtype_key = _dtype_key(arg_dtypes)
+
+        if variant is None or not variant[2]:
+            # not prefetching, no need to specialize
+            matrix_shape = None
+
+        mem_key = (make_kernel.__name__, kernel_args, variant, matrix_shape,
+                dtype_key, queue.device)
+        try:
+            return self._kernel_cache[mem_key]
+        except KeyError:
+            pass
+
+        import loopy as lp
+
+        knl = make_kernel(*kernel_args)
+        if _is_elementwise_kernel(knl):
+            if variant is None:
+                variant = _default_variant(knl)
+            knl = _transform_kernel(knl, variant, matrix_shape)
+
+        dev = queue.device
+        persistent_key = (str(knl), dtype_key, _device_key(dev),
+                _version_key())
+
+        result = None
+        if self.persistent_cache:
+            try:
+                result = self._persistent_kernel_cache()[persistent_key]
+            except KeyError:
+                pass
+
+        if result is None:
+            result = lp.add_dtypes(knl, arg_dtypes)
+            result = lp.preprocess_kernel(result, device=dev)
+            result = lp.get_one_scheduled_kernel(result)
+
+            if self.persistent_cache:
+                self._store_persistent(self._persistent_kernel_cache(),
+                        persistent_key, result, "kernel '%s'" % knl.name)
+
+        self._kernel_cache[mem_key] = result
+        return result
+
+    def _get_tuned_variant(self, queue, make_kernel, kernel_args, args,
+            wait_for=None):
+        arg_dtypes = dict(
+                (name, ary.dtype) for name, ary in six.iteritems(args))
+        shape_key = tuple(sorted(
+            (name, _bucket_shape(ary.shape))
+            for name, ary in six.iteritems(args)))
+        key = (make_kernel.__name__, kernel_args, _dtype_key(arg_dtypes),
+                shape_key, _device_key(queue.device), _version_key())
+
+        try:
+            return self._tuned_variants[key]
+        except KeyError:
+            pass
+
+        variant = None
+        found = False
+        if self.persistent_cache:
+            try:
+                variant = self._persistent_tuning_cache()[key]
+                found = True
+            except KeyError:
+                pass
+
+        if not found:
+            variant = self._tune(queue, make_kernel, kernel_args, args,
+                    wait_for)
+
+            if self.persistent_cache:
+                self._store_persistent(self._persistent_tuning_cache(),
+                        key, variant,
+                        "tuning result for '%s'" % make_kernel.__name__)
+
+        self._tuned_variants[key] = variant
+        return variant
+
+    def _tune(self, queue, make_kernel, kernel_args, args, wait_for=None):
+        """Time the candidate variants of the kernel made by *make_kernel*
+        on *args* and return the fastest, or *None* if the kernel is not
+        elementwise or no variant could be run. The variants write to
+        scratch arrays in place of the arrays written by the kernel, which
+        may alias its input.
+        """
+        knl = make_kernel(*kernel_args)
+        if not _is_elementwise_kernel(knl):
+            return None
+
+        if wait_for:
+            import pyopencl as cl
+            cl.wait_for_events(wait_for)
+
+        written_variables = knl.get_written_variables()
+        args = dict(
+                (name,
+                    self.empty(queue, ary.shape, ary.dtype)
+                    if name in written_variables else ary)
+                for name, ary in six.iteritems(args))
+
+        from time import time
+
+        arg_dtypes = dict(
+                (name, ary.dtype) for name, ary in six.iteritems(args))
+        matrix_shape = _matrix_shape(args)
+
+        best_time = None
+        best_variant = None
+        for variant in _candidate_variants(knl):
+            try:
+                tuned_knl = self._get_kernel(queue, make_kernel, arg_dtypes,
+                        kernel_args, variant, matrix_shape)
+
+                # first run includes the build
+                tuned_knl(queue, **args)
+                queue.finish()
+
+                start = time()
+                for irun in range(_AUTOTUNE_NRUNS):
+                    tuned_knl(queue, **args)
+                queue.finish()
+                elapsed = time() - start
+
+            except Exception as e:
+                # e.g. work group or local memory size beyond device limits
+                logger.debug("autotuning %s: variant %s failed: %s"
+                        % (knl.name, variant, e))
+                continue
+
+            logger.debug("autotuning %s: variant %s took %g s"
+                    % (knl.name, variant, elapsed))
+            if best_time is None or elapsed < best_time:
+                best_time = elapsed
+                best_variant = variant
+
+        logger.info("autotuned %s: chose variant %s" % (knl.name, best_variant))
+        return best_variant
+
+    def _run_kernel(self, queue, make_kernel, args, kernel_args=(),
+            wait_for=None):
+        """Run the kernel made by *make_kernel* on the dictionary *args*
+        of (array) arguments, once the events *wait_for* are complete.
+
+        :returns: the event of the kernel invocation.
+        """
+        variant = None
+        if self.autotune:
+            variant = self._get_tuned_variant(
+                    queue, make_kernel, kernel_args, args, wait_for)
+
+        arg_dtypes = dict(
+                (name, ary.dtype) for name, ary in six.iteritems(args))
+        knl = self._get_kernel(queue, make_kernel, arg_dtypes, kernel_args,
+                variant, _matrix_shape(args))
+        evt, _ = knl(queue, wait_for=wait_for, **args)
+        return evt
+
+    def empty(self, queue, shape, dtype, allocator=None):
+        import pyopencl.array as cl_array
+
+        if queue is None:
+            first_arg = self.cl_context
+        else:
+            first_arg = queue
+
+        return cl_array.empty(first_arg, shape, dtype=dtype,
+                allocator=allocator)
+
+    def make_memory_pool(self):
+        import pyopencl.tools as cl_tools
+        return PooledAllocator(cl_tools.MemoryPool(
+            cl_tools.DeferredAllocator(self.cl_context)))
+
+    def from_numpy(self, queue, ary):
+        import pyopencl.array as cl_array
+        return cl_array.to_device(queue, ary).with_queue(None)
+
+    def to_numpy(self, queue, ary):
+        return ary.get(queue=queue)
+
+    def is_array(self, ary):
+        import pyopencl.array as cl_array
+        return (isinstance(ary, cl_array.Array)
+                and ary.context == self.cl_context)
+
+    def shares_memory(self, ary1, ary2):
+        if ary1.base_data is None or ary2.base_data is None:
+            # empty arrays
+            return False
+        if ary1.base_data != ary2.base_data:
+            return False
+
+        start1, end1 = _byte_extent(ary1)
+        start2, end2 = _byte_extent(ary2)
+        return start1 < end2 and start2 < end1
+
+    def stack(self, queue, arrays):
+        dtype = np.result_type(*[ary.dtype for ary in arrays])
+        result = self.empty(queue, (len(arrays),) + arrays[0].shape, dtype)
+
+        for i, ary in enumerate(arrays):
+            if ary.dtype != dtype:
+                ary = ary.astype(dtype, queue=queue)
+            result.setitem(i, ary, queue=queue)
+
+        return result
+
+    def astype(self, queue, ary, dtype):
+        return ary.astype(dtype, queue=queue)
+
+    def temporary_queue(self):
+        if self._queue is None:
+            import pyopencl as cl
+            self._queue = cl.CommandQueue(self.cl_context)
+
+        return _FinishingQueue(self._queue)
+
+    def array_events(self, ary):
+        if not self.is_array(ary):
+            return []
+        return list(ary.events)
+
+    def add_events(self, ary, events):
+        for evt in events:
+            if evt is not None:
+                ary.add_event(evt)
+
+    def apply_element_matrix(self, queue, mat, result, vec, wait_for=None):
+        if len(result.shape) == 2:
+            make_kernel = _make_element_matrix_kernel
+        elif len(result.shape) == 3:
+            make_kernel = _make_element_matrix_with_leading_axis_kernel
+        else:
+            raise ValueError("unsupported number of axes in result: %d"
+                    % len(result.shape))
+
+        return self._run_kernel(queue, make_kernel,
+                dict(mat=mat, result=result, vec=vec), wait_for=wait_for)
+
+    def apply_scaled_element_matrix(self, queue, mat, result, vec, scaling,
+            scale_before, wait_for=None):
+        if len(result.shape) not in [2, 3]:
+            raise ValueError("unsupported number of axes in result: %d"
+                    % len(result.shape))
+
+        return self._run_kernel(queue, _make_scaled_element_matrix_kernel,
+                dict(mat=mat, result=result, vec=vec, scaling=scaling),
+                kernel_args=(scale_before, len(result.shape) == 3),
+                wait_for=wait_for)
+
+    def fill_element_weights(self, queue, result, weights, wait_for=None):
+        return self._run_kernel(queue, _make_element_weights_kernel,
+                dict(result=result, weights=weights), wait_for=wait_for)
+
+    def resample_elements(self, queue, mat, result, vec,
+            source_element_indices, target_element_indices, wait_for=None):
+        if len(result.shape) == 2:
+            make_kernel = _make_resample_elements_kernel
+        elif len(result.shape) == 3:
+            make_kernel = _make_resample_elements_with_leading_axis_kernel
+        else:
+            raise ValueError("unsupported number of axes in result: %d"
+                    % len(result.shape))
+
+        return self._run_kernel(queue, make_kernel, dict(
+                resample_mat=mat, result=result, vec=vec,
+                source_element_indices=source_element_indices,
+                target_element_indices=target_element_indices),
+                wait_for=wait_for)
+
+    def apply_fused_element_matrices(self, queue, mats, mat_indices,
+            result, vec, result_node_starts, vec_node_starts, wait_for=None):
+        if len(result.shape) == 1:
+            make_kernel = _make_fused_element_matrix_kernel
+        elif len(result.shape) == 2:
+            make_kernel = _make_fused_element_matrix_with_leading_axis_kernel
+        else:
+            raise ValueError("unsupported number of axes in result: %d"
+                    % len(result.shape))
+
+        return self._run_kernel(queue, make_kernel, dict(
+                mats=mats, mat_indices=mat_indices, result=result, vec=vec,
+                result_node_starts=result_node_starts,
+                vec_node_starts=vec_node_starts),
+                wait_for=wait_for)
+
+    def fill_fused_element_weights(self, queue, weights, weight_indices,
+            result, node_starts, wait_for=None):
+        return self._run_kernel(queue, _make_fused_element_weights_kernel,
+                dict(weights=weights, weight_indices=weight_indices,
+                    result=result, node_starts=node_starts),
+                wait_for=wait_for)
+
+    def compute_geometric_factors(self, queue, diff_mats, nodes, results,
+            wait_for=None):
+        args = dict(results)
+        args.update(diff_mats=diff_mats, nodes=nodes)
+
+        return self._run_kernel(queue, _make_geometric_factors_kernel, args,
+                kernel_args=(len(diff_mats), len(nodes)), wait_for=wait_for)
+
+    def _apply_physical_derivative(self, queue, make_kernel,
+            diff_mats, inverse_jacobian, result, vec, wait_for=None):
+        return self._run_kernel(queue, make_kernel, dict(
+                diff_mats=diff_mats, inverse_jacobian=inverse_jacobian,
+                result=result, vec=vec),
+                kernel_args=inverse_jacobian.shape[:2], wait_for=wait_for)
+
+    def _reduce_nodal(self, queue, reduction, vec, p, weights=None,
+            wait_for=None):
+        nchunks = -(-vec.shape[-1] // _REDUCTION_CHUNK_SIZE)
+        vec_2d = vec.reshape((-1, vec.shape[-1]))
+
+        if p is not None and vec.dtype.kind == "c":
+            partial_dtype = np.finfo(vec.dtype).dtype
+        else:
+            partial_dtype = vec.dtype
+
+        args = dict(vec=vec_2d)
+        if weights is not None:
+            partial_dtype = np.result_type(partial_dtype, weights.dtype)
+            args["weights"] = weights
+
+        args["partial_results"] = partial_results = self.empty(queue,
+                (vec_2d.shape[0], nchunks), partial_dtype)
+
+        evt = self._run_kernel(queue, _make_nodal_reduction_kernel, args,
+                kernel_args=(reduction, p), wait_for=wait_for)
+        partial_results.add_event(evt)
+
+        partial_results = partial_results.get(queue=queue)
+        if reduction == "sum":
+            result = np.sum(partial_results, axis=-1)
+        else:
+            result = np.max(partial_results, axis=-1)
+
+        return result.reshape(vec.shape[:-1])
+
+    def weighted_sums(self, queue, weights, vec, p=None, wait_for=None):
+        return self._reduce_nodal(queue, "sum", vec, p, weights=weights,
+                wait_for=wait_for)
+
+    def max_abs(self, queue, vec, wait_for=None):
+        return self._reduce_nodal(queue, "max", vec, p=1, wait_for=wait_for)
+
+    def apply_grad(self, queue, diff_mats, inverse_jacobian, result, vec,
+            wait_for=None):
+        return self._apply_physical_derivative(queue, _make_grad_kernel,
+                diff_mats, inverse_jacobian, result, vec, wait_for=wait_for)
+
+    def apply_div(self, queue, diff_mats, inverse_jacobian, result, vec,
+            wait_for=None):
+        return self._apply_physical_derivative(queue, _make_div_kernel,
+                diff_mats, inverse_jacobian, result, vec, wait_for=wait_for)
+
+# }}}
+
+
+# {{{ numpy
+
+class _NoQueue(object):
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+class NumpyArrayContext(ArrayContext):
+    """An array context using :class:`numpy.ndarray` instances on the host,
+    with operations carried out by :func:`numpy.einsum`. It needs neither
+    :mod:`pyopencl` nor :mod:`loopy`. *queue* arguments are ignored.
+    """
+
+    def __eq__(self, other):
+        return type(self) is type(other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(type(self))
+
+    def empty(self, queue, shape, dtype, allocator=None):
+        return np.empty(shape, dtype=dtype)
+
+    def from_numpy(self, queue, ary):
+        return ary.copy()
+
+    def to_numpy(self, queue, ary):
+        return ary
+
+    def is_array(self, ary):
+        return isinstance(ary, np.ndarray) and ary.dtype.char != "O"
+
+    def shares_memory(self, ary1, ary2):
+        return np.shares_memory(ary1, ary2)
+
+    def stack(self, queue, arrays):
+        dtype = np.result_type(*[ary.dtype for ary in arrays])
+        return np.array(arrays, dtype=dtype)
+
+    def astype(self, queue, ary, dtype):
+        return ary.astype(dtype)
+
+    def temporary_queue(self):
+        return _NoQueue()
+
+    def apply_element_matrix(self, queue, mat, result, vec, wait_for=None):
+        np.einsum("ij,...kj->...ki", mat, vec, out=result)
+
+    def apply_scaled_element_matrix(self, queue, mat, result, vec, scaling,
+            scale_before, wait_for=None):
+        if scale_before:
+            np.einsum("ij,kj,...kj->...ki", mat, scaling, vec, out=result)
+        else:
+            np.einsum("ij,...kj->...ki", mat, vec, out=result)
+            result *= scaling
+
+    def fill_element_weights(self, queue, result, weights, wait_for=None):
+        result[...] = weights
+
+    def resample_elements(self, queue, mat, result, vec,
+            source_element_indices, target_element_indices, wait_for=None):
+        result[..., target_element_indices, :] = np.einsum(
+                "ij,...kj->...ki", mat, vec[..., source_element_indices, :])
+
+    def apply_fused_element_matrices(self, queue, mats, mat_indices,
+            result, vec, result_node_starts, vec_node_starts, wait_for=None):
+        _, n_to_nodes, n_from_nodes = mats.shape
+        result_idx = result_node_starts[:, np.newaxis] + np.arange(n_to_nodes)
+        vec_idx = vec_node_starts[:, np.newaxis] + np.arange(n_from_nodes)
+
+        result[..., result_idx] = np.einsum(
+                "kij,...kj->...ki", mats[mat_indices], vec[..., vec_idx])
+
+    def fill_fused_element_weights(self, queue, weights, weight_indices,
+            result, node_starts, wait_for=None):
+        nunit_nodes = weights.shape[-1]
+        result[node_starts[:, np.newaxis] + np.arange(nunit_nodes)] = \
+                weights[weight_indices]
+
+    def compute_geometric_factors(self, queue, diff_mats, nodes, results,
+            wait_for=None):
+        jac = np.einsum("rij,akj->arki", diff_mats, nodes)
+        factors = _geometric_factor_expressions(
+                [list(jac_a) for jac_a in jac], np.sqrt)
+
+        for name, result in six.iteritems(results):
+            result[...] = factors[name]
+
+    def apply_grad(self, queue, diff_mats, inverse_jacobian, result, vec,
+            wait_for=None):
+        ref_derivs = np.einsum("rij,kj->rki", diff_mats, vec)
+        np.einsum("raki,rki->aki", inverse_jacobian, ref_derivs, out=result)
+
+    def apply_div(self, queue, diff_mats, inverse_jacobian, result, vec,
+            wait_for=None):
+        ref_derivs = np.einsum("rij,akj->arki", diff_mats, vec)
+        np.einsum("raki,arki->ki", inverse_jacobian, ref_derivs, out=result)
+
+    def weighted_sums(self, queue, weights, vec, p=None, wait_for=None):
+        if p is not None:
+            vec = np.abs(vec)**p
+        return np.asarray(np.einsum("i,...i->...", weights, vec))
+
+    def max_abs(self, queue, vec, wait_for=None):
+        return np.max(np.abs(vec), axis=-1)
+
+# }}}
+
+
+def make_array_context(context):
+    """Return *context* if it is an :class:`ArrayContext`. Otherwise,
+    *context* is taken to be a :class:`pyopencl.Context`, and a
+    :class:`PyOpenCLArrayContext` for it is returned.
+    """
+    if isinstance(context, ArrayContext):
+        return context
+    else:
+        return PyOpenCLArrayContext(context)
+
+# vim: foldmethod=marker
@@ -23,9 +23,7 @@ THE SOFTWARE.
 """
 
 import numpy as np
-from pytools import memoize_method, memoize_method_nested
-import loopy as lp
-import pyopencl as cl
+from pytools import memoize_method
 
 __doc__ = """
 .. autoclass:: ElementGroupBase
@@ -34,6 +32,115 @@ __doc__ = """
 """
 
 
+# {{{ multi-vector helper
+
+def _with_stacked_object_array(actx, queue, vec, f, out=None):
+    """Apply *f*, which accepts arrays with a leading vector axis and an
+    optional preallocated result, to *vec*.
+
+    If *vec* is an object array of arrays, these are stacked so that *f*
+    is invoked only once, and an object array of the resulting rows is
+    returned. If *out* is an object array, *f* is instead invoked once
+    per entry, so that results are written to the entries of *out*.
+    """
+    if not (isinstance(vec, np.ndarray) and vec.dtype.char == "O"):
+        return f(vec, out)
+
+    from pytools.obj_array import with_object_array_or_scalar, make_obj_array
+
+    if out is not None and isinstance(out, np.ndarray) and out.dtype.char == "O":
+        if out.shape != vec.shape:
+            raise ValueError("'out' must have as many entries as the input")
+        return make_obj_array([f(v, o) for v, o in zip(vec, out)])
+
+    if not all(actx.is_array(v) for v in vec):
+        if out is not None:
+            raise ValueError("'out' must be an object array if the input "
+                    "contains non-array entries")
+        return with_object_array_or_scalar(lambda v: f(v, None), vec)
+
+    result = f(actx.stack(queue, list(vec)), out)
+
+    rows = [result[i] for i in range(len(vec))]
+    for row in rows:
+        actx.add_events(row, actx.array_events(result))
+    return make_obj_array(rows)
+
+
+def _wait_for(actx, wait_for, *arrays):
+    """Return the events in *wait_for* along with those pending on
+    *arrays*, which may contain *None*.
+    """
+    result = list(wait_for or [])
+    for ary in arrays:
+        if ary is not None:
+            result.extend(actx.array_events(ary))
+    return result
+
+# }}}
+
+
+# {{{ group fusion
+
+def _element_node_starts(node_nr_base, nunit_nodes, element_indices):
+    return (node_nr_base + nunit_nodes*element_indices).astype(np.int32)
+
+
+def _make_fused_plan(actx, queue, entries):
+    """Concatenate per-group data into tables, so that all element groups
+    can be processed by a single kernel launch.
+
+    :arg entries: a list of tuples ``(table_entry, result_node_starts,
+        vec_node_starts)``. *table_entry* is a :class:`numpy.ndarray`
+        (such as an element matrix) applying to the elements whose first
+        nodes in the result and the input vector are given by the
+        host arrays *result_node_starts* and *vec_node_starts*.
+        *vec_node_starts* may be *None*.
+    :returns: a list of tuples ``(table, table_indices, result_node_starts,
+        vec_node_starts)`` of arrays in *actx*, one for each distinct
+        shape of *table_entry*.
+    """
+    by_shape = {}
+    for table_entry, result_node_starts, vec_node_starts in entries:
+        if len(result_node_starts):
+            by_shape.setdefault(table_entry.shape, []).append(
+                    (table_entry, result_node_starts, vec_node_starts))
+
+    plan = []
+    for shape in sorted(by_shape):
+        shape_entries = by_shape[shape]
+
+        table = np.array([table_entry for table_entry, _, _ in shape_entries])
+        table_indices = np.concatenate([
+            np.zeros(len(result_node_starts), dtype=np.int32) + i
+            for i, (_, result_node_starts, _) in enumerate(shape_entries)])
+        result_node_starts = np.concatenate([
+            rns for _, rns, _ in shape_entries])
+        if shape_entries[0][2] is None:
+            vec_node_starts = None
+        else:
+            vec_node_starts = np.concatenate([
+                vns for _, _, vns in shape_entries])
+
+        plan.append(tuple(
+            ary if ary is None else actx.from_numpy(queue, ary)
+            for ary in [
+                table, table_indices, result_node_starts, vec_node_starts]))
+
+    return plan
+
+
+def _apply_fused_matrix_plan(actx, queue, plan, result, vec, wait_for=None):
+    return [
+            actx.apply_fused_element_matrices(queue, mats, mat_indices,
+                result, vec, result_node_starts, vec_node_starts,
+                wait_for=wait_for)
+            for mats, mat_indices, result_node_starts, vec_node_starts
+            in plan]
+
+# }}}
+
+
 # {{{ element group base
 
 class ElementGroupBase(object):
@@ -115,6 +222,12 @@ class Discretization(object):
 
     .. attribute:: real_dtype
 
+        The dtype of :meth:`nodes`, :meth:`quad_weights`, the geometric
+        factors and the reference matrices applied by all operations. These
+        are computed in double precision and converted once, so that with
+        :class:`numpy.float32`, operations on single precision data do not
+        involve double precision.
+
     .. attribute:: complex_dtype
 
     .. attribute:: mesh
@@ -127,26 +240,165 @@ class Discretization(object):
 
     .. attribute :: groups
 
+    .. attribute :: array_context
+
+        The :class:`meshmode.array_context.ArrayContext` through which
+        arrays are allocated and operations are carried out.
+
+    .. attribute :: cl_context
+
+        The :class:`pyopencl.Context` in use, or *None* if
+        :attr:`array_context` is not based on OpenCL.
+
     .. method:: empty(dtype, queue=None, extra_dims=None)
 
+        Results of all operations are allocated by this method, from
+        :attr:`memory_pool` if one is in use.
+
+    Operations do not wait for their kernels to complete. They wait for
+    the events in *wait_for* and for those pending on their input (and
+    *out*) arrays, and record the events of their kernels on their result,
+    as in :attr:`pyopencl.array.Array.events`. Kernels for different
+    element groups do not wait for each other, so that they may overlap on
+    an out-of-order queue. Input arrays should then be kept alive until
+    the result is complete, since memory pools do not track events.
+
+    Operations taking an *out* argument write their result into it instead
+    of allocating a new array. It must be a contiguous array of this
+    discretization's array context with the shape and dtype of the result,
+    and it must not share memory with the input, e.g. as a view of it.
+    For an object array input, *out* may be an object array of such
+    arrays or a single array with a leading vector axis.
+
+    .. attribute :: memory_pool
+
+        A :class:`meshmode.array_context.PooledAllocator` or *None*.
+
+    .. attribute :: memory_pool_statistics
+
+        The :class:`meshmode.array_context.MemoryPoolStatistics` of
+        :attr:`memory_pool`, or *None*.
+
     .. method:: nodes()
 
         shape: ``(ambient_dim, nnodes)``
 
-    .. method:: num_reference_derivative(queue, ref_axes, vec)
+    .. method:: num_reference_derivative(queue, ref_axes, vec, out=None, \
+            wait_for=None)
+
+        *vec* may be of shape ``(nnodes)``, of shape ``(nvectors, nnodes)``,
+        or an object array of arrays of shape ``(nnodes)``. All vectors
+        are differentiated by a single kernel invocation per group.
+
+    .. method:: quad_weights(queue, out=None, wait_for=None)
+
+        shape: ``(nnodes)``
+
+    .. rubric:: Geometric factors
 
-    .. method:: quad_weights(queue)
+    These are computed once, by a single kernel per group, and kept in
+    :attr:`array_context`.
+
+    .. method:: jacobian()
+
+        shape: ``(ambient_dim, dim, nnodes)``
+
+    .. method:: inverse_jacobian()
+
+        shape: ``(dim, ambient_dim, nnodes)``. The pseudo-inverse
+        if ``dim < ambient_dim``.
+
+    .. method:: jacobian_determinant()
+
+        shape: ``(nnodes)``. Only if ``dim == ambient_dim``.
+
+    .. method:: area_element()
 
         shape: ``(nnodes)``
+
+    .. method:: normals()
+
+        shape: ``(ambient_dim, nnodes)``. Only if ``dim == ambient_dim - 1``.
+
+    .. rubric:: Physical-space derivatives
+
+    These apply the reference derivatives and the chain rule with
+    :meth:`inverse_jacobian` in a single kernel per group. On manifolds
+    (``dim < ambient_dim``), they give the surface gradient and divergence.
+
+    .. method:: grad(queue, vec, wait_for=None)
+
+        *vec* has shape ``(nnodes)``, the result has shape
+        ``(ambient_dim, nnodes)``.
+
+    .. method:: div(queue, vec, wait_for=None)
+
+        *vec* has shape ``(ambient_dim, nnodes)`` or is an object array
+        of arrays of shape ``(nnodes)``. The result has shape ``(nnodes)``.
+
+    .. rubric:: Mass matrices
+
+    These evaluate the integrals on each element by a quadrature rule
+    that is exact for the mass matrix of a volume element with polynomial
+    :meth:`area_element` ``J`` (see the element groups'
+    ``mass_quadrature_interp_matrix``), with ``J`` interpolated to its
+    nodes. They run as two kernels per group. *vec* may be of shape
+    ``(nnodes)``, of shape ``(nvectors, nnodes)`` or an object array.
+
+    .. method:: apply_mass(queue, vec, wait_for=None)
+
+        Applies the mass matrix ``M_J``, with entries
+        ``integral(l_i l_j J)`` over the reference element for the
+        Lagrange basis functions ``l_i``. ``M_J`` is symmetric.
+
+    .. method:: apply_inverse_mass(queue, vec, wait_for=None)
+
+        Applies the weight-adjusted approximation
+        ``M^{-1} M_{1/J} M^{-1}`` of ``M_J^{-1}``, where ``M`` is the
+        reference mass matrix and ``M_{1/J}`` is weighted by ``1/J``
+        instead of ``J``. This is the exact inverse of :meth:`apply_mass`
+        on affine elements. On curved elements, its error decreases with
+        the deviation of ``J`` from a constant.
+
+    .. rubric:: Reductions
+
+    These take the quadrature weights and :meth:`area_element` into
+    account in a single pass over *vec*, which may be of shape
+    ``(nnodes)``, of shape ``(nvectors, nnodes)`` or an object array of
+    arrays of shape ``(nnodes)``. They return a scalar in the first case,
+    and a :class:`numpy.ndarray` of shape ``(nvectors,)`` otherwise.
+
+    .. method:: integral(queue, vec, wait_for=None)
+
+    .. method:: norm(queue, vec, p=2, wait_for=None)
+
+        *p* may be :data:`numpy.inf`.
     """
 
-    def __init__(self, cl_ctx, mesh, group_factory, real_dtype=np.float64):
+    def __init__(self, context, mesh, group_factory, real_dtype=np.float64,
+            fuse_groups=False, memory_pool=None):
         """
+        :arg context: a :class:`pyopencl.Context` or a
+            :class:`meshmode.array_context.ArrayContext`, such as a
+            :class:`meshmode.array_context.NumpyArrayContext` to work
+            on host arrays without OpenCL.
         :arg order: A polynomial-order-like parameter passed unmodified to
             :attr:`group_class`. See subclasses for more precise definition.
+        :arg fuse_groups: If *True*, element-local operations on all groups
+            with the same number of unit nodes are carried out by a single
+            kernel launch, driven by tables of per-element node offsets and
+            matrix indices, rather than by one launch per group. This pays
+            off on meshes with many small groups. Also applies to
+            connections whose *to_discr* is this discretization.
+        :arg memory_pool: If *True*, allocate arrays from a new memory pool
+            made by :meth:`meshmode.array_context.ArrayContext.make_memory_pool`,
+            to avoid a fresh allocation for every result. May also be such a
+            pool, to share it among discretizations.
         """
 
-        self.cl_context = cl_ctx
+        from meshmode.array_context import make_array_context
+        self.array_context = make_array_context(context)
+        self.cl_context = self.array_context.cl_context
 
         self.mesh = mesh
         self.nnodes = 0
@@ -156,6 +408,14 @@ class Discretization(object):
             self.groups.append(ng)
             self.nnodes += ng.nnodes
 
+        self.fuse_groups = fuse_groups
+
+        if memory_pool is True:
+            memory_pool = self.array_context.make_memory_pool()
+        elif memory_pool is False:
+            memory_pool = None
+        self.memory_pool = memory_pool
+
         self.real_dtype = np.dtype(real_dtype)
         self.complex_dtype = {
                 np.float32: np.complex64,
@@ -171,95 +431,441 @@ class Discretization(object):
         return self.mesh.ambient_dim
 
     def empty(self, dtype, queue=None, extra_dims=None):
-        if queue is None:
-            first_arg = self.cl_context
-        else:
-            first_arg = queue
+        shape = (self.nnodes,)
+        if extra_dims is not None:
+            shape = extra_dims + shape
+
+        return self.array_context.empty(queue, shape, dtype,
+                allocator=self.memory_pool)
+
+    def _result_array(self, out, dtype, queue=None, extra_dims=None,
+            vec=None):
+        """Return *out* after checking that it can hold a result of
+        *dtype* and *extra_dims* computed from *vec*, or a new array if
+        *out* is *None*.
+        """
+        if out is None:
+            return self.empty(dtype, queue=queue, extra_dims=extra_dims)
 
         shape = (self.nnodes,)
         if extra_dims is not None:
             shape = extra_dims + shape
 
-        return cl.array.empty(first_arg, shape, dtype=dtype)
+        if not self.array_context.is_array(out):
+            raise TypeError("'out' must be an array of the discretization's "
+                    "array context")
+        if out.shape != shape:
+            raise ValueError("'out' has shape %s, expected %s"
+                    % (out.shape, shape))
+        if out.dtype != dtype:
+            raise ValueError("'out' has dtype %s, expected %s"
+                    % (out.dtype, np.dtype(dtype)))
+        if not out.flags.c_contiguous:
+            raise ValueError("'out' must be contiguous")
+        if (vec is not None and self.array_context.is_array(vec)
+                and self.array_context.shares_memory(out, vec)):
+            raise ValueError("'out' must not share memory with the input")
+
+        return out
+
+    @property
+    def memory_pool_statistics(self):
+        if self.memory_pool is None:
+            return None
+        return self.memory_pool.statistics
 
     def num_reference_derivative(
-            self, queue, ref_axes, vec):
-        @memoize_method_nested
-        def knl():
-            knl = lp.make_kernel(
-                """{[k,i,j]:
-                    0<=k<nelements and
-                    0<=i,j<ndiscr_nodes}""",
-                "result[k,i] = sum(j, diff_mat[i, j] * vec[k, j])",
-                default_offset=lp.auto, name="diff")
+            self, queue, ref_axes, vec, out=None, wait_for=None):
+        return _with_stacked_object_array(self.array_context, queue, vec,
+                lambda v, o: self._num_reference_derivative(
+                    queue, ref_axes, v, o, wait_for),
+                out=out)
+
+    def _num_reference_derivative(self, queue, ref_axes, vec, out=None,
+            wait_for=None):
+        if vec.shape[-1] != self.nnodes or len(vec.shape) > 2:
+            raise ValueError("invalid shape of vector to differentiate")
+
+        actx = self.array_context
+        wait_for = _wait_for(actx, wait_for, vec, out)
+        result = self._result_array(out, vec.dtype, queue=queue,
+                extra_dims=vec.shape[:-1], vec=vec)
+
+        if self.fuse_groups:
+            events = _apply_fused_matrix_plan(actx, queue,
+                    self._fused_derivative_plan(ref_axes), result, vec,
+                    wait_for=wait_for)
+        else:
+            events = [
+                    actx.apply_element_matrix(queue,
+                        self._derivative_matrix(grp, ref_axes),
+                        grp.view(result), grp.view(vec), wait_for=wait_for)
+                    for grp in self.groups]
 
-            knl = lp.split_iname(knl, "i", 16, inner_tag="l.0")
-            return lp.tag_inames(knl, dict(k="g.0"))
+        actx.add_events(result, events)
+        return result
 
-        result = self.empty(vec.dtype)
+    # {{{ reference data in real_dtype
 
-        for grp in self.groups:
-            mat = None
-            for ref_axis in ref_axes:
-                next_mat = grp.diff_matrices()[ref_axis]
-                if mat is None:
-                    mat = next_mat
-                else:
-                    mat = np.dot(next_mat, mat)
+    # These are computed in double precision by the element groups and
+    # kept in the array context, so that applying them does not involve
+    # a (blocking) host-to-device transfer.
+
+    def _to_array_context(self, ary):
+        with self.array_context.temporary_queue() as queue:
+            return self.array_context.from_numpy(queue, ary)
 
-            knl()(queue, diff_mat=mat, result=grp.view(result), vec=grp.view(vec))
+    @memoize_method
+    def _derivative_matrix(self, grp, ref_axes):
+        return self._to_array_context(
+                _reference_derivative_matrix(grp, ref_axes).astype(
+                    self.real_dtype))
+
+    @memoize_method
+    def _diff_matrices(self, grp):
+        return self._to_array_context(
+                np.array(grp.diff_matrices(), dtype=self.real_dtype))
+
+    @memoize_method
+    def _quad_weights(self, grp):
+        return self._to_array_context(grp.weights.astype(self.real_dtype))
 
+    @memoize_method
+    def _mass_quadrature_matrices(self, grp, inverse):
+        """Return *(to_quad, from_quad)*, interpolating to the mass
+        quadrature nodes of *grp* and integrating against its basis there.
+        With *inverse*, both are composed with the inverse reference mass
+        matrix.
+        """
+        to_quad = grp.mass_quadrature_interp_matrix()
+        from_quad = (np.ascontiguousarray(to_quad.T)
+                * grp.mass_quadrature_weights())
+
+        if inverse:
+            inv_mass = grp.inverse_mass_matrix()
+            to_quad = np.dot(to_quad, inv_mass)
+            from_quad = np.dot(inv_mass, from_quad)
+
+        return (
+                self._to_array_context(to_quad.astype(self.real_dtype)),
+                self._to_array_context(from_quad.astype(self.real_dtype)))
+
+    # }}}
+
+    def _element_node_starts(self, grp):
+        return _element_node_starts(grp.node_nr_base, grp.nunit_nodes,
+                np.arange(grp.nelements))
+
+    @memoize_method
+    def _fused_derivative_plan(self, ref_axes):
+        with self.array_context.temporary_queue() as queue:
+            return _make_fused_plan(self.array_context, queue, [
+                (_reference_derivative_matrix(grp, ref_axes).astype(
+                    self.real_dtype),
+                    self._element_node_starts(grp),
+                    self._element_node_starts(grp))
+                for grp in self.groups])
+
+    @memoize_method
+    def _fused_weights_plan(self):
+        with self.array_context.temporary_queue() as queue:
+            return _make_fused_plan(self.array_context, queue, [
+                (grp.weights.astype(self.real_dtype),
+                    self._element_node_starts(grp), None)
+                for grp in self.groups])
+
+    def quad_weights(self, queue, out=None, wait_for=None):
+        actx = self.array_context
+        wait_for = _wait_for(actx, wait_for, out)
+        result = self._result_array(out, self.real_dtype, queue=queue)
+
+        if self.fuse_groups:
+            events = [
+                    actx.fill_fused_element_weights(queue,
+                        weights, weight_indices, result, node_starts,
+                        wait_for=wait_for)
+                    for weights, weight_indices, node_starts, _
+                    in self._fused_weights_plan()]
+        else:
+            events = [
+                    actx.fill_element_weights(queue,
+                        grp.view(result), self._quad_weights(grp),
+                        wait_for=wait_for)
+                    for grp in self.groups]
+
+        actx.add_events(result, events)
         return result
 
-    def quad_weights(self, queue):
-        @memoize_method_nested
-        def knl():
-            knl = lp.make_kernel(
-                "{[k,i]: 0<=k<nelements and 0<=i<ndiscr_nodes}",
-                "result[k,i] = weights[i]",
-                name="quad_weights")
+    def _double_precision_nodes(self):
+        result = self.empty(np.float64, extra_dims=(self.ambient_dim,))
 
-            knl = lp.split_iname(knl, "i", 16, inner_tag="l.0")
-            return lp.tag_inames(knl, dict(k="g.0"))
+        if self.fuse_groups:
+            with self.array_context.temporary_queue() as queue:
+                self._fused_nodes(queue, result)
+            return result
+
+        with self.array_context.temporary_queue() as queue:
+            for grp in self.groups:
+                meg = grp.mesh_el_group
+                self.array_context.apply_element_matrix(queue,
+                        grp.resampling_matrix(), grp.view(result), meg.nodes)
 
-        result = self.empty(self.real_dtype)
-        for grp in self.groups:
-            knl()(queue, result=grp.view(result), weights=grp.weights)
         return result
 
     @memoize_method
     def nodes(self):
-        @memoize_method_nested
-        def knl():
-            knl = lp.make_kernel(
-                """{[d,k,i,j]:
-                    0<=d<dims and
-                    0<=k<nelements and
-                    0<=i<ndiscr_nodes and
-                    0<=j<nmesh_nodes}""",
-                """
-                    result[d, k, i] = \
-                        sum(j, resampling_mat[i, j] * nodes[d, k, j])
-                    """,
-                name="nodes",
-                default_offset=lp.auto)
-
-            knl = lp.split_iname(knl, "i", 16, inner_tag="l.0")
-            knl = lp.tag_inames(knl, dict(k="g.0"))
-            knl = lp.tag_data_axes(knl, "result",
-                    "stride:auto,stride:auto,stride:auto")
-            return knl
-
-        result = self.empty(self.real_dtype, extra_dims=(self.ambient_dim,))
-
-        with cl.CommandQueue(self.cl_context) as queue:
+        nodes = self._double_precision_nodes()
+        if nodes.dtype == self.real_dtype:
+            return nodes
+
+        with self.array_context.temporary_queue() as queue:
+            return self.array_context.astype(queue, nodes, self.real_dtype)
+
+    def _fused_nodes(self, queue, result):
+        actx = self.array_context
+
+        entries = []
+        mesh_node_nr_base = 0
+        for grp in self.groups:
+            meg = grp.mesh_el_group
+            entries.append((
+                grp.resampling_matrix(),
+                self._element_node_starts(grp),
+                _element_node_starts(mesh_node_nr_base, meg.nunit_nodes,
+                    np.arange(meg.nelements))))
+            mesh_node_nr_base += meg.nelements * meg.nunit_nodes
+
+        mesh_nodes = actx.from_numpy(queue, np.concatenate([
+            grp.mesh_el_group.nodes.reshape(self.ambient_dim, -1)
+            for grp in self.groups], axis=-1))
+
+        _apply_fused_matrix_plan(actx, queue,
+                _make_fused_plan(actx, queue, entries), result, mesh_nodes)
+
+    # {{{ geometric factors
+
+    @memoize_method
+    def _geometric_factors(self):
+        from meshmode.array_context import geometric_factor_names
+        factor_names = geometric_factor_names(self.dim, self.ambient_dim)
+
+        factors = dict(
+                (name, self.empty(np.float64, extra_dims=shape or None))
+                for name, shape in factor_names.items())
+
+        if self.real_dtype == np.float64:
+            nodes = self.nodes()
+        else:
+            nodes = self._double_precision_nodes()
+
+        actx = self.array_context
+        with actx.temporary_queue() as queue:
             for grp in self.groups:
-                meg = grp.mesh_el_group
-                knl()(queue,
-                        resampling_mat=grp.resampling_matrix(),
-                        result=grp.view(result), nodes=meg.nodes)
+                actx.compute_geometric_factors(queue,
+                        np.array(grp.diff_matrices()), grp.view(nodes),
+                        dict(
+                            (name, grp.view(ary))
+                            for name, ary in factors.items()))
+
+            if self.real_dtype != np.float64:
+                factors = dict(
+                        (name, actx.astype(queue, ary, self.real_dtype))
+                        for name, ary in factors.items())
+
+        return factors
+
+    def _get_geometric_factor(self, name):
+        try:
+            return self._geometric_factors()[name]
+        except KeyError:
+            raise ValueError("'%s' is not available for %dD elements "
+                    "in %dD" % (name, self.dim, self.ambient_dim))
+
+    def jacobian(self):
+        return self._get_geometric_factor("jacobian")
+
+    def inverse_jacobian(self):
+        return self._get_geometric_factor("inverse_jacobian")
+
+    def jacobian_determinant(self):
+        return self._get_geometric_factor("jacobian_determinant")
+
+    def area_element(self):
+        return self._get_geometric_factor("area_element")
+
+    def normals(self):
+        return self._get_geometric_factor("normals")
+
+    # }}}
+
+    # {{{ mass matrices
+
+    @memoize_method
+    def _mass_quadrature_area_elements(self, inverse):
+        """Return a list with, for each group, the area element (or its
+        reciprocal, with *inverse*) at the mass quadrature nodes, of shape
+        ``(nelements, nquad_nodes)``.
+        """
+        actx = self.array_context
+
+        with actx.temporary_queue() as queue:
+            area_element = actx.to_numpy(queue, self.area_element())
+
+            result = []
+            for grp in self.groups:
+                quad_area_element = np.dot(grp.view(area_element),
+                        grp.mass_quadrature_interp_matrix().T)
+                if inverse:
+                    quad_area_element = 1/quad_area_element
 
+                result.append(actx.from_numpy(queue,
+                    quad_area_element.astype(self.real_dtype)))
+
+        return result
+
+    def _apply_scaled_mass(self, queue, vec, inverse, wait_for=None):
+        if vec.shape[-1] != self.nnodes or len(vec.shape) > 2:
+            raise ValueError("invalid shape of vector")
+
+        actx = self.array_context
+        wait_for = _wait_for(actx, wait_for, vec)
+        result = self.empty(vec.dtype, queue=queue, extra_dims=vec.shape[:-1])
+
+        events = []
+        for grp, quad_area_element in zip(self.groups,
+                self._mass_quadrature_area_elements(inverse)):
+            to_quad, from_quad = self._mass_quadrature_matrices(grp, inverse)
+
+            # not from the memory pool, which could hand out the memory
+            # again before the kernels using it have completed
+            quad_vec = actx.empty(queue,
+                    vec.shape[:-1] + quad_area_element.shape, vec.dtype)
+
+            evt = actx.apply_element_matrix(queue, to_quad,
+                    quad_vec, grp.view(vec), wait_for=wait_for)
+            events.append(actx.apply_scaled_element_matrix(queue,
+                    from_quad, grp.view(result), quad_vec, quad_area_element,
+                    scale_before=True, wait_for=[evt]))
+
+        actx.add_events(result, events)
         return result
 
+    def apply_mass(self, queue, vec, wait_for=None):
+        return _with_stacked_object_array(self.array_context, queue, vec,
+                lambda v, o: self._apply_scaled_mass(queue, v, inverse=False,
+                    wait_for=wait_for))
+
+    def apply_inverse_mass(self, queue, vec, wait_for=None):
+        return _with_stacked_object_array(self.array_context, queue, vec,
+                lambda v, o: self._apply_scaled_mass(queue, v, inverse=True,
+                    wait_for=wait_for))
+
+    # }}}
+
+    # {{{ reductions
+
+    @memoize_method
+    def _integration_weights(self):
+        actx = self.array_context
+
+        with actx.temporary_queue() as queue:
+            return actx.from_numpy(queue,
+                    actx.to_numpy(queue, self.quad_weights(queue))
+                    * actx.to_numpy(queue, self.area_element()))
+
+    def _prepare_reduction_input(self, queue, vec):
+        if isinstance(vec, np.ndarray) and vec.dtype.char == "O":
+            vec = self.array_context.stack(queue, list(vec))
+
+        if vec.shape[-1] != self.nnodes or len(vec.shape) > 2:
+            raise ValueError("invalid shape of vector to reduce")
+
+        return vec
+
+    def integral(self, queue, vec, wait_for=None):
+        vec = self._prepare_reduction_input(queue, vec)
+        result = self.array_context.weighted_sums(queue,
+                self._integration_weights(), vec,
+                wait_for=_wait_for(self.array_context, wait_for, vec))
+
+        if result.shape == ():
+            result = result[()]
+        return result
+
+    def norm(self, queue, vec, p=2, wait_for=None):
+        vec = self._prepare_reduction_input(queue, vec)
+        wait_for = _wait_for(self.array_context, wait_for, vec)
+
+        if p == np.inf:
+            result = self.array_context.max_abs(queue, vec,
+                    wait_for=wait_for)
+        else:
+            result = self.array_context.weighted_sums(queue,
+                    self._integration_weights(), vec, p=p,
+                    wait_for=wait_for)**(1/p)
+
+        if result.shape == ():
+            result = result[()]
+        return result
+
+    # }}}
+
+    # {{{ physical-space derivatives
+
+    def grad(self, queue, vec, wait_for=None):
+        if vec.shape != (self.nnodes,):
+            raise ValueError("invalid shape of vector to differentiate")
+
+        actx = self.array_context
+        wait_for = _wait_for(actx, wait_for, vec)
+        result = self.empty(vec.dtype, queue=queue,
+                extra_dims=(self.ambient_dim,))
+        inverse_jacobian = self.inverse_jacobian()
+
+        actx.add_events(result, [
+            actx.apply_grad(queue,
+                self._diff_matrices(grp),
+                grp.view(inverse_jacobian),
+                grp.view(result), grp.view(vec), wait_for=wait_for)
+            for grp in self.groups])
+
+        return result
+
+    def div(self, queue, vec, wait_for=None):
+        actx = self.array_context
+
+        if isinstance(vec, np.ndarray) and vec.dtype.char == "O":
+            vec = actx.stack(queue, list(vec))
+
+        if vec.shape != (self.ambient_dim, self.nnodes):
+            raise ValueError("invalid shape of vector to differentiate")
+
+        wait_for = _wait_for(actx, wait_for, vec)
+        result = self.empty(vec.dtype, queue=queue)
+        inverse_jacobian = self.inverse_jacobian()
+
+        actx.add_events(result, [
+            actx.apply_div(queue,
+                self._diff_matrices(grp),
+                grp.view(inverse_jacobian),
+                grp.view(result), grp.view(vec), wait_for=wait_for)
+            for grp in self.groups])
+
+        return result
+
+    # }}}
+
+
+def _reference_derivative_matrix(grp, ref_axes):
+    mat = None
+    for ref_axis in ref_axes:
+        next_mat = grp.diff_matrices()[ref_axis]
+        if mat is None:
+            mat = next_mat
+        else:
+            mat = np.dot(next_mat, mat)
+
+    return mat
+
 
 # vim: fdm=marker
@@ -28,9 +28,7 @@ THE SOFTWARE.
 
 import numpy as np
 import modepy as mp
-import pyopencl as cl
-import pyopencl.array  # noqa
-from pytools import memoize_method, memoize_method_nested, Record
+from pytools import memoize_method, Record
 
 import logging
 logger = logging.getLogger(__name__)
@@ -63,15 +61,19 @@ class InterpolationBatch(object):
 
     .. attribute:: source_element_indices
 
-        A :class:`pyopencl.array.Arrays` of length ``nelements``, containing the
-        element index from which this "*to*" element's data will be
-        interpolated.
+        An array of the connection's
+        :class:`meshmode.array_context.ArrayContext` (such as a
+        :class:`pyopencl.array.Array`) of length ``nelements``, containing the
+        element index (within its group) from which this "*to*" element's
+        data will be interpolated.
 
     .. attribute:: target_element_indices
 
-        A :class:`pyopencl.array.Arrays` of length ``nelements``, containing the
-        element index to which this "*to*" element's data will be
-        interpolated.
+        An array of the connection's
+        :class:`meshmode.array_context.ArrayContext` (such as a
+        :class:`pyopencl.array.Array`) of length ``nelements``, containing the
+        element index (within its group) to which this "*to*" element's
+        data will be interpolated.
 
     .. attribute:: result_unit_nodes
 
@@ -117,10 +119,11 @@ class DiscretizationConnection(object):
     """
 
     def __init__(self, from_discr, to_discr, groups):
-        if from_discr.cl_context != to_discr.cl_context:
-            raise ValueError("from_discr and to_discr must live in the "
-                    "same OpenCL context")
+        if from_discr.array_context != to_discr.array_context:
+            raise ValueError("from_discr and to_discr must use the "
+                    "same array context")
 
+        self.array_context = from_discr.array_context
         self.cl_context = from_discr.cl_context
 
         self.from_discr = from_discr
@@ -133,54 +136,104 @@ class DiscretizationConnection(object):
         ibatch = self.groups[elgroup_index].batches[ibatch_index]
         from_grp = self.from_discr.groups[elgroup_index]
 
+        # computed in double precision, applied in to_discr's precision
         return mp.resampling_matrix(
                 mp.simplex_onb(self.from_discr.dim, from_grp.order),
-                ibatch.result_unit_nodes, from_grp.unit_nodes)
-
-    def __call__(self, queue, vec):
-        @memoize_method_nested
-        def knl():
-            import loopy as lp
-            knl = lp.make_kernel(
-                """{[k,i,j]:
-                    0<=k<nelements and
-                    0<=i<n_to_nodes and
-                    0<=j<n_from_nodes}""",
-                "result[target_element_indices[k], i] \
-                    = sum(j, resample_mat[i, j] \
-                    * vec[source_element_indices[k], j])",
-                [
-                    lp.GlobalArg("result", None,
-                        shape="nelements_result, n_to_nodes"),
-                    lp.GlobalArg("vec", None,
-                        shape="nelements_vec, n_from_nodes"),
-                    lp.ValueArg("nelements_result", np.int32),
-                    lp.ValueArg("nelements_vec", np.int32),
-                    "...",
-                    ],
-                name="oversample")
-
-            knl = lp.split_iname(knl, "i", 16, inner_tag="l.0")
-            return lp.tag_inames(knl, dict(k="g.0"))
-
-        if not isinstance(vec, cl.array.Array):
-            return vec
-
-        result = self.to_discr.empty(vec.dtype)
-
-        if vec.shape != (self.from_discr.nnodes,):
+                ibatch.result_unit_nodes, from_grp.unit_nodes
+                ).astype(self.to_discr.real_dtype)
+
+    @memoize_method
+    def _resample_matrix_array(self, elgroup_index, ibatch_index):
+        # kept in the array context, so that resampling does not involve
+        # a (blocking) host-to-device transfer
+        with self.array_context.temporary_queue() as queue:
+            return self.array_context.from_numpy(queue,
+                    self._resample_matrix(elgroup_index, ibatch_index))
+
+    @memoize_method
+    def _fused_plan(self):
+        from meshmode.discretization import (
+                _make_fused_plan, _element_node_starts)
+
+        actx = self.array_context
+
+        with actx.temporary_queue() as queue:
+            entries = []
+            for i_grp, (tgrp, fgrp, cgrp) in enumerate(
+                    zip(self.to_discr.groups, self.from_discr.groups,
+                        self.groups)):
+                for i_batch, batch in enumerate(cgrp.batches):
+                    if not len(batch.source_element_indices):
+                        continue
+
+                    entries.append((
+                        self._resample_matrix(i_grp, i_batch),
+                        _element_node_starts(
+                            tgrp.node_nr_base, tgrp.nunit_nodes,
+                            actx.to_numpy(queue,
+                                batch.target_element_indices)),
+                        _element_node_starts(
+                            fgrp.node_nr_base, fgrp.nunit_nodes,
+                            actx.to_numpy(queue,
+                                batch.source_element_indices))))
+
+            return _make_fused_plan(actx, queue, entries)
+
+    def __call__(self, queue, vec, out=None, wait_for=None):
+        """
+        :arg vec: an array of shape ``(from_discr.nnodes)`` or
+            ``(nvectors, from_discr.nnodes)``, or an object array of
+            arrays of shape ``(from_discr.nnodes)``. Multiple vectors are
+            resampled by a single kernel invocation per batch.
+        :arg out: *None* or a preallocated result, as described for
+            :class:`meshmode.discretization.Discretization`.
+        :arg wait_for: events to wait for, as described for
+            :class:`meshmode.discretization.Discretization`. The events of
+            the resampling kernels are recorded on the result.
+        """
+        from meshmode.discretization import _with_stacked_object_array
+        return _with_stacked_object_array(self.array_context, queue, vec,
+                lambda v, o: self._apply(queue, v, o, wait_for), out=out)
+
+    def _apply(self, queue, vec, out=None, wait_for=None):
+        actx = self.array_context
+
+        if not actx.is_array(vec):
+            if not isinstance(vec, np.ndarray):
+                # e.g. a scalar
+                return vec
+
+            vec = actx.from_numpy(queue, vec)
+
+        if (vec.shape[-1] != self.from_discr.nnodes
+                or len(vec.shape) > 2):
             raise ValueError("invalid shape of incoming resampling data")
 
+        from meshmode.discretization import _wait_for
+        wait_for = _wait_for(actx, wait_for, vec, out)
+        result = self.to_discr._result_array(out, vec.dtype, queue=queue,
+                extra_dims=vec.shape[:-1], vec=vec)
+
+        if self.to_discr.fuse_groups:
+            from meshmode.discretization import _apply_fused_matrix_plan
+            actx.add_events(result, _apply_fused_matrix_plan(
+                actx, queue, self._fused_plan(), result, vec,
+                wait_for=wait_for))
+            return result
+
+        events = []
         for i_grp, (sgrp, tgrp, cgrp) in enumerate(
                 zip(self.to_discr.groups, self.from_discr.groups, self.groups)):
             for i_batch, batch in enumerate(cgrp.batches):
                 if len(batch.source_element_indices):
-                    knl()(queue,
-                            resample_mat=self._resample_matrix(i_grp, i_batch),
-                            result=sgrp.view(result), vec=tgrp.view(vec),
+                    events.append(actx.resample_elements(queue,
+                            self._resample_matrix_array(i_grp, i_batch),
+                            sgrp.view(result), tgrp.view(vec),
                             source_element_indices=batch.source_element_indices,
-                            target_element_indices=batch.target_element_indices)
+                            target_element_indices=batch.target_element_indices,
+                            wait_for=wait_for))
 
+        actx.add_events(result, events)
         return result
 
     # }}}
@@ -193,14 +246,16 @@ def make_same_mesh_connection(queue, to_discr, from_discr):
         raise ValueError("from_discr and to_discr must be based on "
                 "the same mesh")
 
-    assert queue.context == from_discr.cl_context
-    assert queue.context == to_discr.cl_context
+    if from_discr.array_context != to_discr.array_context:
+        raise ValueError("from_discr and to_discr must use the "
+                "same array context")
+
+    actx = from_discr.array_context
 
     groups = []
     for fgrp, tgrp in zip(from_discr.groups, to_discr.groups):
-        all_elements = cl.array.arange(queue,
-                fgrp.nelements,
-                dtype=np.intp).with_queue(None)
+        all_elements = actx.from_numpy(queue,
+                np.arange(fgrp.nelements, dtype=np.intp))
         ibatch = InterpolationBatch(
                 source_element_indices=all_elements,
                 target_element_indices=all_elements,
@@ -222,6 +277,8 @@ class _ConnectionBatchData(Record):
 
 
 def _build_boundary_connection(queue, vol_discr, bdry_discr, connection_data):
+    actx = vol_discr.array_context
+
     connection_groups = []
     for igrp, (vol_grp, bdry_grp) in enumerate(
             zip(vol_discr.groups, bdry_discr.groups)):
@@ -236,16 +293,10 @@ def _build_boundary_connection(queue, vol_discr, bdry_discr, connection_data):
 
             connection_batches.append(
                     InterpolationBatch(
-                        source_element_indices=cl.array.to_device(
-                            queue,
-                            vol_grp.mesh_el_group.element_nr_base
-                            + data.group_source_element_indices)
-                        .with_queue(None),
-                        target_element_indices=cl.array.to_device(
-                            queue,
-                            bdry_grp.mesh_el_group.element_nr_base
-                            + data.group_target_element_indices)
-                        .with_queue(None),
+                        source_element_indices=actx.from_numpy(
+                            queue, data.group_source_element_indices),
+                        target_element_indices=actx.from_numpy(
+                            queue, data.group_target_element_indices),
                         result_unit_nodes=result_unit_nodes,
                         ))
 
@@ -257,8 +308,11 @@ def _build_boundary_connection(queue, vol_discr, bdry_discr, connection_data):
             vol_discr, bdry_discr, connection_groups)
 
 
-def make_boundary_restriction(queue, discr, group_factory):
+def make_boundary_restriction(queue, discr, group_factory, boundary_tag=None):
     """
+    :arg boundary_tag: if not None, only include boundary faces carrying
+        this tag in :attr:`meshmode.mesh.MeshElementGroup.face_tags`.
+        May be a tag number or a key of :attr:`meshmode.mesh.Mesh.tag_names`.
     :return: a tuple ``(bdry_mesh, bdry_discr, connection)``
     """
 
@@ -285,10 +339,30 @@ def make_boundary_restriction(queue, discr, group_factory):
 
     # }}}
 
-    boundary_faces = [
+    # (igrp, iel_grp, face_id) for each boundary face
+    boundary_faces = np.array([
             face_ids[0]
             for face_vertices, face_ids in six.iteritems(face_map)
-            if len(face_ids) == 1]
+            if len(face_ids) == 1], dtype=np.intp).reshape(-1, 3)
+
+    if boundary_tag is not None:
+        if isinstance(boundary_tag, six.string_types):
+            try:
+                boundary_tag = discr.mesh.tag_names[boundary_tag]
+            except KeyError:
+                raise ValueError("unknown boundary tag name '%s'" % boundary_tag)
+
+        if any(mgrp.face_tags is None for mgrp in discr.mesh.groups):
+            raise ValueError("boundary_tag given, but mesh has no face tags")
+
+        has_tag = np.zeros(len(boundary_faces), dtype=np.bool_)
+        for igrp, mgrp in enumerate(discr.mesh.groups):
+            in_group = boundary_faces[:, 0] == igrp
+            has_tag[in_group] = mgrp.face_tags[
+                    boundary_faces[in_group, 1],
+                    boundary_faces[in_group, 2]] == boundary_tag
+
+        boundary_faces = boundary_faces[has_tag]
 
     from pytools import flatten
     bdry_vertex_vol_nrs = sorted(set(flatten(six.iterkeys(face_map))))
@@ -308,10 +382,8 @@ def make_boundary_restriction(queue, discr, group_factory):
 
     for igrp, grp in enumerate(discr.groups):
         mgrp = grp.mesh_el_group
-        group_boundary_faces = [
-                (ibface_el, ibface_face)
-                for ibface_group, ibface_el, ibface_face in boundary_faces
-                if ibface_group == igrp]
+        # (iel_grp, face_id) for each boundary face in the group
+        group_boundary_faces = boundary_faces[boundary_faces[:, 0] == igrp, 1:]
 
         if not isinstance(mgrp, SimplexElementGroup):
             raise NotImplementedError("can only take boundary of "
@@ -331,7 +403,7 @@ def make_boundary_restriction(queue, discr, group_factory):
         nbdry_unit_nodes = bdry_unit_nodes_01.shape[-1]
         nodes = np.empty(
                 (discr.ambient_dim, ngroup_bdry_elements, nbdry_unit_nodes),
-                dtype=np.float64)
+                dtype=mgrp.nodes.dtype)
 
         # }}}
 
@@ -343,12 +415,8 @@ def make_boundary_restriction(queue, discr, group_factory):
         batch_base = 0
 
         for face_id in range(len(grp_face_vertex_indices)):
-            batch_boundary_el_numbers_in_grp = np.array(
-                    [
-                        ibface_el
-                        for ibface_el, ibface_face in group_boundary_faces
-                        if ibface_face == face_id],
-                    dtype=np.intp)
+            batch_boundary_el_numbers_in_grp = group_boundary_faces[
+                    group_boundary_faces[:, 1] == face_id, 0]
 
             new_el_numbers = np.arange(
                     batch_base,
@@ -413,7 +481,8 @@ def make_boundary_restriction(queue, discr, group_factory):
 
     from meshmode.discretization import Discretization
     bdry_discr = Discretization(
-            discr.cl_context, bdry_mesh, group_factory)
+            discr.array_context, bdry_mesh, group_factory,
+            real_dtype=discr.real_dtype, memory_pool=discr.memory_pool)
 
     connection = _build_boundary_connection(
             queue, discr, bdry_discr, connection_data)
@@ -92,6 +92,37 @@ class PolynomialSimplexElementGroupBase(ElementGroupBase):
                 mp.simplex_onb(self.dim, meg.order),
                 self.unit_nodes, meg.unit_nodes)
 
+    @memoize_method
+    def inverse_mass_matrix(self):
+        vdm = mp.vandermonde(self.basis(), self.unit_nodes)
+        return np.dot(vdm, vdm.T)
+
+    @memoize_method
+    def _mass_quadrature(self):
+        # exact for products of two basis functions and an area element
+        # of the degree it has on volume elements of the mesh's order
+        degree = 2*self.order + self.dim*(self.mesh_el_group.order - 1)
+        if self.dim == 1:
+            return mp.LegendreGaussQuadrature(degree // 2)
+        else:
+            return mp.XiaoGimbutasSimplexQuadrature(degree, self.dim)
+
+    @memoize_method
+    def mass_quadrature_interp_matrix(self):
+        """Interpolation from :attr:`unit_nodes` to the nodes of a
+        quadrature rule on the reference element, with weights
+        :meth:`mass_quadrature_weights`, that integrates the mass matrix
+        exactly on (possibly curved) volume elements.
+        """
+        nodes = self._mass_quadrature().nodes
+        if len(nodes.shape) == 1:
+            nodes = nodes.reshape(1, -1)
+
+        return mp.resampling_matrix(self.basis(), nodes, self.unit_nodes)
+
+    def mass_quadrature_weights(self):
+        return self._mass_quadrature().weights
+
 
 class InterpolatoryQuadratureSimplexElementGroup(PolynomialSimplexElementGroupBase):
     """Elemental discretization supplying a high-order quadrature rule
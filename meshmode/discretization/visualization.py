@@ -26,7 +26,6 @@ THE SOFTWARE.
 
 import numpy as np
 from pytools import memoize_method
-import pyopencl as cl
 
 __doc__ = """
 
@@ -82,13 +81,16 @@ class Visualizer(object):
         self.vis_discr = vis_discr
         self.connection = connection
 
-    def _resample_and_get(self, queue, vec):
+    def _get(self, queue, vec):
         from pytools.obj_array import with_object_array_or_scalar
 
-        def resample_and_get_one(fld):
-            return self.connection(queue, fld).get(queue=queue)
+        actx = self.vis_discr.array_context
+        return with_object_array_or_scalar(
+                lambda fld: actx.to_numpy(queue, fld), vec)
 
-        return with_object_array_or_scalar(resample_and_get_one, vec)
+    def _resample_and_get(self, queue, vec):
+        # object arrays are resampled in one go, then transferred
+        return self._get(queue, self.connection(queue, vec))
 
     @memoize_method
     def _vis_connectivity(self):
@@ -132,8 +134,9 @@ class Visualizer(object):
 
         do_show = kwargs.pop("do_show", True)
 
-        with cl.CommandQueue(self.vis_discr.cl_context) as queue:
-            nodes = self.vis_discr.nodes().with_queue(queue).get()
+        actx = self.vis_discr.array_context
+        with actx.temporary_queue() as queue:
+            nodes = actx.to_numpy(queue, self.vis_discr.nodes())
 
             field = self._resample_and_get(queue, field)
 
@@ -191,11 +194,18 @@ class Visualizer(object):
 
         el_type = el_types[self.vis_discr.dim]
 
-        with cl.CommandQueue(self.vis_discr.cl_context) as queue:
-            nodes = self.vis_discr.nodes().with_queue(queue).get()
+        actx = self.vis_discr.array_context
+        with actx.temporary_queue() as queue:
+            # enqueue all resampling before the first transfer, which then
+            # only waits for the kernels producing its field
+            names_and_fields = [
+                    (name, self.connection(queue, fld))
+                    for name, fld in names_and_fields]
+
+            nodes = actx.to_numpy(queue, self.vis_discr.nodes())
 
             names_and_fields = [
-                    (name, self._resample_and_get(queue, fld))
+                    (name, self._get(queue, fld))
                     for name, fld in names_and_fields]
 
         connectivity = self._vis_connectivity()
@@ -235,7 +245,7 @@ def make_visualizer(queue, discr, vis_order):
     from meshmode.discretization.poly_element import \
             PolynomialWarpAndBlendGroupFactory
     vis_discr = Discretization(
-            discr.cl_context, discr.mesh,
+            discr.array_context, discr.mesh,
             PolynomialWarpAndBlendGroupFactory(vis_order),
             real_dtype=discr.real_dtype)
     from meshmode.discretization.connection import \
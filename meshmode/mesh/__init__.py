@@ -78,11 +78,24 @@ class MeshElementGroup(Record):
         The number of dimensions spanned by the element.
         *Not* the ambient dimension, see :attr:`Mesh.ambient_dim`
         for that.
+
+    .. attribute:: element_tags
+
+        An integer array of shape *(nelements,)* of tag numbers (such as
+        gmsh physical tags), 0 for untagged elements. May be *None*.
+        See also :attr:`Mesh.tag_names`.
+
+    .. attribute:: face_tags
+
+        An integer array of shape *(nelements, nfaces)* of tag numbers of
+        element faces, with faces numbered as in
+        :meth:`SimplexElementGroup.face_vertex_indices`. 0 for untagged
+        faces. May be *None*. See also :attr:`Mesh.tag_names`.
     """
 
     def __init__(self, order, vertex_indices, nodes,
             element_nr_base=None, node_nr_base=None,
-            unit_nodes=None, dim=None):
+            unit_nodes=None, dim=None, element_tags=None, face_tags=None):
         """
         :arg order: the mamximum total degree used for interpolation.
         :arg nodes: ``[ambient_dim, nelements, nunit_nodes]``
@@ -100,7 +113,8 @@ class MeshElementGroup(Record):
             vertex_indices=vertex_indices,
             nodes=nodes,
             unit_nodes=unit_nodes,
-            element_nr_base=element_nr_base, node_nr_base=node_nr_base)
+            element_nr_base=element_nr_base, node_nr_base=node_nr_base,
+            element_tags=element_tags, face_tags=face_tags)
 
     def copy(self, **kwargs):
         if "element_nr_base" not in kwargs:
@@ -138,7 +152,7 @@ class MeshElementGroup(Record):
 class SimplexElementGroup(MeshElementGroup):
     def __init__(self, order, vertex_indices, nodes,
             element_nr_base=None, node_nr_base=None,
-            unit_nodes=None, dim=None):
+            unit_nodes=None, dim=None, element_tags=None, face_tags=None):
         """
         :arg order: the mamximum total degree used for interpolation.
         :arg nodes: ``[ambient_dim, nelements, nunit_nodes]``
@@ -174,7 +188,8 @@ class SimplexElementGroup(MeshElementGroup):
                         vertex_indices.shape[-1]))
 
         MeshElementGroup.__init__(self, order, vertex_indices, nodes,
-                element_nr_base, node_nr_base, unit_nodes, dim)
+                element_nr_base, node_nr_base, unit_nodes, dim,
+                element_tags, face_tags)
 
     def face_vertex_indices(self):
         if self.dim == 1:
@@ -260,12 +275,19 @@ class Mesh(Record):
     .. attribute:: vertex_id_dtype
 
     .. attribute:: element_id_dtype
+
+    .. attribute:: tag_names
+
+        A dictionary mapping tag names (such as gmsh physical names) to the
+        tag numbers used in :attr:`MeshElementGroup.element_tags` and
+        :attr:`MeshElementGroup.face_tags`.
     """
 
     def __init__(self, vertices, groups, skip_tests=False,
             element_connectivity=False,
             vertex_id_dtype=np.int32,
-            element_id_dtype=np.int32):
+            element_id_dtype=np.int32,
+            tag_names=None):
         """
         The following are keyword-only:
 
@@ -279,8 +301,10 @@ class Mesh(Record):
             the full picture), and references to
             :attr:`element_neighbors_starts` and :attr:`element_neighbors`
             will result in exceptions. Lastly, a tuple
-            *(element_neighbors_starts, element_neighbors)*, representing the
-            correspondingly-named attributes.
+            *(neighbors_starts, neighbors)*, representing the
+            correspondingly-named attributes of :class:`ElementConnectivity`.
+        :arg tag_names: see :attr:`tag_names`. Defaults to an empty
+            dictionary.
         """
         el_nr = 0
         node_nr = 0
@@ -295,8 +319,8 @@ class Mesh(Record):
         if element_connectivity is not False and element_connectivity is not None:
             nb_starts, nbs = element_connectivity
             element_connectivity = ElementConnectivity(
-                    element_neighbors_starts=nb_starts,
-                    element_neighbors=nbs)
+                    neighbors_starts=nb_starts,
+                    neighbors=nbs)
 
             del nb_starts
             del nbs
@@ -306,6 +330,7 @@ class Mesh(Record):
                 _element_connectivity=element_connectivity,
                 vertex_id_dtype=np.dtype(vertex_id_dtype),
                 element_id_dtype=np.dtype(element_id_dtype),
+                tag_names=tag_names if tag_names is not None else {},
                 )
 
         if not skip_tests:
@@ -1,5 +1,6 @@
 from __future__ import division
 from __future__ import absolute_import
+import six
 from six.moves import range
 
 __copyright__ = "Copyright (C) 2013 Andreas Kloeckner"
@@ -36,6 +37,7 @@ Curves
 ------
 
 .. autofunction:: make_curve_mesh
+.. autofunction:: make_multi_curve_mesh
 
 Curve parametrizations
 ^^^^^^^^^^^^^^^^^^^^^^
@@ -53,6 +55,12 @@ Surfaces
 .. autofunction:: generate_icosahedron
 .. autofunction:: generate_icosphere
 .. autofunction:: generate_torus
+.. autofunction:: generate_surface_mesh
+
+Volumes
+-------
+
+.. autofunction:: generate_box_mesh
 
 """
 
@@ -167,7 +175,132 @@ def qbx_peanut(t):
 # }}}
 
 
-def make_curve_mesh(curve_f, element_boundaries, order):
+# {{{ make_curve_mesh
+
+def _estimate_curve_element_errors(nodes, unodes, order):
+    """
+    :arg nodes: an array of shape *(ambient_dim, nelements, nunit_nodes)*
+        of curve points at the unit nodes *unodes* of each element, with
+        *ambient_dim* 2 or 3.
+    :returns: a tuple *(resolution_errors, turning_angles)*, each an array
+        with one entry per element. The resolution error is the size of
+        the highest-order modal coefficient of the node coordinates. The
+        turning angle is the total change of
+        tangent direction across the element, i.e. an estimate of the
+        integral of the curvature with respect to arc length.
+    """
+    basis = mp.simplex_onb(1, order)
+
+    vdm = mp.vandermonde(basis, unodes)
+    modal_coeffs = np.einsum("ij,dej->dei", la.inv(vdm), nodes)
+
+    resolution_errors = np.sqrt(np.sum(modal_coeffs[:, :, -1]**2, axis=0))
+
+    diff_mat = mp.differentiation_matrices(
+            basis, mp.grad_simplex_onb(1, order), unodes)
+    if isinstance(diff_mat, tuple):
+        diff_mat, = diff_mat
+
+    tangents = np.einsum("ij,dej->dei", diff_mat, nodes)
+
+    # angles between tangents at consecutive nodes
+    t0 = tangents[:, :, :-1]
+    t1 = tangents[:, :, 1:]
+    if nodes.shape[0] == 2:
+        cross = t0[0]*t1[1] - t0[1]*t1[0]
+    elif nodes.shape[0] == 3:
+        cross = la.norm(np.array([
+            t0[1]*t1[2] - t0[2]*t1[1],
+            t0[2]*t1[0] - t0[0]*t1[2],
+            t0[0]*t1[1] - t0[1]*t1[0]]), axis=0)
+    else:
+        raise ValueError("curves must have an ambient dimension of 2 or 3, "
+                "got %d" % nodes.shape[0])
+    dot = np.sum(t0*t1, axis=0)
+    turning_angles = np.sum(np.abs(np.arctan2(cross, dot)), axis=-1)
+
+    return resolution_errors, turning_angles
+
+
+def _refine_curve_element_boundaries(curve_f, element_boundaries,
+        unodes, order, tol, max_turning_angle, max_iterations):
+    """Bisect elements of a curve mesh until the error estimates of
+    :func:`_estimate_curve_element_errors` are below *tol* (relative to
+    the size of the curve) and *max_turning_angle*.
+
+    :returns: a tuple *(element_boundaries, nodes)*, where *nodes* is
+        an array of shape *(ambient_dim, nelements, nunit_nodes)*.
+    """
+    nodes_01 = 0.5*(unodes[0]+1)
+
+    def eval_nodes(el_starts, el_lengths):
+        t = el_starts[:, np.newaxis] + el_lengths[:, np.newaxis]*nodes_01
+        return curve_f(t.ravel()).reshape(-1, len(el_starts), len(nodes_01))
+
+    element_boundaries = np.asarray(element_boundaries, dtype=np.float64)
+    nodes = eval_nodes(element_boundaries[:-1], np.diff(element_boundaries))
+
+    curve_size = la.norm(
+            np.max(nodes, axis=(1, 2)) - np.min(nodes, axis=(1, 2)))
+
+    # Elements that have passed the error check keep their node values and
+    # are not checked again.
+    is_new = np.ones(len(element_boundaries)-1, dtype=np.bool_)
+
+    for i in range(max_iterations):
+        resolution_errors, turning_angles = _estimate_curve_element_errors(
+                nodes[:, is_new], unodes, order)
+
+        needs_refinement = np.zeros(len(is_new), dtype=np.bool_)
+        needs_refinement[is_new] = (
+                (resolution_errors > tol*curve_size)
+                | (turning_angles > max_turning_angle))
+
+        if not needs_refinement.any():
+            break
+
+        refine_els, = np.where(needs_refinement)
+        el_starts = element_boundaries[refine_els]
+        half_lengths = 0.5*(element_boundaries[refine_els+1] - el_starts)
+
+        # nelements after refinement: each refined element becomes two,
+        # stored consecutively
+        new_el_numbers = np.arange(len(is_new)) + np.cumsum(needs_refinement) \
+                - needs_refinement
+        new_nelements = len(is_new) + len(refine_els)
+
+        new_nodes = np.empty(
+                (nodes.shape[0], new_nelements, nodes.shape[-1]),
+                dtype=nodes.dtype)
+        new_nodes[:, new_el_numbers[~needs_refinement]] = \
+                nodes[:, ~needs_refinement]
+
+        children_nodes = eval_nodes(
+                np.hstack([el_starts, el_starts + half_lengths]),
+                np.hstack([half_lengths, half_lengths]))
+        new_nodes[:, new_el_numbers[refine_els]] = \
+                children_nodes[:, :len(refine_els)]
+        new_nodes[:, new_el_numbers[refine_els]+1] = \
+                children_nodes[:, len(refine_els):]
+
+        is_new = np.zeros(new_nelements, dtype=np.bool_)
+        is_new[new_el_numbers[refine_els]] = True
+        is_new[new_el_numbers[refine_els]+1] = True
+
+        element_boundaries = np.insert(
+                element_boundaries, refine_els+1, el_starts + half_lengths)
+        nodes = new_nodes
+
+    else:
+        from warnings import warn
+        warn("adaptive curve mesh generation did not converge "
+                "in %d iterations" % max_iterations)
+
+    return element_boundaries, nodes
+
+
+def make_curve_mesh(curve_f, element_boundaries, order,
+        adaptive_tol=None, max_turning_angle=np.pi/4, max_iterations=20):
     """
     :arg curve_f: A callable representing a parametrization for a curve,
         accepting a vector of point locations and returning
@@ -175,24 +308,43 @@ def make_curve_mesh(curve_f, element_boundaries, order):
     :arg element_boundaries: a vector of element boundary locations in
         :math:`[0,1]`, in order. 0 must be the first entry, 1 the
         last one.
+    :arg adaptive_tol: If not *None*, *element_boundaries* is only used as
+        the starting point for adaptive refinement: elements are bisected
+        until the highest-order modal coefficient of their node coordinates
+        is below *adaptive_tol* times the diameter of the curve, and the
+        tangent turns by at most *max_turning_angle* within each element.
+        Requires *order* of at least 2.
+    :arg max_iterations: the maximum number of bisection rounds in
+        adaptive refinement.
     :returns: a :class:`meshmode.mesh.Mesh`
     """
 
     assert element_boundaries[0] == 0
     assert element_boundaries[-1] == 1
-    nelements = len(element_boundaries) - 1
 
     unodes = mp.warp_and_blend_nodes(1, order)
     nodes_01 = 0.5*(unodes+1)
 
-    vertices = curve_f(element_boundaries)
+    if adaptive_tol is not None:
+        if order < 2:
+            raise ValueError("adaptive refinement requires order >= 2")
+
+        element_boundaries, nodes = _refine_curve_element_boundaries(
+                curve_f, element_boundaries, unodes, order,
+                adaptive_tol, max_turning_angle, max_iterations)
+        nelements = len(element_boundaries) - 1
 
-    el_lengths = np.diff(element_boundaries)
-    el_starts = element_boundaries[:-1]
+    else:
+        nelements = len(element_boundaries) - 1
 
-    # (el_nr, node_nr)
-    t = el_starts[:, np.newaxis] + el_lengths[:, np.newaxis]*nodes_01
-    nodes = curve_f(t.ravel()).reshape(vertices.shape[0], nelements, -1)
+        el_lengths = np.diff(element_boundaries)
+        el_starts = element_boundaries[:-1]
+
+        # (el_nr, node_nr)
+        t = el_starts[:, np.newaxis] + el_lengths[:, np.newaxis]*nodes_01
+        nodes = curve_f(t.ravel()).reshape(-1, nelements, nodes_01.shape[-1])
+
+    vertices = curve_f(element_boundaries)
 
     from meshmode.mesh import Mesh, SimplexElementGroup
     egroup = SimplexElementGroup(
@@ -208,6 +360,134 @@ def make_curve_mesh(curve_f, element_boundaries, order):
             element_connectivity=None)
 
 
+def make_multi_curve_mesh(curves, order, skip_tests=False):
+    """Create a single mesh of several closed curves.
+
+    :arg curves: a sequence of tuples *(curve_f, element_boundaries)* or
+        *(curve_f, element_boundaries, transform)*, where *curve_f* and
+        *element_boundaries* are as in :func:`make_curve_mesh`.
+        *transform*, if given and not *None*, is a tuple *(A, b)* of
+        the affine map *f(x)=Ax+b* to be applied to the curve, as in
+        :func:`meshmode.mesh.processing.affine_map`.
+    :returns: a :class:`meshmode.mesh.Mesh` with a single element group
+        holding the elements of all curves, in order. Each curve with *n*
+        elements contributes *n* vertices. The element connectivity is
+        supplied, so it need not be deduced from the vertices.
+
+    Curves sharing the same *curve_f* are evaluated in a single call to
+    it, so that meshing many copies of a shape is cheap.
+    """
+
+    curves = [tuple(curve) + (None,)*(3-len(curve)) for curve in curves]
+    ncurves = len(curves)
+    if not ncurves:
+        raise ValueError("must pass at least one curve")
+
+    unodes = mp.warp_and_blend_nodes(1, order)
+    nodes_01 = 0.5*(unodes[0]+1)
+    nunit_nodes = len(nodes_01)
+
+    nelements_per_curve = np.array(
+            [len(element_boundaries) - 1 for _, element_boundaries, _ in curves])
+    el_bases = np.zeros(ncurves+1, dtype=np.int32)
+    np.cumsum(nelements_per_curve, out=el_bases[1:])
+    nelements = el_bases[-1]
+
+    # {{{ evaluate curves, one call per parametrization
+
+    curve_f_to_icurves = {}
+    for icurve, (curve_f, _, _) in enumerate(curves):
+        curve_f_to_icurves.setdefault(curve_f, []).append(icurve)
+
+    vertices = None
+    nodes = None
+
+    for curve_f, icurves in six.iteritems(curve_f_to_icurves):
+        el_starts = np.hstack([
+            np.asarray(curves[icurve][1], dtype=np.float64)[:-1]
+            for icurve in icurves])
+        el_lengths = np.hstack([
+            np.diff(curves[icurve][1])
+            for icurve in icurves])
+        el_numbers = np.hstack([
+            np.arange(el_bases[icurve], el_bases[icurve+1])
+            for icurve in icurves])
+
+        t = el_starts[:, np.newaxis] + el_lengths[:, np.newaxis]*nodes_01
+        points = curve_f(np.hstack([el_starts, t.ravel()]))
+
+        if vertices is None:
+            ambient_dim = points.shape[0]
+            vertices = np.empty((ambient_dim, nelements), dtype=points.dtype)
+            nodes = np.empty((ambient_dim, nelements, nunit_nodes),
+                    dtype=points.dtype)
+
+        vertices[:, el_numbers] = points[:, :len(el_starts)]
+        nodes[:, el_numbers] = points[:, len(el_starts):].reshape(
+                ambient_dim, len(el_starts), nunit_nodes)
+
+    # }}}
+
+    # {{{ apply transforms
+
+    # curve number of each element
+    el_curves = np.repeat(np.arange(ncurves), nelements_per_curve)
+
+    if any(transform is not None for _, _, transform in curves):
+        A = np.tile(np.eye(ambient_dim), (ncurves, 1, 1))
+        b = np.zeros((ncurves, ambient_dim))
+        for icurve, (_, _, transform) in enumerate(curves):
+            if transform is not None:
+                A[icurve], b[icurve] = transform
+
+        el_A = A[el_curves]
+        el_b = b[el_curves].T
+
+        vertices = np.einsum("eij,je->ie", el_A, vertices) + el_b
+        nodes = (np.einsum("eij,jen->ien", el_A, nodes)
+                + el_b[:, :, np.newaxis])
+
+    # }}}
+
+    # {{{ vertex indices and connectivity
+
+    el_numbers = np.arange(nelements, dtype=np.int32)
+    el_curve_bases = el_bases[el_curves]
+    el_curve_nelements = nelements_per_curve[el_curves]
+
+    local_el_numbers = el_numbers - el_curve_bases
+    next_els = el_curve_bases + (local_el_numbers+1) % el_curve_nelements
+    prev_els = el_curve_bases + (local_el_numbers-1) % el_curve_nelements
+
+    vertex_indices = np.vstack([el_numbers, next_els]).T.astype(np.int32)
+
+    neighbors = np.sort(
+            np.vstack([prev_els, el_numbers, next_els]).T, axis=1)
+
+    # drop duplicates occurring in curves with fewer than three elements
+    is_distinct = np.ones(neighbors.shape, dtype=np.bool_)
+    is_distinct[:, 1:] = neighbors[:, 1:] != neighbors[:, :-1]
+
+    neighbors_starts = np.zeros(nelements+1, dtype=np.int32)
+    np.cumsum(np.sum(is_distinct, axis=1), out=neighbors_starts[1:])
+    neighbors = neighbors[is_distinct].astype(np.int32)
+
+    # }}}
+
+    from meshmode.mesh import Mesh, SimplexElementGroup
+    egroup = SimplexElementGroup(
+            order,
+            vertex_indices=vertex_indices,
+            nodes=nodes,
+            unit_nodes=unodes)
+
+    return Mesh(vertices=vertices, groups=[egroup],
+            element_connectivity=(neighbors_starts, neighbors),
+            skip_tests=skip_tests)
+
+# }}}
+
+
 def make_group_from_vertices(vertices, vertex_indices, order):
     el_vertices = vertices[:, vertex_indices]
 
@@ -273,77 +553,175 @@ def generate_icosahedron(r, order):
             element_connectivity=None)
 
 
-def generate_icosphere(r, order):
-    mesh = generate_icosahedron(r, order)
+def _refine_triangles(vertices, vertex_indices):
+    """Split each triangle in *vertex_indices* into four by connecting its
+    edge midpoints. Midpoints of edges shared between triangles are created
+    only once, by numbering the edges through a sorted edge table.
+
+    :returns: a tuple *(vertices, vertex_indices)* describing the refined
+        triangles, which retain the orientation of their parents.
+    """
+    nvertices = vertices.shape[-1]
+    nelements = len(vertex_indices)
+
+    # nelements, 3 edges, 2 vertices
+    edges = vertex_indices[:, [[0, 1], [1, 2], [2, 0]]]
+    sorted_edges = np.sort(edges.reshape(-1, 2), axis=1).astype(np.int64)
+
+    unique_edge_keys, edge_numbers = np.unique(
+            sorted_edges[:, 0]*nvertices + sorted_edges[:, 1],
+            return_inverse=True)
+
+    edge_start = unique_edge_keys // nvertices
+    edge_end = unique_edge_keys % nvertices
+    new_vertices = np.hstack([
+        vertices,
+        0.5*(vertices[:, edge_start] + vertices[:, edge_end])])
+
+    # nelements, 3 edges
+    midpoints = (nvertices + edge_numbers).reshape(nelements, 3)
 
-    grp, = mesh.groups
+    v0, v1, v2 = vertex_indices.T
+    m01, m12, m20 = midpoints.T
 
+    new_vertex_indices = np.array([
+        [v0, m01, m20],
+        [m01, v1, m12],
+        [m20, m12, v2],
+        [m01, m12, m20],
+        ]).transpose(2, 0, 1).reshape(-1, 3)
+
+    return new_vertices, new_vertex_indices.astype(vertex_indices.dtype)
+
+
+def generate_icosphere(r, order, nrefinements=0):
+    """
+    :arg nrefinements: number of times to split each triangle of the
+        icosahedron into four before projecting onto the sphere. The
+        resulting mesh has *20 * 4**nrefinements* elements.
+    :returns: a :class:`meshmode.mesh.Mesh` of the sphere of radius *r*
+    """
+    mesh = generate_icosahedron(r, order=1)
+
+    vertices = mesh.vertices
+    vertex_indices = mesh.groups[0].vertex_indices
+
+    for i in range(nrefinements):
+        vertices, vertex_indices = _refine_triangles(vertices, vertex_indices)
+        vertices = vertices * r / np.sqrt(np.sum(vertices**2, axis=0))
+
+    grp = make_group_from_vertices(vertices, vertex_indices, order)
     grp = grp.copy(
             nodes=grp.nodes * r / np.sqrt(np.sum(grp.nodes**2, axis=0)))
 
     from meshmode.mesh import Mesh
-    return Mesh(mesh.vertices, [grp],
+    return Mesh(vertices, [grp],
             element_connectivity=None)
 
 
+def generate_surface_mesh(param_f, n_u, n_v, order=1,
+        periodic=(False, False)):
+    """Triangulate a parametrized surface on a regular grid in parameter
+    space. Each grid cell is split into two triangles.
+
+    :arg param_f: A callable accepting two arrays *u* and *v* of equal
+        shape with entries in :math:`[0,1]` and returning an array of shape
+        *(ambient_dim,) + u.shape* of points on the surface.
+    :arg n_u: number of grid cells along *u*.
+    :arg n_v: number of grid cells along *v*.
+    :arg periodic: a tuple of two booleans. If the surface is periodic
+        along a parameter direction (i.e. *param_f* is 1-periodic in that
+        argument), the vertices at 1 are identified with those at 0.
+    :returns: a :class:`meshmode.mesh.Mesh`. Vertex *(i, j)* of the
+        parameter grid has number ``i + j*nvertices_u``, where
+        *nvertices_u* is *n_u* for periodic *u* and *n_u+1* otherwise.
+
+    High-order nodes are obtained by evaluating *param_f* at the mapped
+    unit nodes of each element, so they lie exactly on the surface.
+    """
+
+    periodic_u, periodic_v = periodic
+    nvertices_u = n_u if periodic_u else n_u+1
+    nvertices_v = n_v if periodic_v else n_v+1
+
+    # {{{ vertices
+
+    v_grid, u_grid = np.mgrid[0:nvertices_v, 0:nvertices_u]
+    vertices = param_f(u_grid.ravel()/n_u, v_grid.ravel()/n_v)
+
+    # }}}
+
+    # {{{ vertex indices
+
+    cell_i, cell_j = np.indices((n_u, n_v)).reshape(2, -1)
+
+    def idx(i, j):
+        return (i % nvertices_u) + (j % nvertices_v) * nvertices_u
+
+    vertex_indices = np.vstack([
+        np.array([
+            idx(cell_i, cell_j), idx(cell_i+1, cell_j), idx(cell_i, cell_j+1)
+            ]).T,
+        np.array([
+            idx(cell_i+1, cell_j), idx(cell_i+1, cell_j+1), idx(cell_i, cell_j+1)
+            ]).T,
+        ]).astype(np.int32)
+
+    # }}}
+
+    # {{{ nodes
+
+    # (u,v), nelements, nspan_vectors, in units of grid cells
+    el_origins = np.hstack([
+        [cell_i, cell_j],
+        [cell_i+1, cell_j],
+        ])
+    spanning_vectors = np.hstack([
+        np.tile(np.array([[1, 0], [0, 1]])[:, np.newaxis, :], (1, n_u*n_v, 1)),
+        np.tile(np.array([[0, -1], [1, 1]])[:, np.newaxis, :], (1, n_u*n_v, 1)),
+        ])
+
+    unit_nodes = mp.warp_and_blend_nodes(2, order)
+    unit_nodes_01 = 0.5 + 0.5*unit_nodes
+
+    # (u,v), nelements, nunit_nodes
+    param_nodes = np.einsum(
+            "si,des->dei",
+            unit_nodes_01, spanning_vectors) + el_origins[:, :, np.newaxis]
+
+    nodes = param_f(param_nodes[0]/n_u, param_nodes[1]/n_v)
+
+    # }}}
+
+    from meshmode.mesh import Mesh, SimplexElementGroup
+    grp = SimplexElementGroup(
+            order, vertex_indices, nodes,
+            unit_nodes=unit_nodes)
+
+    return Mesh(vertices, [grp], element_connectivity=None)
+
+
 def generate_torus_and_cycle_vertices(r_outer, r_inner,
         n_outer=20, n_inner=10, order=1):
     a = r_outer
     b = r_inner
-    u, v = np.mgrid[0:2*np.pi:2*np.pi/n_outer, 0:2*np.pi:2*np.pi/n_inner]
-
-    # http://www.math.hmc.edu/~gu/curves_and_surfaces/surfaces/torus.html
-    x = np.cos(u)*(a+b*np.cos(v))
-    y = np.sin(u)*(a+b*np.cos(v))
-    z = b*np.sin(v)
-    vertices = (np.vstack((x[np.newaxis], y[np.newaxis], z[np.newaxis]))
-            .transpose(0, 2, 1).copy().reshape(3, -1))
-
-    def idx(i, j):
-        return (i % n_outer) + (j % n_inner) * n_outer
-    vertex_indices = ([(idx(i, j), idx(i+1, j), idx(i, j+1))
-            for i in range(n_outer) for j in range(n_inner)]
-            + [(idx(i+1, j), idx(i+1, j+1), idx(i, j+1))
-            for i in range(n_outer) for j in range(n_inner)])
 
-    vertex_indices = np.array(vertex_indices, dtype=np.int32)
-    grp = make_group_from_vertices(vertices, vertex_indices, order)
+    def torus(u, v):
+        # http://www.math.hmc.edu/~gu/curves_and_surfaces/surfaces/torus.html
+        u = 2*np.pi*u
+        v = 2*np.pi*v
+        return np.array([
+            np.cos(u)*(a+b*np.cos(v)),
+            np.sin(u)*(a+b*np.cos(v)),
+            b*np.sin(v),
+            ])
 
-    # ambient_dim, nelements, nunit_nodes
-    nodes = grp.nodes.copy()
-
-    major_theta = np.arctan2(nodes[1], nodes[0])
-    rvec = np.array([
-        np.cos(major_theta),
-        np.sin(major_theta),
-        np.zeros_like(major_theta)])
-
-    #               ^
-    #               |
-    # --------------+----.
-    #           /   |     \
-    #          /    |  _-- \
-    #         |     |.^  | | y
-    #         |     +------+--->
-    #         |       x    |
-    #          \          /
-    #           \        /
-    # ------------------'
-
-    x = np.sum(nodes*rvec, axis=0) - a
-
-    minor_theta = np.arctan2(nodes[2], x)
-
-    nodes[0] = np.cos(major_theta)*(a+b*np.cos(
-        minor_theta))
-    nodes[1] = np.sin(major_theta)*(a+b*np.cos(
-        minor_theta))
-    nodes[2] = b*np.sin(minor_theta)
+    mesh = generate_surface_mesh(torus, n_outer, n_inner, order=order,
+            periodic=(True, True))
 
-    from meshmode.mesh import Mesh
-    return (Mesh(vertices, [grp.copy(nodes=nodes)], element_connectivity=None),
-            [idx(i, 0) for i in range(n_outer)],
-            [idx(0, j) for j in range(n_inner)])
+    return (mesh,
+            [i for i in range(n_outer)],
+            [j * n_outer for j in range(n_inner)])
 
 
 def generate_torus(r_outer, r_inner, n_outer=20, n_inner=10, order=1):
@@ -351,4 +729,222 @@ def generate_torus(r_outer, r_inner, n_outer=20, n_inner=10, order=1):
             r_outer, r_inner, n_outer, n_inner, order)
     return mesh
 
+
+# {{{ generate_box_mesh
+
+def _get_box_cell_subdivision(dim):
+    """Return an integer array of shape *(nsubelements, dim+1, dim)*
+    giving the vertex offsets (in units of grid cells) of the simplices
+    making up one cell of a box mesh. All simplices are positively
+    oriented, and neighboring cells use matching subdivisions, so that
+    the resulting mesh is conforming.
+    """
+    if dim == 2:
+        return np.array([
+            [[0, 0], [1, 0], [0, 1]],
+            [[1, 0], [1, 1], [0, 1]],
+            ])
+
+    elif dim == 3:
+        # Kuhn (Freudenthal) subdivision: one tetrahedron per path along the
+        # cube edges from (0,0,0) to (1,1,1).
+        from itertools import permutations
+
+        eye = np.eye(3, dtype=np.int64)
+        result = []
+        for perm in permutations(range(3)):
+            offsets = np.vstack([
+                np.zeros(3, dtype=np.int64),
+                np.cumsum(eye[list(perm)], axis=0)])
+
+            if la.det(eye[list(perm)]) < 0:
+                offsets = offsets[[0, 1, 3, 2]]
+
+            result.append(offsets)
+
+        return np.array(result)
+
+    else:
+        raise NotImplementedError("box mesh in %d dimensions" % dim)
+
+
+# number of entries in the padded neighbor table of one block of cells
+_BOX_CONNECTIVITY_BLOCK_ENTRIES = 2**22
+
+
+def _compute_box_mesh_connectivity(cell_shape, subdiv, element_id_dtype):
+    """Return *(neighbors_starts, neighbors)* for the vertex-based
+    connectivity of a box mesh with *cell_shape* cells, each subdivided
+    according to *subdiv* (see :func:`_get_box_cell_subdivision`).
+
+    Since the subdivision is the same in every cell, the neighbors of a
+    subelement are found from a fixed stencil of *(cell offset,
+    subelement)* pairs rather than from a vertex-to-element map.
+    """
+    nsub = len(subdiv)
+    dim = len(cell_shape)
+    ncells = np.prod(cell_shape)
+
+    # {{{ find stencils
+
+    # Subelements *isub* and *jsub* in cells *c* and *c+delta* share a vertex
+    # if and only if delta = subdiv[isub, ivertex] - subdiv[jsub, jvertex]
+    # for some ivertex, jvertex.
+
+    stencils = []
+    for isub in range(nsub):
+        stencils.append(np.array(sorted(set(
+            tuple(ivertex_offset - jvertex_offset) + (jsub,)
+            for ivertex_offset in subdiv[isub]
+            for jsub in range(nsub)
+            for jvertex_offset in subdiv[jsub]))))
+
+    max_stencil_size = max(len(st) for st in stencils)
+
+    # }}}
+
+    cell_strides = np.cumprod((1,) + cell_shape[:0:-1])[::-1]
+
+    # Only a block of cells at a time goes through a padded neighbor
+    # table, so that memory use beyond the result stays bounded.
+    # Each entry of a stencil contributes a neighbor to every cell whose
+    # neighbor cell in that direction exists.
+    nneighbors_total = sum(
+            np.prod([n - abs(delta) for n, delta in zip(cell_shape, entry)])
+            for stencil in stencils
+            for entry in stencil)
+
+    neighbors_starts = np.zeros(ncells*nsub + 1, dtype=element_id_dtype)
+    neighbors = np.empty(nneighbors_total, dtype=element_id_dtype)
+
+    block_size = max(1, _BOX_CONNECTIVITY_BLOCK_ENTRIES
+            // (nsub*max_stencil_size))
+
+    for block_start in range(0, ncells, block_size):
+        block_stop = min(block_start + block_size, ncells)
+
+        cell_numbers = np.arange(block_start, block_stop,
+                dtype=element_id_dtype)
+        cell_indices = np.unravel_index(cell_numbers, cell_shape)
+
+        # (axis, delta) -> whether the neighbor cell is inside the grid
+        in_bounds = {}
+        for iaxis in range(dim):
+            for delta in range(-1, 2):
+                in_bounds[iaxis, delta] = (
+                        (0 <= cell_indices[iaxis] + delta)
+                        & (cell_indices[iaxis] + delta < cell_shape[iaxis]))
+
+        # nsubelements, max_stencil_size, cells in block
+        block_neighbors = np.empty(
+                (nsub, max_stencil_size, len(cell_numbers)),
+                dtype=element_id_dtype)
+        block_neighbors.fill(-1)
+
+        for isub, stencil in enumerate(stencils):
+            for ientry, entry in enumerate(stencil):
+                valid = np.ones(len(cell_numbers), dtype=np.bool_)
+                for iaxis in range(dim):
+                    valid &= in_bounds[iaxis, entry[iaxis]]
+
+                offset = np.dot(cell_strides, entry[:dim])
+                block_neighbors[isub, ientry][valid] = (
+                        (cell_numbers[valid] + offset)*nsub + entry[dim])
+
+        # cells in block, nsubelements, max_stencil_size
+        block_neighbors = block_neighbors.transpose(2, 0, 1)
+        valid = block_neighbors >= 0
+
+        start = block_start*nsub
+        stop = block_stop*nsub
+        np.cumsum(np.sum(valid, axis=2).reshape(-1),
+                out=neighbors_starts[start+1:stop+1])
+        neighbors_starts[start+1:stop+1] += neighbors_starts[start]
+
+        neighbors[neighbors_starts[start]:neighbors_starts[stop]] = \
+                block_neighbors[valid]
+
+    return neighbors_starts, neighbors
+
+
+def generate_box_mesh(axis_coords, order=1, coord_dtype=np.float64,
+        compute_connectivity=True):
+    """Create a simplicial mesh of a tensor product grid.
+
+    Each grid cell is split into two triangles (in 2D) or six tetrahedra
+    (in 3D). All elements are positively oriented.
+
+    :arg axis_coords: a tuple with one entry per dimension, each entry a
+        sorted :mod:`numpy` array of the coordinates of the grid planes
+        along that axis.
+    :arg compute_connectivity: if *True*, the vertex-based element
+        connectivity is computed directly from the grid structure and
+        passed to the mesh. Otherwise, it is deduced from the vertices
+        upon first use. In 3D, it holds about 70 neighbors per element,
+        which may be worth avoiding for large meshes that do not need it.
+    :returns: a :class:`meshmode.mesh.Mesh`
+    """
+
+    dim = len(axis_coords)
+    axis_coords = [np.asarray(ax, dtype=coord_dtype) for ax in axis_coords]
+
+    shape = tuple(len(ax) for ax in axis_coords)
+    cell_shape = tuple(n-1 for n in shape)
+
+    if min(cell_shape) < 1:
+        raise ValueError("each axis must have at least two coordinates")
+
+    from meshmode.mesh import Mesh
+    vertex_id_dtype = np.int32
+    element_id_dtype = np.int32
+
+    nvertices = np.prod(shape)
+    if nvertices > np.iinfo(vertex_id_dtype).max:
+        vertex_id_dtype = np.int64
+        element_id_dtype = np.int64
+
+    # {{{ vertices
+
+    vertices = np.empty((dim,) + shape, dtype=coord_dtype)
+    for idim in range(dim):
+        vertices[idim] = axis_coords[idim].reshape(
+                (1,)*idim + (-1,) + (1,)*(dim-idim-1))
+
+    vertices = vertices.reshape(dim, -1)
+
+    # }}}
+
+    # {{{ vertex indices
+
+    subdiv = _get_box_cell_subdivision(dim)
+
+    # dim, ncells
+    cell_indices = np.indices(cell_shape, dtype=vertex_id_dtype).reshape(dim, -1)
+
+    # dim, ncells, nsubelements, nvertices_per_element
+    el_vertex_multi_indices = (
+            cell_indices[:, :, np.newaxis, np.newaxis]
+            + subdiv.transpose(2, 0, 1)[:, np.newaxis, :, :])
+
+    vertex_indices = np.ravel_multi_index(
+            tuple(el_vertex_multi_indices), shape).astype(vertex_id_dtype)
+    vertex_indices = vertex_indices.reshape(-1, dim+1)
+
+    # }}}
+
+    grp = make_group_from_vertices(vertices, vertex_indices, order)
+
+    if compute_connectivity:
+        element_connectivity = _compute_box_mesh_connectivity(
+                cell_shape, subdiv, element_id_dtype)
+    else:
+        element_connectivity = None
+
+    return Mesh(vertices, [grp],
+            element_connectivity=element_connectivity,
+            vertex_id_dtype=vertex_id_dtype,
+            element_id_dtype=element_id_dtype)
+
+# }}}
+
 # vim: fdm=marker
@@ -27,9 +27,10 @@ THE SOFTWARE.
 """
 
 import numpy as np
+from pytools import memoize
 
 from meshpy.gmsh_reader import (  # noqa
-        GmshMeshReceiverBase, FileSource, LiteralSource)
+        GmshMeshReceiverBase, GmshFileFormatError, FileSource, LiteralSource)
 
 
 __doc__ = """
@@ -38,140 +39,256 @@ __doc__ = """
 .. autoclass:: LiteralSource
 
 .. autofunction:: read_gmsh
+.. autofunction:: read_gmsh_chunked
+.. autofunction:: read_gmsh_binary
 .. autofunction:: generate_gmsh
+.. autofunction:: generate_gmsh_many
+.. autoclass:: GmshMeshCache
 
 """
 
 
 # {{{ gmsh receiver
 
+class _GmshElementTypeBuffer(object):
+    """Storage for all elements of one gmsh element type, filled as elements
+    stream in from the parser. Room for them is made by :meth:`reserve`.
+
+    .. attribute:: element_type
+    .. attribute:: nelements
+    .. attribute:: vertex_nrs
+
+        ``[nelements, element_type.vertex_count()]`` of gmsh vertex numbers
+
+    .. attribute:: lexicographic_nodes
+
+        ``[nelements, element_type.node_count()]`` of gmsh node numbers
+
+    .. attribute:: markers
+
+        ``[nelements]`` of gmsh physical tags, 0 if untagged
+    """
+
+    def __init__(self, element_type):
+        self.element_type = element_type
+        self.nelements = 0
+
+        self.vertex_nrs = np.empty((0, element_type.vertex_count()), np.intp)
+        self.lexicographic_nodes = np.empty(
+                (0, element_type.node_count()), np.intp)
+        self.markers = np.zeros(0, np.int32)
+
+    def reserve(self, nelements, max_nelements):
+        """Make room for *nelements* more elements. The capacity grows
+        geometrically, but not beyond *max_nelements*, the most elements the
+        buffer can end up holding.
+        """
+        capacity = len(self.markers)
+        if self.nelements + nelements <= capacity:
+            return
+
+        new_capacity = min(
+                max(self.nelements + nelements, 2*capacity, 16),
+                max_nelements)
+
+        for name in ["vertex_nrs", "lexicographic_nodes", "markers"]:
+            ary = getattr(self, name)
+            new_ary = np.zeros((new_capacity,) + ary.shape[1:], ary.dtype)
+            new_ary[:self.nelements] = ary[:self.nelements]
+            setattr(self, name, new_ary)
+
+    def add(self, vertex_nrs, lexicographic_nodes, tag_numbers):
+        i = self.nelements
+        self.vertex_nrs[i] = vertex_nrs
+        self.lexicographic_nodes[i] = lexicographic_nodes
+        if tag_numbers:
+            self.markers[i] = tag_numbers[0]
+        self.nelements += 1
+
+    def add_block(self, vertex_nrs, lexicographic_nodes, markers):
+        el_slice = slice(self.nelements, self.nelements+len(markers))
+        self.vertex_nrs[el_slice] = vertex_nrs
+        self.lexicographic_nodes[el_slice] = lexicographic_nodes
+        self.markers[el_slice] = markers
+        self.nelements += len(markers)
+
+    def finalize(self):
+        if self.nelements < len(self.markers):
+            # Only copy if the buffer was overallocated, so that the (usually
+            # exactly-sized) bulk element buffer is not duplicated.
+            self.vertex_nrs = self.vertex_nrs[:self.nelements].copy()
+            self.lexicographic_nodes = \
+                    self.lexicographic_nodes[:self.nelements].copy()
+            self.markers = self.markers[:self.nelements].copy()
+
+
 class GmshMeshReceiver(GmshMeshReceiverBase):
     def __init__(self):
         # Use data fields similar to meshpy.triangle.MeshInfo and
         # meshpy.tet.MeshInfo
         self.points = None
-        self.elements = None
-        self.element_types = None
-        self.element_markers = None
-        self.tags = None
+        self.element_type_buffers = None
+
+        # $PhysicalNames may come before or after $Elements
+        self.tags = []
 
     def set_up_nodes(self, count):
-        # Preallocate array of nodes within list; treat None as sentinel value.
-        # Preallocation not done for performance, but to assign values at indices
-        # in random order.
-        self.points = [None] * count
+        # The ambient dimension is only known once the first node arrives,
+        # see add_node.
+        self.nnodes = count
+        self.points = None
 
     def add_node(self, node_nr, point):
+        if self.points is None:
+            self.points = np.empty((self.nnodes, len(point)), dtype=np.float64)
+
         self.points[node_nr] = point
 
     def finalize_nodes(self):
-        self.points = np.array(self.points, dtype=np.float64)
+        pass
 
     def set_up_elements(self, count):
-        # Preallocation of arrays for assignment elements in random order.
-        self.element_vertices = [None] * count
-        self.element_nodes = [None] * count
-        self.element_types = [None] * count
-        self.element_markers = [None] * count
-        self.tags = []
+        self.nelements = count
+        self.nelements_received = 0
+
+        # maps element type to _GmshElementTypeBuffer
+        self.element_type_buffers = {}
 
     def add_element(self, element_nr, element_type, vertex_nrs,
             lexicographic_nodes, tag_numbers):
-        self.element_vertices[element_nr] = vertex_nrs
-        self.element_nodes[element_nr] = lexicographic_nodes
-        self.element_types[element_nr] = element_type
-        self.element_markers[element_nr] = tag_numbers
+        try:
+            buf = self.element_type_buffers[element_type]
+        except KeyError:
+            buf = self.element_type_buffers[element_type] = \
+                    _GmshElementTypeBuffer(element_type)
+
+        buf.reserve(1, buf.nelements + self.nelements - self.nelements_received)
+        buf.add(vertex_nrs, lexicographic_nodes, tag_numbers)
+        self.nelements_received += 1
 
     def finalize_elements(self):
-        pass
+        for buf in six.itervalues(self.element_type_buffers):
+            buf.finalize()
 
     def add_tag(self, name, index, dimension):
-        pass
+        self.tags.append((name, index, dimension))
 
     def finalize_tags(self):
         pass
 
     def get_mesh(self):
-        el_type_hist = {}
-        for el_type in self.element_types:
-            el_type_hist[el_type] = el_type_hist.get(el_type, 0) + 1
+        return _make_mesh_from_gmsh_element_buffers(
+                self.points, list(six.itervalues(self.element_type_buffers)),
+                self.tags)
 
-        groups = self.groups = []
 
-        ambient_dim = self.points.shape[-1]
+def _add_gmsh_face_tags(groups, bdry_vertex_indices, bdry_tags):
+    """Match tagged boundary elements, one dimension below the bulk, to the
+    element faces of *groups* and store their tags in
+    :attr:`meshmode.mesh.MeshElementGroup.face_tags`.
+    """
+    if not len(bdry_tags):
+        return groups
 
-        mesh_bulk_dim = max(
-                el_type.dimensions for el_type in six.iterkeys(el_type_hist))
+    from meshmode.mesh.processing import find_group_face_tags
+    return [
+            grp.copy(face_tags=find_group_face_tags(
+                grp, bdry_vertex_indices, bdry_tags))
+            for grp in groups]
 
-        # {{{ build vertex numbering
 
-        vertex_index_gmsh_to_mine = {}
-        for el_vertices, el_type in zip(
-                self.element_vertices, self.element_types):
-            for gmsh_vertex_nr in el_vertices:
-                if gmsh_vertex_nr not in vertex_index_gmsh_to_mine:
-                    vertex_index_gmsh_to_mine[gmsh_vertex_nr] = \
-                            len(vertex_index_gmsh_to_mine)
+def _make_mesh_from_gmsh_element_buffers(points, element_type_buffers, tags=()):
+    """
+    :arg points: ``[nnodes, ambient_dim]``
+    :arg element_type_buffers: a list of :class:`_GmshElementTypeBuffer`
+        instances
+    :arg tags: a list of tuples *(name, index, dimension)* of gmsh physical
+        names
+    """
+    buffers = [buf for buf in element_type_buffers if buf.nelements]
 
-        # }}}
+    groups = []
 
-        # {{{ build vertex array
+    mesh_bulk_dim = max(buf.element_type.dimensions for buf in buffers)
 
-        gmsh_vertex_indices, my_vertex_indices = \
-                list(zip(*six.iteritems(vertex_index_gmsh_to_mine)))
-        vertices = np.empty(
-                (ambient_dim, len(vertex_index_gmsh_to_mine)), dtype=np.float64)
-        vertices[:, np.array(my_vertex_indices, np.intp)] = \
-                self.points[np.array(gmsh_vertex_indices, np.intp)].T
+    # {{{ build vertex numbering
 
-        # }}}
+    used_gmsh_vertex_nrs, my_vertex_nrs = np.unique(
+            np.concatenate([buf.vertex_nrs.reshape(-1) for buf in buffers]),
+            return_inverse=True)
 
-        from meshmode.mesh import SimplexElementGroup, Mesh
+    buffer_vertex_indices = []
+    vertex_nr_base = 0
+    for buf in buffers:
+        buf_nvertex_nrs = buf.vertex_nrs.size
+        buffer_vertex_indices.append(
+                my_vertex_nrs[vertex_nr_base:vertex_nr_base+buf_nvertex_nrs]
+                .reshape(buf.vertex_nrs.shape))
+        vertex_nr_base += buf_nvertex_nrs
 
-        for group_el_type, ngroup_elements in six.iteritems(el_type_hist):
-            if group_el_type.dimensions != mesh_bulk_dim:
-                continue
+    del my_vertex_nrs
 
-            nodes = np.empty((ambient_dim, ngroup_elements, el_type.node_count()),
-                    np.float64)
-            el_vertex_count = group_el_type.vertex_count()
-            vertex_indices = np.empty(
-                    (ngroup_elements, el_vertex_count),
-                    np.int32)
-            i = 0
-
-            for el_vertices, el_nodes, el_type in zip(
-                    self.element_vertices, self.element_nodes, self.element_types):
-                if el_type is not group_el_type:
-                    continue
+    # }}}
 
-                nodes[:, i] = self.points[el_nodes].T
-                vertex_indices[i] = [vertex_index_gmsh_to_mine[v_nr]
-                        for v_nr in el_vertices]
+    # {{{ build vertex array
 
-                i += 1
+    vertices = points[used_gmsh_vertex_nrs].T.copy()
 
-            unit_nodes = (np.array(group_el_type.lexicographic_node_tuples(),
-                    dtype=np.float64).T/group_el_type.order)*2 - 1
+    # }}}
 
-            group = SimplexElementGroup(
-                group_el_type.order,
-                vertex_indices,
-                nodes,
-                unit_nodes=unit_nodes
-                )
+    from meshmode.mesh import SimplexElementGroup, Mesh
 
-            # Gmsh seems to produce elements in the opposite orientation
-            # of what we like. Flip them all.
+    for buf, vertex_indices in zip(buffers, buffer_vertex_indices):
+        group_el_type = buf.element_type
+        if group_el_type.dimensions != mesh_bulk_dim:
+            continue
+
+        # (ambient_dim, nelements, nnodes)
+        nodes = points[buf.lexicographic_nodes].transpose(2, 0, 1).copy()
+
+        unit_nodes = (np.array(group_el_type.lexicographic_node_tuples(),
+                dtype=np.float64).T/group_el_type.order)*2 - 1
+
+        group = SimplexElementGroup(
+            group_el_type.order,
+            vertex_indices.astype(np.int32),
+            nodes,
+            unit_nodes=unit_nodes,
+            element_tags=buf.markers
+            )
+
+        # Gmsh seems to produce elements in the opposite orientation
+        # of what we like. Flip them all.
+
+        if group.dim == 2:
+            from meshmode.mesh.processing import flip_simplex_element_group
+            group = flip_simplex_element_group(vertices, group,
+                    np.ones(buf.nelements, np.bool))
+
+        groups.append(group)
+
+    # {{{ face tags
+
+    bdry_buffers_and_vertex_indices = [
+            (buf, vertex_indices)
+            for buf, vertex_indices in zip(buffers, buffer_vertex_indices)
+            if buf.element_type.dimensions == mesh_bulk_dim - 1]
 
-            if group.dim == 2:
-                from meshmode.mesh.processing import flip_simplex_element_group
-                group = flip_simplex_element_group(vertices, group,
-                        np.ones(ngroup_elements, np.bool))
+    if mesh_bulk_dim >= 2 and bdry_buffers_and_vertex_indices:
+        bdry_tags = np.concatenate([
+            buf.markers for buf, _ in bdry_buffers_and_vertex_indices])
+        bdry_vertex_indices = np.concatenate([
+            vertex_indices
+            for _, vertex_indices in bdry_buffers_and_vertex_indices])
 
-            groups.append(group)
+        is_tagged = bdry_tags != 0
+        groups = _add_gmsh_face_tags(groups,
+                bdry_vertex_indices[is_tagged], bdry_tags[is_tagged])
 
-        return Mesh(vertices, groups, element_connectivity=None)
+    # }}}
+
+    return Mesh(vertices, groups, element_connectivity=None,
+            tag_names=dict((name, index) for name, index, dimension in tags))
 
 # }}}
 
@@ -180,9 +297,14 @@ def read_gmsh(filename, force_ambient_dim=None):
     """Read a gmsh mesh file from *filename* and return a
     :class:`meshmode.mesh.Mesh`.
 
+    Binary files are handed off to :func:`read_gmsh_binary`.
+
     :arg force_ambient_dim: if not None, truncate point coordinates to
         this many dimensions.
     """
+    if _is_binary_gmsh_file(filename):
+        return read_gmsh_binary(filename, force_ambient_dim=force_ambient_dim)
+
     from meshpy.gmsh_reader import read_gmsh
     recv = GmshMeshReceiver()
     read_gmsh(recv, filename, force_dimension=force_ambient_dim)
@@ -190,8 +312,846 @@ def read_gmsh(filename, force_ambient_dim=None):
     return recv.get_mesh()
 
 
+# {{{ chunked gmsh reader
+
+def _empty_maybe_memmapped(shape, dtype, memmap_dir):
+    from pytools import product
+    if memmap_dir is None or product(shape) == 0:
+        return np.empty(shape, dtype)
+
+    # The file is unlinked as soon as it is closed. The mapping remains valid
+    # for as long as the array is alive.
+    from tempfile import TemporaryFile
+    with TemporaryFile(dir=memmap_dir) as tmpf:
+        return np.memmap(tmpf, dtype=dtype, mode="w+", shape=shape)
+
+
+def _iter_gmsh_line_chunks(inf, nlines, chunk_size, section_name):
+    """Yield lists of at most *chunk_size* lines from *inf*, *nlines* in
+    total, and then consume the end marker of *section_name*.
+    """
+    from itertools import islice
+
+    nremaining = nlines
+    while nremaining:
+        nchunk_lines = min(chunk_size, nremaining)
+        lines = list(islice(inf, nchunk_lines))
+        if len(lines) != nchunk_lines:
+            raise GmshFileFormatError("unexpected end of file")
+
+        yield lines
+        nremaining -= nchunk_lines
+
+    if inf.readline().strip() != b"$End" + section_name:
+        raise GmshFileFormatError(
+                "unexpected number of entries in %s section"
+                % section_name.decode())
+
+
+def _parse_gmsh_node_chunk(lines, node_nr_base, ambient_dim):
+    data = np.fromstring(b" ".join(lines), sep=" ")
+    if data.size != 4*len(lines):
+        raise GmshFileFormatError(
+                "expected four-component line in $Nodes section")
+    data = data.reshape(-1, 4)
+
+    if (data[:, 0] != np.arange(
+            node_nr_base+1, node_nr_base+1+len(lines))).any():
+        raise GmshFileFormatError("out-of-order node index found")
+
+    return data[:, 1:1+ambient_dim]
+
+
+def _parse_gmsh_element_chunk(lines, element_nr_base, element_type_map):
+    """
+    :arg lines: a list of element lines, each ending in a newline.
+    :returns: a list of tuples *(element_type, node_nrs, markers)*, one for
+        each element type occurring in *lines*, in order of first occurrence.
+        *node_nrs* are zero-based and in gmsh node order.
+    """
+    chunk = b"".join(lines)
+
+    # {{{ count tokens per line
+
+    chars = np.frombuffer(chunk, dtype=np.uint8)
+
+    # whitespace and control characters
+    char_is_space = chars <= ord(b" ")
+
+    token_starts = ~char_is_space
+    token_starts[1:] &= char_is_space[:-1]
+
+    line_ends, = np.where(chars == ord(b"\n"))
+    if len(line_ends) != len(lines):
+        raise GmshFileFormatError("element line without line break found")
+
+    # Each line contains at least its line break, so none of these
+    # segments is empty.
+    line_starts = np.empty_like(line_ends)
+    line_starts[0] = 0
+    line_starts[1:] = line_ends[:-1] + 1
+    ntokens = np.add.reduceat(token_starts.view(np.uint8), line_starts,
+            dtype=np.intp)
+
+    # }}}
+
+    tokens = np.fromstring(chunk, sep=" ", dtype=np.int64)
+    if tokens.size != ntokens.sum():
+        raise GmshFileFormatError("non-integer entry in element line")
+
+    line_token_starts = np.cumsum(ntokens) - ntokens
+
+    # maps element type to list of (chunk_element_nrs, node_nrs, markers)
+    type_to_parts = {}
+
+    # Element lines of equal length can be processed in bulk.
+    for line_ntokens in np.unique(ntokens):
+        chunk_element_nrs, = np.where(ntokens == line_ntokens)
+        data = tokens[
+                line_token_starts[chunk_element_nrs, np.newaxis]
+                + np.arange(line_ntokens)]
+
+        if line_ntokens < 4:
+            raise GmshFileFormatError("too few entries in element line")
+        if (data[:, 0] != element_nr_base + 1 + chunk_element_nrs).any():
+            raise GmshFileFormatError("out-of-order element index found")
+
+        for el_type_num in np.unique(data[:, 1]):
+            try:
+                element_type = element_type_map[el_type_num]
+            except KeyError:
+                raise GmshFileFormatError("unexpected element type %d"
+                        % el_type_num)
+
+            type_data = data[data[:, 1] == el_type_num]
+            nnodes = element_type.node_count()
+            if (type_data[:, 2] != line_ntokens - 3 - nnodes).any():
+                raise GmshFileFormatError(
+                        "unexpected number of nodes in element")
+
+            if line_ntokens - 3 - nnodes > 0:
+                markers = type_data[:, 3]
+            else:
+                markers = np.zeros(len(type_data), np.int64)
+
+            type_to_parts.setdefault(element_type, []).append((
+                chunk_element_nrs[data[:, 1] == el_type_num],
+                type_data[:, -nnodes:] - 1,
+                markers))
+
+    result = []
+    for element_type, parts in six.iteritems(type_to_parts):
+        chunk_element_nrs, node_nrs, markers = [
+                np.concatenate(part_arrays) for part_arrays in zip(*parts)]
+        perm = np.argsort(chunk_element_nrs, kind="mergesort")
+        result.append((
+            chunk_element_nrs[perm[0]],
+            element_type, node_nrs[perm], markers[perm]))
+
+    result.sort(key=lambda entry: entry[0])
+    return [entry[1:] for entry in result]
+
+
+def read_gmsh_chunked(filename, force_ambient_dim=None, chunk_size=2**16,
+        memmap_dir=None, skip_tests=False):
+    """Read a gmsh mesh file from *filename* and return a
+    :class:`meshmode.mesh.Mesh` equal to the one returned by :func:`read_gmsh`.
+
+    The ``$Nodes`` and ``$Elements`` sections are parsed in chunks of
+    *chunk_size* lines, directly into the arrays of the resulting mesh, so
+    that no per-element Python objects are created. This requires two passes
+    over the ``$Elements`` section.
+
+    :arg force_ambient_dim: if not None, truncate point coordinates to
+        this many dimensions.
+    :arg memmap_dir: if not None, a directory in which the node coordinates
+        and the arrays of the resulting mesh are created as memory-mapped
+        temporary files. This allows reading meshes larger than the
+        available memory.
+    :arg skip_tests: passed on to :class:`meshmode.mesh.Mesh`. The mesh
+        consistency checks operate on entire arrays, so pass *True* to keep
+        memory use bounded. (The same applies to matching tagged boundary
+        elements to element faces, which only happens if there are any.)
+    """
+
+    element_type_map = GmshMeshReceiverBase.gmsh_element_type_to_info_map
+
+    points = None
+    elements_offset = None
+    tags = []
+
+    # element types in order of first occurrence
+    element_types = []
+    element_type_counts = {}
+
+    with open(filename, "rb") as inf:
+        # {{{ first pass: nodes, element counts, used vertices
+
+        while True:
+            next_line = inf.readline()
+            if not next_line:
+                break
+            next_line = next_line.strip()
+            if not next_line:
+                continue
+
+            if not next_line.startswith(b"$"):
+                raise GmshFileFormatError(
+                        "expected start of section, '%s' found instead"
+                        % next_line.decode())
+
+            section_name = next_line[1:]
+
+            if section_name == b"MeshFormat":
+                version_number, file_type, data_size = inf.readline().split()
+                if file_type != b"0":
+                    raise GmshFileFormatError(
+                            "only ASCII gmsh file type is supported")
+                if inf.readline().strip() != b"$EndMeshFormat":
+                    raise GmshFileFormatError(
+                            "more than one line found in MeshFormat section")
+
+            elif section_name == b"Nodes":
+                nnodes = int(inf.readline())
+                ambient_dim = 3
+                if force_ambient_dim is not None:
+                    ambient_dim = force_ambient_dim
+
+                points = _empty_maybe_memmapped(
+                        (nnodes, ambient_dim), np.float64, memmap_dir)
+                vertex_used = np.zeros(nnodes, np.bool)
+
+                node_nr_base = 0
+                for lines in _iter_gmsh_line_chunks(
+                        inf, nnodes, chunk_size, section_name):
+                    points[node_nr_base:node_nr_base+len(lines)] = \
+                            _parse_gmsh_node_chunk(lines, node_nr_base, ambient_dim)
+                    node_nr_base += len(lines)
+
+            elif section_name == b"Elements":
+                nelements = int(inf.readline())
+                elements_offset = inf.tell()
+
+                if points is None:
+                    raise GmshFileFormatError(
+                            "$Elements section found before $Nodes")
+
+                element_nr_base = 0
+                for lines in _iter_gmsh_line_chunks(
+                        inf, nelements, chunk_size, section_name):
+                    for element_type, node_nrs, _ in _parse_gmsh_element_chunk(
+                            lines, element_nr_base, element_type_map):
+                        if element_type not in element_type_counts:
+                            element_types.append(element_type)
+                            element_type_counts[element_type] = 0
+
+                        element_type_counts[element_type] += len(node_nrs)
+                        vertex_used[
+                                node_nrs[:, :element_type.vertex_count()]] = True
+
+                    element_nr_base += len(lines)
+
+            elif section_name == b"PhysicalNames":
+                tags.extend(_read_gmsh_physical_names(inf))
+
+            else:
+                # unrecognized section, skip
+                from warnings import warn
+                warn("unrecognized section '%s' in gmsh file"
+                        % section_name.decode())
+
+                end_marker = b"$End" + section_name
+                while True:
+                    next_line = inf.readline()
+                    if not next_line:
+                        raise GmshFileFormatError("unexpected end of file")
+                    if next_line.strip() == end_marker:
+                        break
+
+        if elements_offset is None:
+            raise GmshFileFormatError("no $Elements section found")
+
+        # }}}
+
+        # {{{ vertex numbering, vertex array
+
+        # Number the vertices in order of their gmsh numbers, like
+        # the np.unique in GmshMeshReceiver.get_mesh.
+        gmsh_vertex_nr_to_mine = np.cumsum(vertex_used, dtype=np.int32) - 1
+        nvertices = int(gmsh_vertex_nr_to_mine[-1]) + 1 if nnodes else 0
+
+        vertices = _empty_maybe_memmapped(
+                (ambient_dim, nvertices), np.float64, memmap_dir)
+
+        for node_nr_base in range(0, nnodes, chunk_size):
+            node_slice = slice(node_nr_base, node_nr_base+chunk_size)
+            chunk_used = vertex_used[node_slice]
+            vertices[:, gmsh_vertex_nr_to_mine[node_slice][chunk_used]] = \
+                    points[node_slice][chunk_used].T
+
+        del vertex_used
+
+        # }}}
+
+        # {{{ allocate groups
+
+        mesh_bulk_dim = max(el_type.dimensions for el_type in element_types)
+        bulk_element_types = [
+                el_type for el_type in element_types
+                if el_type.dimensions == mesh_bulk_dim]
+
+        group_vertex_indices = {}
+        group_nodes = {}
+        group_element_tags = {}
+        group_flip_matrices = {}
+        group_element_nr_bases = {}
+        group_unit_nodes = {}
+
+        for el_type in bulk_element_types:
+            nel = element_type_counts[el_type]
+            group_vertex_indices[el_type] = _empty_maybe_memmapped(
+                    (nel, el_type.vertex_count()), np.int32, memmap_dir)
+            group_nodes[el_type] = _empty_maybe_memmapped(
+                    (ambient_dim, nel, el_type.node_count()), np.float64,
+                    memmap_dir)
+            group_element_tags[el_type] = _empty_maybe_memmapped(
+                    (nel,), np.int32, memmap_dir)
+            group_element_nr_bases[el_type] = 0
+
+            group_unit_nodes[el_type] = (
+                    np.array(el_type.lexicographic_node_tuples(),
+                        dtype=np.float64).T/el_type.order)*2 - 1
+
+            # Gmsh seems to produce elements in the opposite orientation
+            # of what we like. Flip them all, as GmshMeshReceiver does.
+            if mesh_bulk_dim == 2:
+                from meshmode.mesh.processing import \
+                        get_simplex_element_flip_matrix
+                group_flip_matrices[el_type] = get_simplex_element_flip_matrix(
+                        el_type.order, group_unit_nodes[el_type])
+
+        # }}}
+
+        # {{{ second pass: fill groups
+
+        inf.seek(elements_offset)
+
+        # tagged boundary elements, one dimension below the bulk
+        bdry_vertex_indices = []
+        bdry_tags = []
+
+        element_nr_base = 0
+        for lines in _iter_gmsh_line_chunks(
+                inf, nelements, chunk_size, b"Elements"):
+            for el_type, node_nrs, markers in _parse_gmsh_element_chunk(
+                    lines, element_nr_base, element_type_map):
+                if (el_type.dimensions == mesh_bulk_dim - 1
+                        and mesh_bulk_dim >= 2):
+                    is_tagged = markers != 0
+                    bdry_vertex_indices.append(gmsh_vertex_nr_to_mine[
+                        node_nrs[is_tagged, :el_type.vertex_count()]])
+                    bdry_tags.append(markers[is_tagged].astype(np.int32))
+
+                if el_type.dimensions != mesh_bulk_dim:
+                    continue
+
+                vertex_indices = gmsh_vertex_nr_to_mine[
+                        node_nrs[:, :el_type.vertex_count()]]
+                # (ambient_dim, nelements, nnodes)
+                nodes = points[
+                        node_nrs[:, el_type.get_lexicographic_gmsh_node_indices()]
+                        ].transpose(2, 0, 1)
+
+                if el_type in group_flip_matrices:
+                    vertex_indices[:, [0, 1]] = vertex_indices[:, [1, 0]]
+                    nodes = np.einsum(
+                            "ij,dej->dei",
+                            group_flip_matrices[el_type], nodes)
+
+                base = group_element_nr_bases[el_type]
+                el_slice = slice(base, base+len(node_nrs))
+                group_vertex_indices[el_type][el_slice] = vertex_indices
+                group_nodes[el_type][:, el_slice] = nodes
+                group_element_tags[el_type][el_slice] = markers
+                group_element_nr_bases[el_type] += len(node_nrs)
+
+            element_nr_base += len(lines)
+
+        # }}}
+
+    del points
+
+    from meshmode.mesh import SimplexElementGroup, Mesh
+
+    groups = [
+            SimplexElementGroup(
+                el_type.order,
+                group_vertex_indices[el_type],
+                group_nodes[el_type],
+                unit_nodes=group_unit_nodes[el_type],
+                element_tags=group_element_tags[el_type])
+            for el_type in bulk_element_types]
+
+    if bdry_tags:
+        groups = _add_gmsh_face_tags(groups,
+                np.concatenate(bdry_vertex_indices),
+                np.concatenate(bdry_tags))
+
+    return Mesh(vertices, groups, skip_tests=skip_tests,
+            element_connectivity=None,
+            tag_names=dict((name, index) for name, index, dimension in tags))
+
+# }}}
+
+
+# {{{ binary gmsh reader
+
+def _is_binary_gmsh_file(filename):
+    with open(filename, "rb") as inf:
+        if inf.readline().strip() != b"$MeshFormat":
+            return False
+
+        return inf.readline().split()[1:2] == [b"1"]
+
+
+def _read_gmsh_binary_block(inf, dtype, count):
+    dtype = np.dtype(dtype)
+    data = inf.read(dtype.itemsize*count)
+    if len(data) != dtype.itemsize*count:
+        raise GmshFileFormatError("unexpected end of file")
+
+    return np.frombuffer(data, dtype)
+
+
+def _read_gmsh_section_end(inf, section_name):
+    # Binary data is followed by a newline before the end marker.
+    while True:
+        next_line = inf.readline()
+        if not next_line:
+            raise GmshFileFormatError("unexpected end of file")
+
+        next_line = next_line.strip()
+        if next_line:
+            break
+
+    if next_line != b"$End" + section_name:
+        raise GmshFileFormatError("expected end of %s section, '%s' found instead"
+                % (section_name.decode(), next_line.decode()))
+
+
+def _read_gmsh_physical_names(inf):
+    """Read the body of a ``$PhysicalNames`` section from the binary-mode
+    file *inf*.
+
+    :returns: a list of tuples *(name, index, dimension)*, as passed to
+        :meth:`GmshMeshReceiver.add_tag`.
+    """
+    result = []
+    for i in range(int(inf.readline())):
+        dimension, number, name = inf.readline().strip().split(b" ", 2)
+        name = name.decode("utf-8")
+
+        if not name[0] == '"' or not name[-1] == '"':
+            raise GmshFileFormatError("expected quotes around physical name")
+
+        result.append((name[1:-1], int(number), int(dimension)))
+
+    _read_gmsh_section_end(inf, b"PhysicalNames")
+    return result
+
+
+def read_gmsh_binary(filename, force_ambient_dim=None):
+    """Read a binary gmsh mesh file (as written by :command:`gmsh -bin`)
+    from *filename* and return a :class:`meshmode.mesh.Mesh`.
+
+    Nodes and each block of same-type elements are read in bulk, so that no
+    per-element work is done in Python. The result is the same as that of
+    :func:`read_gmsh` on the ASCII version of the same file.
+
+    :arg force_ambient_dim: if not None, truncate point coordinates to
+        this many dimensions.
+    """
+
+    element_type_map = GmshMeshReceiverBase.gmsh_element_type_to_info_map
+
+    points = None
+    element_type_buffers = None
+    tags = []
+    byte_order = "<"
+
+    with open(filename, "rb") as inf:
+        while True:
+            next_line = inf.readline()
+            if not next_line:
+                break
+            next_line = next_line.strip()
+            if not next_line:
+                continue
+
+            if not next_line.startswith(b"$"):
+                raise GmshFileFormatError(
+                        "expected start of section, '%s' found instead"
+                        % next_line.decode())
+
+            section_name = next_line[1:]
+
+            if section_name == b"MeshFormat":
+                version_number, file_type, data_size = inf.readline().split()
+                if file_type != b"1":
+                    raise GmshFileFormatError(
+                            "only binary gmsh file type is supported")
+                if int(data_size) != 8:
+                    raise GmshFileFormatError(
+                            "unsupported data size %s" % data_size.decode())
+
+                one = inf.read(4)
+                if np.frombuffer(one, "<i4")[0] == 1:
+                    byte_order = "<"
+                elif np.frombuffer(one, ">i4")[0] == 1:
+                    byte_order = ">"
+                else:
+                    raise GmshFileFormatError("invalid byte order marker")
+
+                _read_gmsh_section_end(inf, section_name)
+
+            elif section_name == b"Nodes":
+                nnodes = int(inf.readline())
+
+                node_data = _read_gmsh_binary_block(inf, [
+                    ("nr", byte_order+"i4"),
+                    ("coords", byte_order+"f8", 3),
+                    ], nnodes)
+
+                if (node_data["nr"] != np.arange(1, nnodes+1)).any():
+                    raise GmshFileFormatError("out-of-order node index found")
+
+                points = node_data["coords"][:, :force_ambient_dim].astype(
+                        np.float64)
+
+                del node_data
+
+                _read_gmsh_section_end(inf, section_name)
+
+            elif section_name == b"Elements":
+                nelements = int(inf.readline())
+                int_dtype = np.dtype(byte_order+"i4")
+
+                # maps element type to _GmshElementTypeBuffer, in order of
+                # first occurrence
+                type_to_buffer = {}
+                element_type_buffers = []
+
+                element_nr_base = 0
+                while element_nr_base < nelements:
+                    # Elements come in blocks of the same type and tag count.
+                    el_type_num, nblock_elements, ntags = \
+                            _read_gmsh_binary_block(inf, int_dtype, 3)
+
+                    try:
+                        element_type = element_type_map[el_type_num]
+                    except KeyError:
+                        raise GmshFileFormatError("unexpected element type %d"
+                                % el_type_num)
+
+                    block = _read_gmsh_binary_block(inf, int_dtype,
+                            nblock_elements*(1+ntags+element_type.node_count())
+                            ).reshape(nblock_elements, -1)
+
+                    if (block[:, 0] != np.arange(
+                            element_nr_base+1,
+                            element_nr_base+1+nblock_elements)).any():
+                        raise GmshFileFormatError(
+                                "out-of-order element index found")
+
+                    # convert to zero-based
+                    node_nrs = block[:, 1+ntags:].astype(np.intp) - 1
+
+                    if ntags:
+                        markers = block[:, 1]
+                    else:
+                        markers = 0
+
+                    try:
+                        buf = type_to_buffer[element_type]
+                    except KeyError:
+                        buf = type_to_buffer[element_type] = \
+                                _GmshElementTypeBuffer(element_type)
+                        element_type_buffers.append(buf)
+
+                    buf.reserve(nblock_elements,
+                            buf.nelements + nelements - element_nr_base)
+
+                    lex_node_indices = \
+                            element_type.get_lexicographic_gmsh_node_indices()
+                    buf.add_block(
+                            node_nrs[:, :element_type.vertex_count()],
+                            node_nrs[:, lex_node_indices],
+                            markers)
+
+                    element_nr_base += nblock_elements
+
+                if element_nr_base != nelements:
+                    raise GmshFileFormatError(
+                            "unexpected number of elements found")
+
+                for buf in element_type_buffers:
+                    buf.finalize()
+
+                _read_gmsh_section_end(inf, section_name)
+
+            elif section_name == b"PhysicalNames":
+                tags.extend(_read_gmsh_physical_names(inf))
+
+            else:
+                # unrecognized section, skip
+                from warnings import warn
+                warn("unrecognized section '%s' in gmsh file"
+                        % section_name.decode())
+
+                end_marker = b"$End" + section_name
+                while True:
+                    next_line = inf.readline()
+                    if not next_line:
+                        raise GmshFileFormatError("unexpected end of file")
+                    if next_line.strip() == end_marker:
+                        break
+
+    if points is None or element_type_buffers is None:
+        raise GmshFileFormatError("no $Nodes or $Elements section found")
+
+    return _make_mesh_from_gmsh_element_buffers(
+            points, element_type_buffers, tags)
+
+# }}}
+
+
+# {{{ gmsh result cache
+
+def _get_executable_stamp(executable):
+    """Return a string identifying the file run as *executable*, which changes
+    when that file is replaced or modified, or *None* if it cannot be found.
+    """
+    try:
+        from shutil import which
+    except ImportError:
+        from distutils.spawn import find_executable as which
+
+    path = which(executable)
+    if path is None:
+        return None
+
+    from os import stat
+    from os.path import realpath
+    path = realpath(path)
+    st = stat(path)
+    return repr((path, st.st_size, st.st_mtime))
+
+
+@memoize
+def _get_gmsh_version(gmsh_executable, executable_stamp):
+    # *executable_stamp* is only part of the memoization key.
+    from subprocess import check_output, STDOUT
+    return check_output([gmsh_executable, "--version"], stderr=STDOUT) \
+            .strip().decode("utf-8", "replace")
+
+
+class GmshMeshCache(object):
+    """An opt-in on-disk cache of the meshes returned by :func:`generate_gmsh`,
+    see the *cache* argument there.
+
+    Entries are keyed by a hash of the source text and of all arguments
+    that influence the result. Each mesh is stored as an uncompressed
+    ``.npz`` file of its arrays, along with the version of :command:`gmsh`
+    that generated it. An entry is only used if that version is still the
+    one installed. To avoid starting :command:`gmsh` on every lookup, the
+    version is only queried again once the executable file changes.
+    Once the total size of the cache exceeds *max_size* bytes, the least
+    recently used entries are removed.
+
+    .. note::
+
+        For a :class:`FileSource`, only the contents of the named file
+        enter the hash, not those of any files it may include or merge.
+
+    .. automethod:: clear
+    """
+
+    format_version = 3
+
+    def __init__(self, cache_dir, max_size=2**30):
+        """
+        :arg cache_dir: the directory in which to store cached meshes.
+            Created if it does not exist.
+        """
+        from os import makedirs
+        from os.path import isdir
+        if not isdir(cache_dir):
+            makedirs(cache_dir)
+
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    def _get_key(self, source, dimensions, order, other_options, extension,
+            gmsh_executable, force_ambient_dim):
+        from hashlib import sha256
+        key_hash = sha256()
+
+        if isinstance(source, FileSource):
+            from os.path import splitext
+            with open(source.filename, "rb") as inf:
+                key_hash.update(inf.read())
+            extension = splitext(source.filename)[1]
+        elif isinstance(source, LiteralSource):
+            key_hash.update(source.source.encode("utf-8"))
+            extension = source.extension
+        else:
+            raise TypeError("'source' type unrecognized")
+
+        key_hash.update(repr((
+            self.format_version,
+            extension, dimensions, order, list(other_options),
+            force_ambient_dim, gmsh_executable,
+            )).encode("utf-8"))
+
+        return key_hash.hexdigest()
+
+    def _get_path(self, key):
+        from os.path import join
+        return join(self.cache_dir, key + ".npz")
+
+    def _get_mesh(self, key, gmsh_executable):
+        """Return the mesh stored under *key*, if it was generated by the
+        currently installed version of *gmsh_executable*. Otherwise, raise
+        :exc:`KeyError`.
+        """
+        from os.path import exists
+        path = self._get_path(key)
+        if not exists(path):
+            raise KeyError(key)
+
+        try:
+            with np.load(path) as data:
+                arrays = dict(data.items())
+        except Exception:
+            # possibly truncated or being written concurrently
+            raise KeyError(key)
+
+        executable_stamp = _get_executable_stamp(gmsh_executable)
+        if executable_stamp is None:
+            # gmsh cannot be found, so the entry's version cannot be checked
+            raise KeyError(key)
+        if executable_stamp != str(arrays["gmsh_executable_stamp"]):
+            # gmsh was replaced, updated or moved since the entry was made
+            if (_get_gmsh_version(gmsh_executable, executable_stamp)
+                    != str(arrays["gmsh_version"])):
+                raise KeyError(key)
+
+        # mark as recently used
+        from os import utime
+        try:
+            utime(path, None)
+        except OSError:
+            pass
+
+        from meshmode.mesh import SimplexElementGroup, Mesh
+        groups = [
+                SimplexElementGroup(
+                    int(arrays["group%d_order" % igrp]),
+                    arrays["group%d_vertex_indices" % igrp],
+                    arrays["group%d_nodes" % igrp],
+                    unit_nodes=arrays["group%d_unit_nodes" % igrp],
+                    element_tags=arrays.get("group%d_element_tags" % igrp),
+                    face_tags=arrays.get("group%d_face_tags" % igrp))
+                for igrp in range(int(arrays["ngroups"]))]
+
+        tag_names = dict(zip(
+            (str(name) for name in arrays["tag_names"]),
+            (int(number) for number in arrays["tag_numbers"])))
+
+        # The mesh was checked when it was first generated.
+        return Mesh(arrays["vertices"], groups, skip_tests=True,
+                element_connectivity=None, tag_names=tag_names)
+
+    def _set_mesh(self, key, mesh, gmsh_executable):
+        """Store *mesh*, generated by *gmsh_executable*, under *key*."""
+        executable_stamp = _get_executable_stamp(gmsh_executable)
+
+        tag_names = sorted(six.iteritems(mesh.tag_names))
+        arrays = {
+                "gmsh_version": _get_gmsh_version(
+                    gmsh_executable, executable_stamp),
+                "gmsh_executable_stamp": str(executable_stamp),
+                "vertices": mesh.vertices,
+                "ngroups": len(mesh.groups),
+                "tag_names": np.array(
+                    [name for name, _ in tag_names], dtype=np.unicode_),
+                "tag_numbers": np.array(
+                    [number for _, number in tag_names], dtype=np.int64),
+                }
+        for igrp, grp in enumerate(mesh.groups):
+            arrays["group%d_order" % igrp] = grp.order
+            arrays["group%d_vertex_indices" % igrp] = grp.vertex_indices
+            arrays["group%d_nodes" % igrp] = grp.nodes
+            arrays["group%d_unit_nodes" % igrp] = grp.unit_nodes
+            if grp.element_tags is not None:
+                arrays["group%d_element_tags" % igrp] = grp.element_tags
+            if grp.face_tags is not None:
+                arrays["group%d_face_tags" % igrp] = grp.face_tags
+
+        # Write to a temporary file first so that readers never see
+        # a partially written entry.
+        from os import rename, fdopen
+        from tempfile import mkstemp
+        fd, temp_path = mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with fdopen(fd, "wb") as outf:
+            np.savez(outf, **arrays)
+        rename(temp_path, self._get_path(key))
+
+        self._evict()
+
+    def _evict(self):
+        from os import listdir, stat, unlink
+        from os.path import join
+
+        entries = []
+        for name in listdir(self.cache_dir):
+            if not name.endswith(".npz"):
+                continue
+            path = join(self.cache_dir, name)
+            try:
+                st = stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+
+        # least recently used first
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            try:
+                unlink(path)
+            except OSError:
+                pass
+            total_size -= size
+
+    def clear(self):
+        """Remove all entries from the cache."""
+        max_size = self.max_size
+        self.max_size = 0
+        try:
+            self._evict()
+        finally:
+            self.max_size = max_size
+
+# }}}
+
+
 def generate_gmsh(source, dimensions, order=None, other_options=[],
-        extension="geo", gmsh_executable="gmsh", force_ambient_dim=None):
+        extension="geo", gmsh_executable="gmsh", force_ambient_dim=None,
+        cache=None):
     """Run :command:`gmsh` on the input given by *source*, and return a
     :class:`meshmode.mesh.Mesh` based on the result.
 
@@ -199,18 +1159,37 @@ def generate_gmsh(source, dimensions, order=None, other_options=[],
         :class:`LiteralSource`
     :arg force_ambient_dim: if not None, truncate point coordinates to
         this many dimensions.
+    :arg cache: if not None, a :class:`GmshMeshCache` that is consulted
+        before, and updated after, running :command:`gmsh`.
     """
-    recv = GmshMeshReceiver()
+    if cache is not None:
+        cache_key = cache._get_key(source, dimensions, order, other_options,
+                extension, gmsh_executable, force_ambient_dim)
+        try:
+            mesh = cache._get_mesh(cache_key, gmsh_executable)
+        except KeyError:
+            mesh = None
+    else:
+        mesh = None
 
-    from meshpy.gmsh import GmshRunner
-    from meshpy.gmsh_reader import parse_gmsh
-    with GmshRunner(source, dimensions, order=order,
-            other_options=other_options, extension=extension,
-            gmsh_executable=gmsh_executable) as runner:
-        parse_gmsh(recv, runner.output_file,
-                force_dimension=force_ambient_dim)
+    if mesh is None:
+        from meshpy.gmsh import GmshRunner
+        from meshpy.gmsh_reader import parse_gmsh
+        with GmshRunner(source, dimensions, order=order,
+                other_options=other_options, extension=extension,
+                gmsh_executable=gmsh_executable) as runner:
+            # e.g. if "-bin" was passed in other_options
+            if _is_binary_gmsh_file(runner.output_file.name):
+                mesh = read_gmsh_binary(runner.output_file.name,
+                        force_ambient_dim=force_ambient_dim)
+            else:
+                recv = GmshMeshReceiver()
+                parse_gmsh(recv, runner.output_file,
+                        force_dimension=force_ambient_dim)
+                mesh = recv.get_mesh()
 
-    mesh = recv.get_mesh()
+        if cache is not None:
+            cache._set_mesh(cache_key, mesh, gmsh_executable)
 
     if force_ambient_dim is None:
         AXIS_NAMES = "xyz"
@@ -226,3 +1205,45 @@ def generate_gmsh(source, dimensions, order=None, other_options=[],
                 break
 
     return mesh
+
+
+# {{{ concurrent generation
+
+def _generate_gmsh_job(job):
+    return generate_gmsh(**job)
+
+
+def generate_gmsh_many(jobs, nprocesses=None):
+    """Run :func:`generate_gmsh` for each entry of *jobs* concurrently.
+
+    Each job runs in a worker process, so that both the :command:`gmsh`
+    subprocesses and the parsing of their output proceed in parallel.
+
+    :arg jobs: a sequence of dictionaries of keyword arguments to
+        :func:`generate_gmsh`, e.g.
+        ``dict(source=FileSource("x.step"), dimensions=2, order=3)``.
+    :arg nprocesses: the maximum number of jobs to run at once. Defaults
+        to the number of processors.
+    :returns: a list of :class:`meshmode.mesh.Mesh` instances, in the
+        order of *jobs*.
+    """
+    jobs = list(jobs)
+
+    if nprocesses is None:
+        from multiprocessing import cpu_count
+        nprocesses = cpu_count()
+
+    nprocesses = min(nprocesses, len(jobs))
+
+    if nprocesses <= 1:
+        return [_generate_gmsh_job(job) for job in jobs]
+
+    from multiprocessing import Pool
+    pool = Pool(nprocesses)
+    try:
+        return pool.map(_generate_gmsh_job, jobs, chunksize=1)
+    finally:
+        pool.terminate()
+        pool.join()
+
+# }}}
@@ -33,9 +33,11 @@ import modepy as mp
 __doc__ = """
 .. autofunction:: find_volume_mesh_element_orientations
 .. autofunction:: perform_flips
+.. autofunction:: find_group_face_tags
 .. autofunction:: find_bounding_box
 .. autofunction:: merge_dijsoint_meshes
 .. autofunction:: affine_map
+.. autofunction:: extrude_mesh
 """
 
 
@@ -130,27 +132,16 @@ def test_volume_mesh_element_orientations(mesh):
 
 # {{{ flips
 
-def flip_simplex_element_group(vertices, grp, grp_flip_flags):
+def get_simplex_element_flip_matrix(order, unit_nodes):
+    """Return a resampling matrix that corresponds to the first two
+    barycentric coordinates being swapped, i.e. to swapping the first two
+    vertices of a simplex with nodes *unit_nodes*.
+    """
     from modepy.tools import barycentric_to_unit, unit_to_barycentric
 
-    from meshmode.mesh import SimplexElementGroup
-
-    if not isinstance(grp, SimplexElementGroup):
-        raise NotImplementedError("flips only supported on "
-                "exclusively SimplexElementGroup-based meshes")
-
-    # Swap the first two vertices on elements to be flipped.
-
-    new_vertex_indices = grp.vertex_indices.copy()
-    new_vertex_indices[grp_flip_flags, 0] \
-            = grp.vertex_indices[grp_flip_flags, 1]
-    new_vertex_indices[grp_flip_flags, 1] \
-            = grp.vertex_indices[grp_flip_flags, 0]
-
-    # Generate a resampling matrix that corresponds to the
-    # first two barycentric coordinates being swapped.
+    dim = unit_nodes.shape[0]
 
-    bary_unit_nodes = unit_to_barycentric(grp.unit_nodes)
+    bary_unit_nodes = unit_to_barycentric(unit_nodes)
 
     flipped_bary_unit_nodes = bary_unit_nodes.copy()
     flipped_bary_unit_nodes[0, :] = bary_unit_nodes[1, :]
@@ -158,8 +149,8 @@ def flip_simplex_element_group(vertices, grp, grp_flip_flags):
     flipped_unit_nodes = barycentric_to_unit(flipped_bary_unit_nodes)
 
     flip_matrix = mp.resampling_matrix(
-            mp.simplex_onb(grp.dim, grp.order),
-            flipped_unit_nodes, grp.unit_nodes)
+            mp.simplex_onb(dim, order),
+            flipped_unit_nodes, unit_nodes)
 
     flip_matrix[np.abs(flip_matrix) < 1e-15] = 0
 
@@ -168,15 +159,50 @@ def flip_simplex_element_group(vertices, grp, grp_flip_flags):
             np.dot(flip_matrix, flip_matrix)
             - np.eye(len(flip_matrix))) < 1e-13
 
+    return flip_matrix
+
+
+def flip_simplex_element_group(vertices, grp, grp_flip_flags):
+    from meshmode.mesh import SimplexElementGroup
+
+    if not isinstance(grp, SimplexElementGroup):
+        raise NotImplementedError("flips only supported on "
+                "exclusively SimplexElementGroup-based meshes")
+
+    # Swap the first two vertices on elements to be flipped.
+
+    new_vertex_indices = grp.vertex_indices.copy()
+    new_vertex_indices[grp_flip_flags, 0] \
+            = grp.vertex_indices[grp_flip_flags, 1]
+    new_vertex_indices[grp_flip_flags, 1] \
+            = grp.vertex_indices[grp_flip_flags, 0]
+
+    flip_matrix = get_simplex_element_flip_matrix(grp.order, grp.unit_nodes)
+
     # Apply the flip matrix to the nodes.
     new_nodes = grp.nodes.copy()
     new_nodes[:, grp_flip_flags] = np.einsum(
             "ij,dej->dei",
             flip_matrix, grp.nodes[:, grp_flip_flags])
 
+    # Swapping two vertices renumbers the faces.
+    new_face_tags = grp.face_tags
+    if new_face_tags is not None:
+        face_vertex_sets = [
+                frozenset(fvi) for fvi in grp.face_vertex_indices()]
+        flipped_face_numbers = [
+                face_vertex_sets.index(frozenset(
+                    {0: 1, 1: 0}.get(ivertex, ivertex) for ivertex in fvi))
+                for fvi in grp.face_vertex_indices()]
+
+        new_face_tags = new_face_tags.copy()
+        new_face_tags[grp_flip_flags] = \
+                new_face_tags[grp_flip_flags][:, flipped_face_numbers]
+
     return SimplexElementGroup(
             grp.order, new_vertex_indices, new_nodes,
-            unit_nodes=grp.unit_nodes)
+            unit_nodes=grp.unit_nodes,
+            element_tags=grp.element_tags, face_tags=new_face_tags)
 
 
 def perform_flips(mesh, flip_flags, skip_tests=False):
@@ -197,7 +223,63 @@ def perform_flips(mesh, flip_flags, skip_tests=False):
 
         new_groups.append(new_grp)
 
-    return Mesh(mesh.vertices, new_groups, skip_tests=skip_tests)
+    return Mesh(mesh.vertices, new_groups, skip_tests=skip_tests,
+            tag_names=mesh.tag_names)
+
+# }}}
+
+
+# {{{ face tags
+
+def find_group_face_tags(grp, tagged_face_vertex_indices, tags):
+    """Match the faces given by *tagged_face_vertex_indices* against the
+    element faces of *grp*, by sorting the combined list of vertex tuples.
+
+    :arg tagged_face_vertex_indices: an integer array of shape
+        *(ntagged_faces, grp.dim)* of (mesh-wide) vertex indices. The
+        order of the vertices within each face does not matter.
+    :arg tags: an integer array of shape *(ntagged_faces,)*.
+    :returns: an array suitable for :attr:`MeshElementGroup.face_tags`,
+        of shape *(grp.nelements, nfaces)*, containing the tag of each
+        matched face and 0 for faces not found.
+    """
+
+    grp_face_vertex_indices = np.array(grp.face_vertex_indices())
+    nfaces, nface_vertices = grp_face_vertex_indices.shape
+
+    if tagged_face_vertex_indices.shape[-1] != nface_vertices:
+        raise ValueError("tagged faces must have %d vertices each"
+                % nface_vertices)
+
+    # (nelements*nfaces, nface_vertices)
+    el_faces = grp.vertex_indices[:, grp_face_vertex_indices].reshape(
+            -1, nface_vertices)
+    nel_faces = len(el_faces)
+
+    all_faces = np.sort(
+            np.vstack([el_faces, tagged_face_vertex_indices]),
+            axis=1)
+
+    # lexsort treats its last key as the primary one
+    order = np.lexsort(all_faces.T[::-1])
+    sorted_faces = all_faces[order]
+
+    # Identical faces are now adjacent. Number the runs of identical faces
+    # and give each run the tag of the tagged face in it, if any.
+    run_starts = np.empty(len(sorted_faces), np.bool)
+    run_starts[:1] = True
+    run_starts[1:] = np.any(sorted_faces[1:] != sorted_faces[:-1], axis=1)
+    run_numbers = np.cumsum(run_starts) - 1
+
+    run_tags = np.zeros(run_numbers[-1] + 1 if len(run_numbers) else 0,
+            np.int32)
+    is_tagged = order >= nel_faces
+    run_tags[run_numbers[is_tagged]] = tags[order[is_tagged] - nel_faces]
+
+    face_run_numbers = np.empty(len(order), np.intp)
+    face_run_numbers[order] = run_numbers
+
+    return run_tags[face_run_numbers[:nel_faces]].reshape(-1, nfaces)
 
 # }}}
 
@@ -265,8 +347,13 @@ def merge_dijsoint_meshes(meshes, skip_tests=False):
 
     # }}}
 
+    tag_names = {}
+    for mesh in meshes:
+        tag_names.update(mesh.tag_names)
+
     from meshmode.mesh import Mesh
-    return Mesh(vertices, new_groups, skip_tests=skip_tests)
+    return Mesh(vertices, new_groups, skip_tests=skip_tests,
+            tag_names=tag_names)
 
 # }}}
 
@@ -291,7 +378,198 @@ def affine_map(mesh, A=None, b=None):
     # }}}
 
     from meshmode.mesh import Mesh
-    return Mesh(vertices, new_groups, skip_tests=True)
+    return Mesh(vertices, new_groups, skip_tests=True,
+            tag_names=mesh.tag_names)
+
+# }}}
+
+
+# {{{ extrusion
+
+# Splitting of a prism into three tetrahedra. Prism vertices 0, 1, 2 are
+# the bottom triangle vertices in order of increasing global vertex number,
+# 3, 4, 5 the top vertices above them. Each quadrilateral side face is
+# split along the diagonal from the bottom vertex with the larger global
+# number to the top vertex with the smaller one. Since this choice only
+# depends on global vertex numbers, neighboring prisms split their shared
+# faces the same way.
+_PRISM_TETS = np.array([
+    [0, 1, 2, 3],
+    [1, 2, 3, 4],
+    [2, 3, 4, 5],
+    ])
+
+
+def _extrude_simplex_group(grp, layer_heights, vertex_directions,
+        nvertices, vertices_3d):
+    from modepy.tools import unit_to_barycentric, barycentric_to_unit
+
+    nlayers = len(layer_heights) - 1
+    nelements = grp.nelements
+
+    # {{{ tetrahedron vertices, in terms of prism vertices
+
+    # nelements, 3: triangle vertices sorted by global number
+    sorted_tri_vertices = np.argsort(grp.vertex_indices, axis=1, kind="mergesort")
+
+    # nelements, 3 tets, 4 vertices: prism-local vertex numbers 0..5, where
+    # 0..2 are the triangle's bottom vertices and 3..5 the top ones
+    prism_vertices = (
+            sorted_tri_vertices[:, _PRISM_TETS % 3]
+            + 3*(_PRISM_TETS >= 3))
+
+    # nlayers, nelements, 3 tets, 4 vertices
+    prism_vertices = np.tile(prism_vertices, (nlayers, 1, 1, 1))
+
+    layers = np.arange(nlayers)[:, np.newaxis, np.newaxis, np.newaxis]
+    vertex_indices = (
+            grp.vertex_indices[
+                np.arange(nelements)[:, np.newaxis, np.newaxis],
+                prism_vertices % 3]
+            + nvertices*(layers + prism_vertices // 3))
+
+    # make all tetrahedra positively oriented by swapping their first two
+    # vertices where needed
+    tet_vertices = vertices_3d[:, vertex_indices]
+    spanning_vectors = (
+            tet_vertices[:, :, :, :, 1:]
+            - tet_vertices[:, :, :, :, 0][:, :, :, :, np.newaxis])
+    orientations = la.det(spanning_vectors.transpose(1, 2, 3, 4, 0))
+
+    flip = orientations < 0
+    for ary in [prism_vertices, vertex_indices]:
+        ary[flip, :2] = ary[flip, 1::-1]
+
+    # }}}
+
+    # {{{ nodes
+
+    tet_unit_nodes = mp.warp_and_blend_nodes(3, grp.order)
+    tet_bary_unit_nodes = unit_to_barycentric(tet_unit_nodes)
+
+    tri_basis = mp.simplex_onb(2, grp.order)
+
+    nodes = np.empty(
+            (3, nlayers, nelements, 3, tet_unit_nodes.shape[-1]),
+            dtype=grp.nodes.dtype)
+
+    # There are only a few distinct ways in which a tetrahedron can sit
+    # inside its prism. Find them, and map the nodes of all tetrahedra
+    # sharing one at once.
+    pattern_codes = np.dot(prism_vertices, 6**np.arange(4))
+    patterns, pattern_indices = np.unique(pattern_codes, return_inverse=True)
+    pattern_indices = pattern_indices.reshape(pattern_codes.shape)
+
+    for ipattern, pattern_code in enumerate(patterns):
+        pattern = pattern_code // 6**np.arange(4) % 6
+
+        # barycentric coordinates of the tet nodes in the triangle, and
+        # relative height in the prism
+        tri_bary = np.zeros((3, tet_unit_nodes.shape[-1]))
+        for itet_vertex, prism_vertex in enumerate(pattern):
+            tri_bary[prism_vertex % 3] += tet_bary_unit_nodes[itet_vertex]
+        rel_heights = np.sum(
+                tet_bary_unit_nodes[pattern >= 3], axis=0)
+
+        resampling_mat = mp.resampling_matrix(
+                tri_basis, barycentric_to_unit(tri_bary), grp.unit_nodes)
+
+        layer_nrs, el_nrs, itets = np.where(pattern_indices == ipattern)
+
+        tri_nodes = np.einsum(
+                "ij,dej->dei", resampling_mat, grp.nodes[:, el_nrs])
+        if tri_nodes.shape[0] < 3:
+            tri_nodes = np.vstack([
+                tri_nodes,
+                np.zeros((3 - tri_nodes.shape[0],) + tri_nodes.shape[1:])])
+
+        directions = np.einsum(
+                "ki,dek->dei",
+                tri_bary, vertex_directions[:, grp.vertex_indices[el_nrs]])
+
+        heights = (
+                layer_heights[layer_nrs][:, np.newaxis]
+                + (layer_heights[layer_nrs+1]
+                    - layer_heights[layer_nrs])[:, np.newaxis]
+                * rel_heights)
+
+        nodes[:, layer_nrs, el_nrs, itets] = tri_nodes + heights*directions
+
+    # }}}
+
+    element_tags = grp.element_tags
+    if element_tags is not None:
+        # tets are numbered by layer, then triangle, then tet in the prism
+        element_tags = np.tile(np.repeat(element_tags, 3), nlayers)
+
+    from meshmode.mesh import SimplexElementGroup
+    return SimplexElementGroup(
+            grp.order,
+            vertex_indices.reshape(-1, 4).astype(grp.vertex_indices.dtype),
+            nodes.reshape(3, -1, tet_unit_nodes.shape[-1]),
+            unit_nodes=tet_unit_nodes,
+            element_tags=element_tags)
+
+
+def extrude_mesh(mesh, layer_heights, vertex_directions=None,
+        skip_tests=False):
+    """Extrude a two-dimensional simplicial mesh into layers of
+    tetrahedra. Each triangle becomes a prism in each layer, which is
+    split into three tetrahedra so that neighboring prisms match
+    on their shared faces. All tetrahedra are positively oriented.
+
+    :arg layer_heights: a sorted array of the offsets of the layer
+        interfaces, e.g. ``np.linspace(0, h, nlayers+1)``.
+    :arg vertex_directions: an array of shape *(3, nvertices)* giving
+        the direction of extrusion at each vertex of *mesh*, such as a
+        normal field on a surface mesh. Within each element, the direction
+        is interpolated linearly between the vertices. If *None*, the
+        mesh is extruded along the *z* axis, which requires *mesh* to have
+        an ambient dimension of 2 or 3.
+    :returns: a :class:`meshmode.mesh.Mesh` of ambient dimension 3, in
+        which vertex *i* of *mesh* at layer interface *l* has number
+        ``l*nvertices + i``. Each tetrahedron carries the element tag of
+        the triangle it was extruded from. Face tags are not carried over.
+    """
+
+    if mesh.dim != 2:
+        raise ValueError("only two-dimensional meshes can be extruded")
+
+    from meshmode.mesh import Mesh, SimplexElementGroup
+
+    layer_heights = np.asarray(layer_heights, dtype=np.float64)
+    nvertices = mesh.vertices.shape[-1]
+
+    vertices = mesh.vertices
+    if vertices.shape[0] < 3:
+        vertices = np.vstack([
+            vertices,
+            np.zeros((3 - vertices.shape[0], nvertices), vertices.dtype)])
+
+    if vertex_directions is None:
+        vertex_directions = np.zeros((3, nvertices))
+        vertex_directions[2] = 1
+
+    # (3, nlayers+1, nvertices)
+    vertices_3d = (
+            vertices[:, np.newaxis, :]
+            + layer_heights[np.newaxis, :, np.newaxis]
+            * vertex_directions[:, np.newaxis, :]).reshape(3, -1)
+
+    new_groups = []
+    for grp in mesh.groups:
+        if not isinstance(grp, SimplexElementGroup):
+            raise NotImplementedError("extrusion of '%s'"
+                    % type(grp).__name__)
+
+        new_groups.append(_extrude_simplex_group(
+            grp, layer_heights, vertex_directions, nvertices, vertices_3d))
+
+    return Mesh(vertices_3d, new_groups, skip_tests=skip_tests,
+            vertex_id_dtype=mesh.vertex_id_dtype,
+            element_id_dtype=mesh.element_id_dtype,
+            element_connectivity=None,
+            tag_names=mesh.tag_names)
 
 # }}}
 
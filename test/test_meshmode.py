@@ -88,6 +88,1322 @@ def test_boundary_interpolation(ctx_getter):
     assert eoc_rec.order_estimate() >= order-0.5
 
 
+@pytest.mark.parametrize("use_memmap", [False, True])
+def test_read_gmsh_chunked(tmpdir, use_memmap):
+    from meshpy.gmsh import GmshRunner
+    from meshmode.mesh.io import read_gmsh, read_gmsh_chunked, FileSource
+
+    memmap_dir = str(tmpdir) if use_memmap else None
+
+    with GmshRunner(FileSource("blob-2d.step"), 2, order=3,
+            other_options=[
+                "-string", "Mesh.CharacteristicLengthMax = 0.05;"]) as runner:
+        mesh = read_gmsh(runner.output_file.name, force_ambient_dim=2)
+        chunked_mesh = read_gmsh_chunked(runner.output_file.name,
+                force_ambient_dim=2, chunk_size=100, memmap_dir=memmap_dir)
+
+    assert np.array_equal(mesh.vertices, chunked_mesh.vertices)
+    for grp, chunked_grp in zip(mesh.groups, chunked_mesh.groups):
+        assert np.array_equal(grp.vertex_indices, chunked_grp.vertex_indices)
+        assert np.array_equal(grp.nodes, chunked_grp.nodes)
+
+
+def test_read_gmsh_binary():
+    from meshmode.mesh.io import generate_gmsh, FileSource
+
+    meshes = [
+            generate_gmsh(
+                FileSource("blob-2d.step"), 2, order=3,
+                force_ambient_dim=2,
+                other_options=[
+                    "-string", "Mesh.CharacteristicLengthMax = 0.05;"]
+                + extra_options)
+            for extra_options in [[], ["-bin"]]]
+
+    ascii_mesh, binary_mesh = meshes
+
+    assert np.array_equal(ascii_mesh.vertices, binary_mesh.vertices)
+    for grp, binary_grp in zip(ascii_mesh.groups, binary_mesh.groups):
+        assert np.array_equal(grp.vertex_indices, binary_grp.vertex_indices)
+        assert np.array_equal(grp.nodes, binary_grp.nodes)
+
+
+def test_generate_gmsh_cache(tmpdir):
+    from meshmode.mesh.io import generate_gmsh, FileSource, GmshMeshCache
+
+    cache = GmshMeshCache(str(tmpdir))
+
+    meshes = [
+            generate_gmsh(
+                FileSource("blob-2d.step"), 2, order=3,
+                force_ambient_dim=2,
+                other_options=[
+                    "-string", "Mesh.CharacteristicLengthMax = 0.05;"],
+                cache=cache)
+            for i in range(2)]
+
+    assert len(tmpdir.listdir()) == 1
+
+    mesh, cached_mesh = meshes
+    assert np.array_equal(mesh.vertices, cached_mesh.vertices)
+    for grp, cached_grp in zip(mesh.groups, cached_mesh.groups):
+        assert grp.order == cached_grp.order
+        assert np.array_equal(grp.vertex_indices, cached_grp.vertex_indices)
+        assert np.array_equal(grp.nodes, cached_grp.nodes)
+        assert np.array_equal(grp.unit_nodes, cached_grp.unit_nodes)
+
+    cache.clear()
+    assert not tmpdir.listdir()
+
+
+# Stands in for gmsh: writes a two-triangle mesh of [0,scale]x[0,1], where
+# scale is read from the source file, and logs its invocations.
+STAND_IN_GMSH = """#!%(python)s
+import sys
+args = sys.argv[1:]
+
+with open(%(log_file_name)r, "a") as logf:
+    logf.write(" ".join(args) + "\\n")
+
+if args == ["--version"]:
+    sys.stderr.write("%(version)s\\n")
+    sys.exit()
+
+output_file_name = args[args.index("-o") + 1]
+scale = float(open(args[-1]).read())
+
+with open(output_file_name, "w") as outf:
+    outf.write("$MeshFormat\\n2.2 0 8\\n$EndMeshFormat\\n")
+    outf.write("$Nodes\\n4\\n")
+    for i, (x, y) in enumerate([(0, 0), (1, 0), (0, 1), (1, 1)]):
+        outf.write("%%d %%r %%r 0\\n" %% (i+1, scale*x, y))
+    outf.write("$EndNodes\\n")
+    outf.write("$Elements\\n2\\n1 2 2 1 1 1 3 2\\n2 2 2 1 1 2 3 4\\n")
+    outf.write("$EndElements\\n")
+"""
+
+
+def _write_stand_in_gmsh(tmpdir, version="1.0"):
+    """Return the file names of the stand-in gmsh executable and its log."""
+    import sys
+    import os
+
+    gmsh_executable = str(tmpdir.join("stand-in-gmsh"))
+    log_file_name = str(tmpdir.join("stand-in-gmsh.log"))
+    with open(gmsh_executable, "w") as outf:
+        outf.write(STAND_IN_GMSH % {
+            "python": sys.executable,
+            "log_file_name": log_file_name,
+            "version": version})
+    os.chmod(gmsh_executable, 0o755)
+
+    return gmsh_executable, log_file_name
+
+
+def _read_log(log_file_name):
+    import os
+    if not os.path.exists(log_file_name):
+        return []
+    with open(log_file_name) as logf:
+        return logf.read().splitlines()
+
+
+def test_generate_gmsh_cache_gmsh_version(tmpdir):
+    from meshmode.mesh.io import generate_gmsh, LiteralSource, GmshMeshCache
+
+    gmsh_executable, log_file_name = _write_stand_in_gmsh(tmpdir)
+    cache = GmshMeshCache(str(tmpdir.join("cache")))
+
+    def generate():
+        return generate_gmsh(LiteralSource("2.0", "geo"), 2,
+                force_ambient_dim=2, gmsh_executable=gmsh_executable,
+                cache=cache)
+
+    mesh = generate()
+    nruns = len(_read_log(log_file_name))
+    assert nruns >= 1
+
+    # a cache hit does not start gmsh, even in a fresh process
+    import meshmode.mesh.io as mio
+    getattr(mio._get_gmsh_version.__wrapped__, "_memoize_dic", {}).clear()
+    cached_mesh = generate()
+    assert len(_read_log(log_file_name)) == nruns
+    assert np.array_equal(mesh.vertices, cached_mesh.vertices)
+
+    # another version of gmsh does not use the entry
+    _write_stand_in_gmsh(tmpdir, version="1.1")
+    generate()
+    log = _read_log(log_file_name)[nruns:]
+    assert "--version" in log
+    assert any("-o" in line.split() for line in log)
+
+    # a gmsh that cannot be found is a miss, not an error
+    import os
+    key = cache._get_key(LiteralSource("2.0", "geo"), 2, None, [], "geo",
+            gmsh_executable, 2)
+    cache._get_mesh(key, gmsh_executable)
+    os.remove(gmsh_executable)
+    for missing_executable in [gmsh_executable, "no-such-gmsh-executable"]:
+        with pytest.raises(KeyError):
+            cache._get_mesh(key, missing_executable)
+
+
+def test_generate_gmsh_many(tmpdir):
+    from meshmode.mesh.io import generate_gmsh_many, LiteralSource
+
+    gmsh_executable, _ = _write_stand_in_gmsh(tmpdir)
+
+    scales = [1, 2, 3, 4, 5]
+    meshes = generate_gmsh_many([
+        dict(source=LiteralSource(repr(float(scale)), "geo"), dimensions=2,
+            force_ambient_dim=2, gmsh_executable=gmsh_executable)
+        for scale in scales],
+        nprocesses=3)
+
+    assert len(meshes) == len(scales)
+    for scale, mesh in zip(scales, meshes):
+        assert mesh.nelements == 2
+        assert np.max(mesh.vertices[0]) == scale
+
+
+def test_boundary_tags(ctx_getter):
+    cl_ctx = ctx_getter()
+    queue = cl.CommandQueue(cl_ctx)
+
+    from meshmode.mesh.io import generate_gmsh, LiteralSource
+    from meshmode.discretization import Discretization
+    from meshmode.discretization.poly_element import \
+            InterpolatoryQuadratureSimplexGroupFactory
+    from meshmode.discretization.connection import make_boundary_restriction
+
+    order = 3
+
+    mesh = generate_gmsh(
+            LiteralSource("""
+                Point(1) = {0, 0, 0, 0.1};
+                Point(2) = {1, 0, 0, 0.1};
+                Point(3) = {1, 1, 0, 0.1};
+                Point(4) = {0, 1, 0, 0.1};
+                Line(1) = {1, 2};
+                Line(2) = {2, 3};
+                Line(3) = {3, 4};
+                Line(4) = {4, 1};
+                Line Loop(5) = {1, 2, 3, 4};
+                Plane Surface(6) = {5};
+                Physical Line("inlet") = {4};
+                Physical Line("wall") = {1, 2, 3};
+                Physical Surface("domain") = {6};
+                """, "geo"),
+            2, order=order, force_ambient_dim=2)
+
+    assert set(mesh.tag_names) == set(["inlet", "wall", "domain"])
+
+    grp, = mesh.groups
+    assert (grp.element_tags == mesh.tag_names["domain"]).all()
+
+    vol_discr = Discretization(cl_ctx, mesh,
+            InterpolatoryQuadratureSimplexGroupFactory(order))
+
+    bdry_mesh, bdry_discr, bdry_connection = make_boundary_restriction(
+            queue, vol_discr, InterpolatoryQuadratureSimplexGroupFactory(order),
+            boundary_tag="inlet")
+
+    assert bdry_mesh.nelements == 10
+    bdry_x = bdry_discr.nodes()[0].get(queue=queue)
+    assert la.norm(bdry_x, np.inf) < 1e-13
+
+
+@pytest.mark.parametrize("dim", [2, 3])
+@pytest.mark.parametrize("order", [1, 3])
+@pytest.mark.parametrize("block_entries", [None, 100])
+def test_box_mesh(dim, order, block_entries, monkeypatch):
+    import meshmode.mesh.generation as generation
+    from meshmode.mesh.generation import generate_box_mesh
+    from meshmode.mesh import _compute_connectivity_from_vertices
+    from meshmode.mesh.processing import find_volume_mesh_element_orientations
+
+    if block_entries is not None:
+        # build the connectivity for a few cells at a time
+        monkeypatch.setattr(generation, "_BOX_CONNECTIVITY_BLOCK_ENTRIES",
+                block_entries)
+
+    mesh = generate_box_mesh(
+            [np.linspace(-1, 1, n) for n in [5, 4, 3][:dim]],
+            order=order)
+
+    ncells = np.prod([4, 3, 2][:dim])
+    assert mesh.nelements == {2: 2, 3: 6}[dim] * ncells
+    assert (find_volume_mesh_element_orientations(mesh) > 0).all()
+
+    cnx = mesh.element_connectivity
+    ref_cnx = _compute_connectivity_from_vertices(mesh)
+
+    assert (cnx.neighbors_starts == ref_cnx.neighbors_starts).all()
+    for iel in range(mesh.nelements):
+        start, stop = cnx.neighbors_starts[iel:iel+2]
+        assert (sorted(cnx.neighbors[start:stop])
+                == sorted(ref_cnx.neighbors[start:stop]))
+
+
+def test_refined_icosphere():
+    from meshmode.mesh.generation import generate_icosphere
+
+    r = 2
+    nrefinements = 3
+    mesh = generate_icosphere(r, order=3, nrefinements=nrefinements)
+
+    assert mesh.nelements == 20 * 4**nrefinements
+    assert mesh.vertices.shape[1] == 10 * 4**nrefinements + 2
+
+    assert np.allclose(np.sqrt(np.sum(mesh.vertices**2, axis=0)), r)
+    assert np.allclose(np.sqrt(np.sum(mesh.groups[0].nodes**2, axis=0)), r)
+
+    # each edge is shared by exactly two triangles, consistently oriented
+    vertex_indices = mesh.groups[0].vertex_indices
+    edges = vertex_indices[:, [[0, 1], [1, 2], [2, 0]]].reshape(-1, 2)
+    assert len(set(map(tuple, edges))) == len(edges)
+    assert set(map(tuple, edges)) == set(map(tuple, edges[:, ::-1]))
+
+
+@pytest.mark.parametrize("periodic", [(True, True), (True, False)])
+def test_surface_mesh(periodic):
+    from meshmode.mesh.generation import generate_surface_mesh
+
+    r_outer, r_inner = 2, 0.5
+
+    def torus(u, v):
+        u = 2*np.pi*u
+        v = 2*np.pi*v if periodic[1] else np.pi*v
+        return np.array([
+            np.cos(u)*(r_outer + r_inner*np.cos(v)),
+            np.sin(u)*(r_outer + r_inner*np.cos(v)),
+            r_inner*np.sin(v),
+            ])
+
+    n_u, n_v = 12, 6
+    mesh = generate_surface_mesh(torus, n_u, n_v, order=4, periodic=periodic)
+
+    assert mesh.nelements == 2*n_u*n_v
+    assert mesh.vertices.shape[1] == n_u * (n_v if periodic[1] else n_v+1)
+
+    # high-order nodes lie on the surface
+    nodes = mesh.groups[0].nodes
+    rho = np.sqrt(nodes[0]**2 + nodes[1]**2)
+    assert np.allclose((rho - r_outer)**2 + nodes[2]**2, r_inner**2)
+
+
+def test_adaptive_curve_mesh():
+    import modepy as mp
+    from meshmode.mesh.generation import make_curve_mesh, starfish
+
+    order = 4
+
+    prev_nelements = 0
+    for tol in [1e-3, 1e-5]:
+        mesh = make_curve_mesh(starfish, np.linspace(0, 1, 5), order,
+                adaptive_tol=tol)
+        grp, = mesh.groups
+
+        assert mesh.nelements > prev_nelements
+        prev_nelements = mesh.nelements
+
+        # recover the element boundaries from the polar angle of the vertices
+        vertex_t = np.arctan2(mesh.vertices[1], mesh.vertices[0])/(2*np.pi) % 1
+        el_starts = vertex_t[:-1]
+        el_ends = np.append(vertex_t[1:-1], 1)
+
+        fine_nodes = np.linspace(-1, 1, 17)[np.newaxis, :]
+        resampling_mat = mp.resampling_matrix(
+                mp.simplex_onb(1, order), fine_nodes, grp.unit_nodes)
+        interp = np.einsum("ij,dej->dei", resampling_mat, grp.nodes)
+
+        t = el_starts[:, np.newaxis] + (
+                (el_ends - el_starts)[:, np.newaxis] * 0.5*(fine_nodes+1))
+        exact = starfish(t.ravel()).reshape(interp.shape)
+
+        assert np.max(np.abs(interp - exact)) < tol
+
+
+def test_curve_turning_angles():
+    import modepy as mp
+    from meshmode.mesh.generation import _estimate_curve_element_errors
+
+    order = 4
+    unodes = mp.warp_and_blend_nodes(1, order)
+
+    # arcs of the unit circle
+    arc_angles = np.array([0.1, 0.5, 1])
+    phi = arc_angles[:, np.newaxis] * 0.5*(unodes[0]+1)
+    nodes_2d = np.array([np.cos(phi), np.sin(phi)])
+
+    _, angles_2d = _estimate_curve_element_errors(nodes_2d, unodes, order)
+    assert la.norm(angles_2d - arc_angles, np.inf) < 1e-2
+
+    # the same arcs in a plane tilted out of the xy plane
+    rotation = np.array([
+        [1, 0, 0],
+        [0, np.cos(1), -np.sin(1)],
+        [0, np.sin(1), np.cos(1)]])
+    nodes_3d = np.einsum("ij,jek->iek", rotation[:, :2], nodes_2d)
+
+    _, angles_3d = _estimate_curve_element_errors(nodes_3d, unodes, order)
+    assert la.norm(angles_3d - angles_2d, np.inf) < 1e-12
+
+    with pytest.raises(ValueError):
+        _estimate_curve_element_errors(
+                np.zeros((4,) + nodes_2d.shape[1:]), unodes, order)
+
+
+def test_multi_curve_mesh():
+    from functools import partial
+    from meshmode.mesh.generation import (
+            make_curve_mesh, make_multi_curve_mesh, starfish, ellipse)
+    from meshmode.mesh.processing import affine_map
+    from meshmode.mesh import _compute_connectivity_from_vertices
+
+    order = 3
+    curves = [
+            (starfish, np.linspace(0, 1, 11)),
+            (partial(ellipse, 2), np.linspace(0, 1, 3),
+                (np.array([[2., 0], [0, 1]]), np.array([5., 0]))),
+            (starfish, np.linspace(0, 1, 7)**2,
+                (np.eye(2), np.array([0., 5.]))),
+            ]
+
+    mesh = make_multi_curve_mesh(curves, order)
+
+    ref_nodes = []
+    for curve in curves:
+        ref_mesh = make_curve_mesh(curve[0], curve[1], order)
+        if len(curve) > 2:
+            ref_mesh = affine_map(ref_mesh, *curve[2])
+        ref_nodes.append(ref_mesh.groups[0].nodes)
+
+    assert np.allclose(np.concatenate(ref_nodes, axis=1), mesh.groups[0].nodes)
+
+    cnx = mesh.element_connectivity
+    ref_cnx = _compute_connectivity_from_vertices(mesh)
+
+    assert (cnx.neighbors_starts == ref_cnx.neighbors_starts).all()
+    for iel in range(mesh.nelements):
+        start, stop = cnx.neighbors_starts[iel:iel+2]
+        assert (sorted(cnx.neighbors[start:stop])
+                == sorted(ref_cnx.neighbors[start:stop]))
+
+
+@pytest.mark.parametrize("order", [1, 3])
+def test_extrude_mesh(order):
+    from meshmode.mesh import Mesh
+    from meshmode.mesh.generation import generate_box_mesh
+    from meshmode.mesh.processing import (
+            extrude_mesh, find_volume_mesh_element_orientations)
+
+    mesh_2d = generate_box_mesh(
+            [np.linspace(0, 1, 4), np.linspace(0, 2, 3)], order=order)
+
+    # renumber vertices randomly to exercise all prism splittings
+    grp, = mesh_2d.groups
+    perm = np.random.RandomState(17).permutation(mesh_2d.vertices.shape[1])
+    element_tags = 1 + np.arange(grp.nelements) % 2
+    mesh_2d = Mesh(mesh_2d.vertices[:, perm], [
+        grp.copy(vertex_indices=np.argsort(perm)[grp.vertex_indices]
+            .astype(np.int32), element_tags=element_tags)],
+        tag_names={"odd": 1, "even": 2})
+
+    nlayers = 3
+    mesh = extrude_mesh(mesh_2d, np.linspace(0, 0.5, nlayers+1))
+
+    assert mesh.nelements == 3 * nlayers * mesh_2d.nelements
+
+    # each tet keeps the tag of its triangle
+    assert mesh.tag_names == mesh_2d.tag_names
+    assert np.array_equal(mesh.groups[0].element_tags,
+            np.tile(np.repeat(element_tags, 3), nlayers))
+
+    orientations = find_volume_mesh_element_orientations(mesh)
+    assert (orientations > 0).all()
+    # orientations are six times the element volumes
+    assert abs(np.sum(orientations)/6 - 1) < 1e-13
+
+    # faces are conforming: each one is shared by at most two elements
+    grp, = mesh.groups
+    face_vertices = np.vstack([
+        np.sort(grp.vertex_indices[:, list(fvi)], axis=1)
+        for fvi in grp.face_vertex_indices()])
+    _, face_counts = np.unique(
+            face_vertices[:, 0] * mesh.vertices.shape[1]**2
+            + face_vertices[:, 1] * mesh.vertices.shape[1]
+            + face_vertices[:, 2],
+            return_counts=True)
+
+    nboundary_faces = 2*mesh_2d.nelements + 2*nlayers*2*(3+2)
+    assert np.sum(face_counts == 1) == nboundary_faces
+    assert set(face_counts) == set([1, 2])
+
+
+def test_numpy_array_context():
+    from meshmode.array_context import NumpyArrayContext
+    from meshmode.mesh.generation import generate_box_mesh
+    from meshmode.discretization import Discretization
+    from meshmode.discretization.poly_element import (
+            InterpolatoryQuadratureSimplexGroupFactory,
+            PolynomialWarpAndBlendGroupFactory)
+    from meshmode.discretization.connection import (
+            make_boundary_restriction, make_same_mesh_connection)
+
+    order = 3
+
+    actx = NumpyArrayContext()
+    mesh = generate_box_mesh([np.linspace(-1, 1, 5)]*2, order=order)
+
+    discr = Discretization(actx, mesh,
+            InterpolatoryQuadratureSimplexGroupFactory(order))
+    assert discr.cl_context is None
+
+    def f(x):
+        return x[0]**2 + 3*x[1]
+
+    nodes = discr.nodes()
+    assert isinstance(nodes, np.ndarray)
+    f_vol = f(nodes)
+
+    # quadrature weights are those of the reference element
+    assert abs(np.sum(discr.quad_weights(None)) - 2*mesh.nelements) < 1e-12
+
+    bdry_mesh, bdry_discr, bdry_connection = make_boundary_restriction(
+            None, discr, InterpolatoryQuadratureSimplexGroupFactory(order))
+    assert la.norm(bdry_connection(None, f_vol) - f(bdry_discr.nodes()),
+            np.inf) < 1e-13
+
+    vis_discr = Discretization(actx, mesh,
+            PolynomialWarpAndBlendGroupFactory(order+1))
+    vis_connection = make_same_mesh_connection(None, vis_discr, discr)
+    assert la.norm(vis_connection(None, f_vol) - f(vis_discr.nodes()),
+            np.inf) < 1e-13
+
+
+def test_persistent_kernel_cache(ctx_getter, tmpdir, monkeypatch):
+    cl_ctx = ctx_getter()
+    queue = cl.CommandQueue(cl_ctx)
+
+    import meshmode.array_context as array_context
+    from meshmode.array_context import PyOpenCLArrayContext
+    from meshmode.mesh.generation import generate_box_mesh
+    from meshmode.discretization import Discretization
+    from meshmode.discretization.poly_element import \
+            InterpolatoryQuadratureSimplexGroupFactory
+
+    mesh = generate_box_mesh([np.linspace(0, 1, 4)]*2, order=2)
+
+    def run():
+        # a fresh array context has an empty in-memory cache
+        actx = PyOpenCLArrayContext(cl_ctx, cache_dir=str(tmpdir))
+
+        stored = []
+        store_persistent = actx._store_persistent
+
+        def record_store(cache, key, value, what):
+            stored.append(what)
+            store_persistent(cache, key, value, what)
+
+        actx._store_persistent = record_store
+
+        discr = Discretization(actx, mesh,
+                InterpolatoryQuadratureSimplexGroupFactory(2))
+
+        x = discr.nodes()[0].with_queue(queue)
+        result = discr.num_reference_derivative(queue, (0,), x).get()
+
+        assert len(actx._kernel_cache) == 2
+        return result, len(stored)
+
+    cold_result, cold_nstored = run()
+    warm_result, warm_nstored = run()
+
+    assert tmpdir.listdir()
+    assert cold_nstored == 2
+    assert warm_nstored == 0
+    assert la.norm(cold_result - warm_result) == 0
+
+    # kernels stored by another version of loopy or meshmode are not reused
+    monkeypatch.setattr(array_context, "_version_key", lambda: "other")
+    _, other_version_nstored = run()
+    assert other_version_nstored == 2
+
+
+def test_multi_vector_operations():
+    from meshmode.array_context import NumpyArrayContext
+    from meshmode.mesh.generation import generate_box_mesh
+    from meshmode.discretization import Discretization
+    from meshmode.discretization.poly_element import (
+            InterpolatoryQuadratureSimplexGroupFactory,
+            PolynomialWarpAndBlendGroupFactory)
+    from meshmode.discretization.connection import make_same_mesh_connection
+    from pytools.obj_array import make_obj_array
+
+    order = 3
+
+    actx = NumpyArrayContext()
+    mesh = generate_box_mesh([np.linspace(-1, 1, 4)]*2, order=order)
+    discr = Discretization(actx, mesh,
+            InterpolatoryQuadratureSimplexGroupFactory(order))
+    vis_discr = Discretization(actx, mesh,
+            PolynomialWarpAndBlendGroupFactory(order+1))
+    connection = make_same_mesh_connection(None, vis_discr, discr)
+
+    x = discr.nodes()
+    fields = [x[0]**2, x[0]*x[1], np.sin(x[1])]
+    stacked = np.array(fields)
+    obj_fields = make_obj_array(fields)
+
+    for ref_axes in [(0,), (1,), (0, 1)]:
+        single = np.array([
+            discr.num_reference_derivative(None, ref_axes, fld)
+            for fld in fields])
+
+        result = discr.num_reference_derivative(None, ref_axes, stacked)
+        assert result.shape == stacked.shape
+        assert la.norm((result - single).ravel(), np.inf) < 1e-12
+
+        obj_result = discr.num_reference_derivative(None, ref_axes, obj_fields)
+        assert obj_result.dtype.char == "O"
+        assert la.norm((np.array(list(obj_result)) - single).ravel(),
+                np.inf) < 1e-12
+
+    single = np.array([connection(None, fld) for fld in fields])
+
+    result = connection(None, stacked)
+    assert result.shape == (len(fields), vis_discr.nnodes)
+    assert la.norm((result - single).ravel(), np.inf) < 1e-12
+
+    obj_result = connection(None, obj_fields)
+    assert la.norm((np.array(list(obj_result)) - single).ravel(),
+            np.inf) < 1e-12
+
+    # mixed dtypes are promoted, scalars pass through
+    mixed = connection(None, make_obj_array([fields[0], 1j*fields[1]]))
+    assert mixed[0].dtype == np.complex128
+    assert la.norm(mixed[1] - 1j*single[1], np.inf) < 1e-12
+    assert connection(None, make_obj_array([fields[0], 0]))[1] == 0
+
+
+def test_multi_vector_operations_cl(ctx_getter):
+    cl_ctx = ctx_getter()
+    queue = cl.CommandQueue(cl_ctx)
+
+    from meshmode.array_context import NumpyArrayContext, PyOpenCLArrayContext
+    from meshmode.mesh.generation import generate_box_mesh
+    from meshmode.discretization import Discretization
+    from meshmode.discretization.poly_element import (
+            InterpolatoryQuadratureSimplexGroupFactory,
+            PolynomialWarpAndBlendGroupFactory)
+    from meshmode.discretization.connection import make_same_mesh_connection
+
+    mesh = generate_box_mesh([np.linspace(-1, 1, 4)]*2, order=2)
+
+    def compute(actx, queue):
+        discr = Discretization(actx, mesh,
+                InterpolatoryQuadratureSimplexGroupFactory(3))
+        vis_discr = Discretization(actx, mesh,
+                PolynomialWarpAndBlendGroupFactory(4))
+        connection = make_same_mesh_connection(queue, vis_discr, discr)
+
+        nodes = discr.nodes()
+        return [actx.to_numpy(queue, ary) for ary in [
+            nodes,
+            discr.num_reference_derivative(queue, (0,), nodes),
+            connection(queue, nodes),
+            ]]
+
+    for autotune in [False, True]:
+        results = compute(
+                PyOpenCLArrayContext(cl_ctx, persistent_cache=False,
+                    autotune=autotune),
+                queue)
+        for ref_result, result in zip(
+                compute(NumpyArrayContext(), None), results):
+            assert la.norm((ref_result - result).ravel(), np.inf) < 1e-12
+
+
+def test_fused_groups():
+    from meshmode.array_context import NumpyArrayContext
+    from meshmode.mesh.generation import generate_box_mesh
+    from meshmode.mesh.processing import affine_map, merge_dijsoint_meshes
+    from meshmode.discretization import Discretization
+    from meshmode.discretization.poly_element import (
+            InterpolatoryQuadratureSimplexGroupFactory,
+            PolynomialWarpAndBlendGroupFactory)
+    from meshmode.discretization.connection import (
+            make_boundary_restriction, make_same_mesh_connection)
+
+    order = 3
+    actx = NumpyArrayContext()
+
+    # many groups of differing mesh orders
+    mesh = merge_dijsoint_meshes([
+        affine_map(
+            generate_box_mesh([np.linspace(0, 1, 3)]*2, order=1 + i % 3),
+            A=np.eye(2), b=np.array([2.0*i, 0]))
+        for i in range(7)])
+    assert len(mesh.groups) == 7
+
+    group_factory = InterpolatoryQuadratureSimplexGroupFactory(order)
+
+    def make_discrs(fuse_groups):
+        discr = Discretization(actx, mesh, group_factory,
+                fuse_groups=fuse_groups)
+        vis_discr = Discretization(actx, mesh,
+                PolynomialWarpAndBlendGroupFactory(order+1),
+                fuse_groups=fuse_groups)
+        return discr, vis_discr
+
+    discr, vis_discr = make_discrs(fuse_groups=False)
+    fused_discr, fused_vis_discr = make_discrs(fuse_groups=True)
+
+    def check_close(a, b):
+        assert la.norm((a - b).ravel(), np.inf) < 1e-12
+
+    check_close(discr.nodes(), fused_discr.nodes())
+    check_close(discr.quad_weights(None), fused_discr.quad_weights(None))
+
+    x = discr.nodes()
+    f = np.array([np.sin(x[0]) * x[1], x[0] + x[1]**2])
+    for ref_axes in [(0,), (1,), (0, 1)]:
+        check_close(
+                discr.num_reference_derivative(None, ref_axes, f),
+                fused_discr.num_reference_derivative(None, ref_axes, f))
+        check_close(
+                discr.num_reference_derivative(None, ref_axes, f[0]),
+                fused_discr.num_reference_derivative(None, ref_axes, f[0]))
+
+    check_close(
+            make_same_mesh_connection(None, vis_discr, discr)(None, f),
+            make_same_mesh_connection(
+                None, fused_vis_discr, fused_discr)(None, f))
+
+    _, bdry_discr, bdry_connection = make_boundary_restriction(
+            None, discr, group_factory)
+    _, _, fused_bdry_connection = make_boundary_restriction(
+            None, fused_discr, group_factory)
+    assert not bdry_discr.fuse_groups
+    check_close(bdry_connection(None, f[0]), fused_bdry_connection(None, f[0]))
+
+
+def test_boundary_restriction_multi_group():
+    from meshmode.array_context import NumpyArrayContext
+    from meshmode.mesh import Mesh
+    from meshmode.mesh.generation import generate_box_mesh
+    from meshmode.mesh.processing import affine_map, merge_dijsoint_meshes
+    from meshmode.discretization import Discretization
+    from meshmode.discretization.poly_element import (
+            InterpolatoryQuadratureSimplexGroupFactory)
+    from meshmode.discretization.connection import make_boundary_restriction
+
+    order = 3
+    actx = NumpyArrayContext()
+
+    def make_box(x0):
+        box = affine_map(
+                generate_box_mesh([np.linspace(0, 1, 3)]*2, order=1),
+                A=np.eye(2), b=np.array([x0, 0]))
+
+        # tag the faces on the left side of the box
+        grp, = box.groups
+        face_tags = np.zeros(
+                (grp.nelements, len(grp.face_vertex_indices())), np.int32)
+        for fid, fvi in enumerate(grp.face_vertex_indices()):
+            face_x = box.vertices[0, grp.vertex_indices[:, list(fvi)]]
+            face_tags[(abs(face_x - x0) < 1e-13).all(axis=1), fid] = 1
+
+        return Mesh(box.vertices, [grp.copy(face_tags=face_tags)],
+                tag_names={"left": 1})
+
+    mesh = merge_dijsoint_meshes([make_box(0), make_box(2)])
+    assert len(mesh.groups) == 2
+
+    group_factory = InterpolatoryQuadratureSimplexGroupFactory(order)
+    discr = Discretization(actx, mesh, group_factory)
+
+    bdry_mesh, bdry_discr, bdry_connection = make_boundary_restriction(
+            None, discr, group_factory, boundary_tag="left")
+    assert bdry_mesh.nelements == 4
+    assert len(bdry_discr.groups) == 2
+
+    # batches hold element numbers within their groups
+    for cgrp, vol_grp, bdry_grp in zip(
+            bdry_connection.groups, discr.groups, bdry_discr.groups):
+        for batch in cgrp.batches:
+            assert (batch.source_element_indices < vol_grp.nelements).all()
+            assert (batch.target_element_indices < bdry_grp.nelements).all()
+
+    bdry_nodes = bdry_discr.nodes()
+    for igrp, bdry_grp in enumerate(bdry_discr.groups):
+        assert la.norm(bdry_grp.view(bdry_nodes[0]) - 2*igrp, np.inf) < 1e-13
+
+    x = discr.nodes()
+    for iaxis in range(2):
+        assert la.norm(
+                bdry_connection(None, x[iaxis]) - bdry_nodes[iaxis],
+                np.inf) < 1e-12
+
+
+def test_geometric_factors():
+    from meshmode.array_context import NumpyArrayContext
+    from meshmode.mesh.generation import (
+            generate_box_mesh, generate_icosphere, make_curve_mesh, ellipse)
+    from meshmode.mesh.processing import affine_map
+    from meshmode.discretization import Discretization
+    from meshmode.discretization.poly_element import \
+            InterpolatoryQuadratureSimplexGroupFactory
+
+    order = 4
+    actx = NumpyArrayContext()
+
+    def make_discr(mesh):
+        return Discretization(actx, mesh,
+                InterpolatoryQuadratureSimplexGroupFactory(order))
+
+    def integral(discr, f):
+        return np.sum(discr.quad_weights(None) * discr.area_element() * f)
+
+    # {{{ volume
+
+    A = np.array([[2, 0.5, 0], [0, 1, 0.25], [0.1, 0, 3]])
+    for dim in [2, 3]:
+        mesh = affine_map(
+                generate_box_mesh([np.linspace(0, 1, 3)]*dim, order=order),
+                A=A[:dim, :dim], b=np.zeros(dim))
+        discr = make_discr(mesh)
+
+        jac = discr.jacobian()
+        inv_jac = discr.inverse_jacobian()
+        assert jac.shape == (dim, dim, discr.nnodes)
+        assert np.allclose(np.einsum("rax,asx->rsx", inv_jac, jac),
+                np.eye(dim)[:, :, np.newaxis])
+        assert np.allclose(discr.area_element(),
+                np.abs(discr.jacobian_determinant()))
+
+        assert abs(integral(discr, 1) - la.det(A[:dim, :dim])) < 1e-12
+
+        with pytest.raises(ValueError):
+            discr.normals()
+
+    # }}}
+
+    # {{{ curve
+
+    from functools import partial
+    mesh = make_curve_mesh(partial(ellipse, 1), np.linspace(0, 1, 21), order)
+    discr = make_discr(mesh)
+
+    x = discr.nodes()
+    assert la.norm((discr.normals() - x/la.norm(x, axis=0)).ravel(),
+            np.inf) < 1e-6
+    assert abs(integral(discr, 1) - 2*np.pi) < 1e-6
+    assert np.allclose(
+            np.einsum("rax,arx->x", discr.inverse_jacobian(), discr.jacobian()),
+            1)
+
+    # }}}
+
+    # {{{ surface
+
+    mesh = generate_icosphere(1, order, nrefinements=1)
+    discr = make_discr(mesh)
+
+    x = discr.nodes()
+    assert la.norm((discr.normals() - x/la.norm(x, axis=0)).ravel(),
+            np.inf) < 1e-3
+    assert abs(integral(discr, 1) - 4*np.pi) < 1e-3
+
+    # }}}
+
+    # memoized
+    assert discr.normals() is discr.normals()
+
+
+def test_grad_div():
+    from meshmode.array_context import NumpyArrayContext
+    from meshmode.mesh.generation import generate_box_mesh, generate_icosphere
+    from meshmode.mesh.processing import affine_map
+    from meshmode.discretization import Discretization
+    from meshmode.discretization.poly_element import \
+            InterpolatoryQuadratureSimplexGroupFactory
+    from pytools.obj_array import make_obj_array
+
+    order = 4
+    actx = NumpyArrayContext()
+
+    def make_discr(mesh):
+        return Discretization(actx, mesh,
+                InterpolatoryQuadratureSimplexGroupFactory(order))
+
+    # {{{ volume: polynomials are differentiated exactly
+
+    A = np.array([[2, 0.5, 0], [0, 1, 0.25], [0.1, 0, 3]])
+    for dim in [2, 3]:
+        mesh = affine_map(
+                generate_box_mesh([np.linspace(0, 1, 3)]*dim, order=1),
+                A=A[:dim, :dim], b=np.zeros(dim))
+        discr = make_discr(mesh)
+        x = discr.nodes()
+
+        f = x[0]**2 * x[1] + x[dim-1]**3
+        grad_f = np.zeros((dim, discr.nnodes))
+        grad_f[0] += 2*x[0]*x[1]
+        grad_f[1] += x[0]**2
+        grad_f[dim-1] += 3*x[dim-1]**2
+
+        assert la.norm((discr.grad(None, f) - grad_f).ravel(), np.inf) < 1e-10
+
+        v = make_obj_array([x[i]*x[(i+1) % dim] for i in range(dim)])
+        div_v = sum(x[(i+1) % dim] for i in range(dim))
+        assert la.norm(discr.div(None, v) - div_v, np.inf) < 1e-10
+        assert la.norm(discr.div(None, np.array(list(v))) - div_v,
+                np.inf) < 1e-10
+
+    # }}}
+
+    # {{{ surface: tangential gradient
+
+    mesh = generate_icosphere(1, order, nrefinements=1)
+    discr = make_discr(mesh)
+    x = discr.nodes()
+    normals = x / la.norm(x, axis=0)
+
+    surf_grad_z = np.eye(3)[2][:, np.newaxis] - normals * normals[2]
+    assert la.norm((discr.grad(None, x[2]) - surf_grad_z).ravel(),
+            np.inf) < 1e-2
+
+    # surface divergence of the position vector is 2/r on the unit sphere
+    assert la.norm(discr.div(None, x) - 2, np.inf) < 1e-2
+
+    # }}}
+
+
+def test_integral_and_norm():
+    from meshmode.array_context import NumpyArrayContext
+    from meshmode.mesh.generation import generate_box_mesh, generate_icosphere
+    from meshmode.discretization import Discretization
+    from meshmode.discretization.poly_element import \
+            InterpolatoryQuadratureSimplexGroupFactory
+    from pytools.obj_array import make_obj_array
+
+    order = 4
+    actx = NumpyArrayContext()
+
+    mesh = generate_box_mesh([np.linspace(0, 2, 5), np.linspace(0, 1, 3)])
+    discr = Discretization(actx, mesh,
+            InterpolatoryQuadratureSimplexGroupFactory(order))
+    x = discr.nodes()
+
+    # exact for polynomials
+    assert abs(discr.integral(None, x[0]*x[1]**2) - 2/3) < 1e-12
+    assert abs(discr.norm(None, x[0]) - np.sqrt(8/3)) < 1e-12
+    assert abs(discr.norm(None, x[0] - 1, p=1) - 1) < 1e-12
+    # nodal maximum
+    assert discr.norm(None, -x[0], p=np.inf) == np.max(x[0])
+
+    fields = [x[0], x[1]**2, 1j*x[0]*x[1]]
+    integrals = [2, 2/3, 1j]
+    norms = [np.sqrt(8/3), np.sqrt(2/5), np.sqrt(8/9)]
+
+    for batch in [make_obj_array(fields), np.array(fields)]:
+        assert la.norm(discr.integral(None, batch) - integrals) < 1e-12
+        assert la.norm(discr.norm(None, batch) - norms) < 1e-12
+        assert la.norm(discr.norm(None, batch, np.inf)
+                - np.max(np.abs(fields), axis=-1)) < 1e-12
+
+    # surface area
+    mesh = generate_icosphere(1, order, nrefinements=1)
+    discr = Discretization(actx, mesh,
+            InterpolatoryQuadratureSimplexGroupFactory(order))
+    assert abs(discr.norm(None, 1 + 0*discr.nodes()[0])**2 - 4*np.pi) < 1e-3
+
+
+def _assemble_mass_matrix(discr, quad_order):
+    """Assemble the mass matrix of *discr* with a quadrature of order
+    *quad_order* and the area element computed from the mesh nodes at its
+    nodes.
+    """
+    import modepy as mp
+
+    mass = np.zeros((discr.nnodes, discr.nnodes))
+    for grp in discr.groups:
+        meg = grp.mesh_el_group
+        quad = mp.XiaoGimbutasSimplexQuadrature(quad_order, discr.dim)
+
+        mesh_vdm_inv = la.inv(mp.vandermonde(
+            mp.simplex_onb(meg.dim, meg.order), meg.unit_nodes))
+        mesh_diff_mats = [
+                np.dot(grad_vdm, mesh_vdm_inv)
+                for grad_vdm in mp.vandermonde(
+                    mp.grad_simplex_onb(meg.dim, meg.order), quad.nodes)]
+
+        # ambient_dim, dim, nelements, nquad_nodes
+        jacobian = np.array([
+            [np.dot(meg.nodes[iaxis], diff_mat.T)
+                for diff_mat in mesh_diff_mats]
+            for iaxis in range(discr.ambient_dim)])
+        area_element = np.abs(la.det(jacobian.transpose(2, 3, 0, 1)))
+
+        interp = mp.resampling_matrix(grp.basis(), quad.nodes, grp.unit_nodes)
+
+        for iel in range(grp.nelements):
+            nodes = grp.node_nr_base + iel*grp.nunit_nodes + np.arange(
+                    grp.nunit_nodes)
+            mass[np.ix_(nodes, nodes)] = np.dot(
+                    interp.T * (quad.weights * area_element[iel]), interp)
+
+    return mass
+
+
+def test_mass_matrix():
+    from meshmode.array_context import NumpyArrayContext
+    from meshmode.mesh import Mesh
+    from meshmode.mesh.generation import generate_box_mesh, generate_icosphere
+    from meshmode.mesh.processing import affine_map
+    from meshmode.discretization import Discretization
+    from meshmode.discretization.poly_element import \
+            PolynomialWarpAndBlendGroupFactory
+
+    order = 3
+    actx = NumpyArrayContext()
+
+    def make_discr(mesh):
+        return Discretization(actx, mesh,
+                PolynomialWarpAndBlendGroupFactory(order))
+
+    mesh = affine_map(
+            generate_box_mesh([np.linspace(0, 1, 4)]*2),
+            A=np.array([[2, 0.5], [0, 1]]), b=np.zeros(2))
+    discr = make_discr(mesh)
+    x = discr.nodes()
+
+    u = x[0]**2 + x[1]
+    v = np.sin(x[0]) * x[1]
+    mass_u = discr.apply_mass(None, u)
+
+    # sum of M u is the integral of u, M is symmetric
+    assert abs(np.sum(mass_u) - discr.integral(None, u)) < 1e-12
+    assert abs(np.dot(v, mass_u) - np.dot(u, discr.apply_mass(None, v))) < 1e-12
+
+    for vec in [u, np.array([u, v])]:
+        assert la.norm(
+                (discr.apply_inverse_mass(None, discr.apply_mass(None, vec))
+                    - vec).ravel(), np.inf) < 1e-12
+
+    # {{{ curved elements
+
+    # Move the nodes off the grid lines (and hence the vertices) of a
+    # quadratic box mesh, which curves the diagonal element edges.
+    mesh = generate_box_mesh([np.linspace(0, 1, 4)]*2, order=2)
+    grp, = mesh.groups
+    displacement = 0.05 * (
+            np.sin(3*np.pi*grp.nodes[0]) * np.sin(3*np.pi*grp.nodes[1]))
+    mesh = Mesh(mesh.vertices, [grp.copy(
+        nodes=grp.nodes + np.array([displacement, -displacement/2]))])
+
+    discr = make_discr(mesh)
+    identity = np.eye(discr.nnodes)
+
+    # applied to the unit vectors, these give the transposed matrices
+    mass = discr.apply_mass(None, identity).T
+    inv_mass = discr.apply_inverse_mass(None, identity).T
+    ref_mass = _assemble_mass_matrix(discr, 2*order + 4)
+
+    assert la.norm(mass - mass.T) < 1e-13 * la.norm(mass)
+    assert la.norm(inv_mass - inv_mass.T) < 1e-13 * la.norm(inv_mass)
+
+    # the area element has degree 2 and is interpolated exactly
+    assert la.norm(mass - ref_mass) < 1e-13 * la.norm(ref_mass)
+
+    # The weight-adjusted inverse is approximate on curved elements, but
+    # accurate when applied to smooth data.
+    ref_inv_mass = la.inv(ref_mass)
+    assert 1e-6 < (la.norm(inv_mass - ref_inv_mass)
+            / la.norm(ref_inv_mass)) < 5e-2
+
+    x = discr.nodes()
+    u = np.sin(2*x[0]) * np.cos(x[1])
+    assert la.norm(np.dot(inv_mass, np.dot(ref_mass, u)) - u, np.inf) < 2e-3
+
+    # }}}
+
+    # surface
+    discr = make_discr(generate_icosphere(1, order, nrefinements=1))
+    ones = 1 + 0*discr.nodes()[0]
+    assert abs(np.sum(discr.apply_mass(None, ones))
+            - discr.integral(None, ones)) < 1e-10
+
+
+def test_autotuned_kernels(ctx_getter, tmpdir):
+    cl_ctx = ctx_getter()
+    queue = cl.CommandQueue(cl_ctx)
+
+    from meshmode.array_context import PyOpenCLArrayContext
+    from meshmode.mesh.generation import generate_box_mesh
+    from meshmode.discretization import Discretization
+    from meshmode.discretization.poly_element import (
+            InterpolatoryQuadratureSimplexGroupFactory,
+            PolynomialWarpAndBlendGroupFactory)
+    from meshmode.discretization.connection import make_same_mesh_connection
+
+    mesh = generate_box_mesh([np.linspace(0, 1, 6)]*2, order=1)
+
+    def compute(actx):
+        discr = Discretization(actx, mesh,
+                InterpolatoryQuadratureSimplexGroupFactory(1))
+        vis_discr = Discretization(actx, mesh,
+                PolynomialWarpAndBlendGroupFactory(2))
+        connection = make_same_mesh_connection(queue, vis_discr, discr)
+
+        x = discr.nodes()[0].with_queue(queue)
+        return [
+                discr.num_reference_derivative(queue, (0,), x).get(),
+                connection(queue, x).get(),
+                ]
+
+    reference = compute(PyOpenCLArrayContext(cl_ctx, persistent_cache=False))
+
+    tuned_variants = []
+    for i in range(2):
+        actx = PyOpenCLArrayContext(cl_ctx, cache_dir=str(tmpdir),
+                autotune=True)
+        results = compute(actx)
+        for ref_result, result in zip(reference, results):
+            assert la.norm(ref_result - result) < 1e-13
+
+        assert actx._tuned_variants
+        tuned_variants.append(actx._tuned_variants)
+
+    # the second context found the tuning results on disk
+    assert tuned_variants[0] == tuned_variants[1]
+
+
+def test_memory_pool(ctx_getter):
+    cl_ctx = ctx_getter()
+    queue = cl.CommandQueue(cl_ctx)
+
+    from meshmode.mesh.generation import generate_box_mesh
+    from meshmode.discretization import Discretization
+    from meshmode.discretization.poly_element import \
+            InterpolatoryQuadratureSimplexGroupFactory
+
+    mesh = generate_box_mesh([np.linspace(0, 1, 6)]*2, order=1)
+    group_factory = InterpolatoryQuadratureSimplexGroupFactory(2)
+
+    discr = Discretization(cl_ctx, mesh, group_factory)
+    assert discr.memory_pool_statistics is None
+    pooled_discr = Discretization(cl_ctx, mesh, group_factory,
+            memory_pool=True)
+
+    x = discr.nodes()[0].with_queue(queue)
+    ref_result = discr.num_reference_derivative(queue, (0,), x).get()
+
+    def run():
+        return pooled_discr.num_reference_derivative(queue, (0,), x).get()
+
+    assert la.norm(run() - ref_result) < 1e-13
+
+    stats = pooled_discr.memory_pool_statistics
+    nallocations = stats.nallocations
+    peak_bytes = stats.peak_bytes
+
+    # the freed result of the first run is handed out again
+    assert la.norm(run() - ref_result) < 1e-13
+    assert stats.nallocations == nallocations + 1
+    assert stats.nreused >= 1
+    assert stats.reused_bytes >= x.nbytes
+    assert stats.peak_bytes == peak_bytes
+
+
+@pytest.mark.parametrize("fuse_groups", [False, True])
+def test_out_arguments(fuse_groups):
+    from meshmode.array_context import NumpyArrayContext
+    from meshmode.mesh.generation import generate_box_mesh
+    from meshmode.discretization import Discretization
+    from meshmode.discretization.poly_element import (
+            InterpolatoryQuadratureSimplexGroupFactory,
+            PolynomialWarpAndBlendGroupFactory)
+    from meshmode.discretization.connection import make_same_mesh_connection
+    from pytools.obj_array import make_obj_array
+
+    actx = NumpyArrayContext()
+    mesh = generate_box_mesh([np.linspace(-1, 1, 4)]*2, order=1)
+    discr = Discretization(actx, mesh,
+            InterpolatoryQuadratureSimplexGroupFactory(2),
+            fuse_groups=fuse_groups)
+    vis_discr = Discretization(actx, mesh,
+            PolynomialWarpAndBlendGroupFactory(3),
+            fuse_groups=fuse_groups)
+    connection = make_same_mesh_connection(None, vis_discr, discr)
+
+    x = discr.nodes()
+
+    out = discr.empty(x.dtype, extra_dims=(2,))
+    result = discr.num_reference_derivative(None, (0,), x, out=out)
+    assert result is out
+    assert la.norm(
+            (out - discr.num_reference_derivative(None, (0,), x)).ravel(),
+            np.inf) < 1e-12
+
+    out = discr.empty(discr.real_dtype)
+    assert discr.quad_weights(None, out=out) is out
+    assert la.norm(out - discr.quad_weights(None), np.inf) < 1e-12
+
+    obj_out = make_obj_array([vis_discr.empty(x.dtype) for i in range(2)])
+    result = connection(None, make_obj_array([x[0], x[1]]), out=obj_out)
+    for i in range(2):
+        assert result[i] is obj_out[i]
+        assert la.norm(obj_out[i] - connection(None, x[i]), np.inf) < 1e-12
+
+    with pytest.raises(ValueError):
+        connection(None, x[0], out=discr.empty(x.dtype))
+    f = discr.empty(x.dtype, extra_dims=(2,))
+    for f_out in [f, f[:], f.reshape(2, -1)]:
+        with pytest.raises(ValueError):
+            discr.num_reference_derivative(None, (0,), f, out=f_out)
+    with pytest.raises(ValueError):
+        connection(None, vis_discr.nodes()[0], out=vis_discr.nodes()[0][:])
+    with pytest.raises(ValueError):
+        connection(None, x[0], out=vis_discr.empty(np.float32))
+    with pytest.raises(TypeError):
+        discr.quad_weights(None, out=list(discr.quad_weights(None)))
+
+
+def test_out_arguments_sharing_memory_cl(ctx_getter):
+    cl_ctx = ctx_getter()
+    queue = cl.CommandQueue(cl_ctx)
+
+    from meshmode.array_context import PyOpenCLArrayContext
+    from meshmode.mesh.generation import generate_box_mesh
+    from meshmode.discretization import Discretization
+    from meshmode.discretization.poly_element import (
+            InterpolatoryQuadratureSimplexGroupFactory)
+
+    actx = PyOpenCLArrayContext(cl_ctx, persistent_cache=False)
+    mesh = generate_box_mesh([np.linspace(-1, 1, 4)]*2, order=1)
+    discr = Discretization(actx, mesh,
+            InterpolatoryQuadratureSimplexGroupFactory(2))
+
+    f = discr.empty(discr.real_dtype, queue=queue, extra_dims=(3,))
+    assert actx.shares_memory(f, f[1:])
+    assert actx.shares_memory(f[1], f.reshape(-1)[discr.nnodes:])
+    assert not actx.shares_memory(f[0], f[1])
+    assert not actx.shares_memory(f, discr.empty(discr.real_dtype))
+
+    with pytest.raises(ValueError):
+        discr.num_reference_derivative(queue, (0,), f[1], out=f[1][:])
+    with pytest.raises(ValueError):
+        discr.num_reference_derivative(queue, (0,), f[:2],
+                out=f.reshape(-1)[:2*discr.nnodes].reshape(2, -1))
+
+    out = f[1]
+    assert discr.num_reference_derivative(queue, (0,), f[0], out=out) is out
+
+
+def test_out_of_order_queue(ctx_getter):
+    cl_ctx = ctx_getter()
+    try:
+        ooo_queue = cl.CommandQueue(cl_ctx,
+                properties=cl.command_queue_properties
+                .OUT_OF_ORDER_EXEC_MODE_ENABLE)
+    except cl.Error:
+        pytest.skip("device does not support out-of-order queues")
+    queue = cl.CommandQueue(cl_ctx)
+
+    from meshmode.mesh.generation import generate_box_mesh
+    from meshmode.mesh.processing import affine_map, merge_dijsoint_meshes
+    from meshmode.discretization import Discretization
+    from meshmode.discretization.poly_element import (
+            InterpolatoryQuadratureSimplexGroupFactory,
+            PolynomialWarpAndBlendGroupFactory)
+    from meshmode.discretization.connection import make_same_mesh_connection
+
+    box = generate_box_mesh([np.linspace(0, 1, 5)]*2, order=1)
+    mesh = merge_dijsoint_meshes([
+        box, affine_map(box, A=np.eye(2), b=np.array([2., 0]))])
+
+    discr = Discretization(cl_ctx, mesh,
+            InterpolatoryQuadratureSimplexGroupFactory(2))
+    vis_discr = Discretization(cl_ctx, mesh,
+            PolynomialWarpAndBlendGroupFactory(3))
+    connection = make_same_mesh_connection(queue, vis_discr, discr)
+
+    x = discr.nodes()[0]
+
+    def compute(queue, wait_for=None):
+        dx = discr.num_reference_derivative(queue, (0,), x, wait_for=wait_for)
+        vis_dx = connection(queue, dx)
+        return dx, vis_dx, discr.integral(queue, dx)
+
+    ref_dx, ref_vis_dx, ref_integral = compute(queue)
+
+    # nothing may start before the user event is complete
+    user_evt = cl.UserEvent(cl_ctx)
+    dx = discr.num_reference_derivative(ooo_queue, (0,), x,
+            wait_for=[user_evt])
+    vis_dx = connection(ooo_queue, dx)
+    assert dx.events and vis_dx.events
+    user_evt.set_status(cl.command_execution_status.COMPLETE)
+
+    assert la.norm(dx.get(ooo_queue) - ref_dx.get(queue)) < 1e-13
+    assert la.norm(vis_dx.get(ooo_queue) - ref_vis_dx.get(queue)) < 1e-13
+
+    _, _, integral = compute(ooo_queue)
+    assert abs(integral - ref_integral) < 1e-13
+
+
+def test_single_precision():
+    from meshmode.array_context import NumpyArrayContext
+    from meshmode.mesh.generation import generate_box_mesh
+    from meshmode.discretization import Discretization
+    from meshmode.discretization.poly_element import (
+            InterpolatoryQuadratureSimplexGroupFactory,
+            PolynomialWarpAndBlendGroupFactory)
+    from meshmode.discretization.connection import (
+            make_same_mesh_connection, make_boundary_restriction)
+
+    actx = NumpyArrayContext()
+    mesh = generate_box_mesh([np.linspace(-1, 1, 4)]*2, order=2)
+    group_factory = InterpolatoryQuadratureSimplexGroupFactory(3)
+
+    results = {}
+    for real_dtype in [np.float64, np.float32]:
+        discr = Discretization(actx, mesh, group_factory,
+                real_dtype=real_dtype)
+        vis_discr = Discretization(actx, mesh,
+                PolynomialWarpAndBlendGroupFactory(4), real_dtype=real_dtype)
+        connection = make_same_mesh_connection(None, vis_discr, discr)
+        _, bdry_discr, bdry_connection = make_boundary_restriction(
+                None, discr, group_factory)
+
+        x = discr.nodes()
+        f = np.sin(x[0]) * x[1]
+
+        results[real_dtype] = [
+                x,
+                discr.quad_weights(None),
+                discr.area_element(),
+                discr.inverse_jacobian(),
+                discr.num_reference_derivative(None, (0,), f),
+                discr.grad(None, f),
+                discr.apply_mass(None, f),
+                connection(None, f),
+                bdry_connection(None, f),
+                ]
+
+        for ary in results[real_dtype]:
+            assert ary.dtype == real_dtype
+
+        assert bdry_discr.real_dtype == real_dtype
+
+    for ary64, ary32 in zip(results[np.float64], results[np.float32]):
+        assert la.norm((ary64 - ary32).ravel(), np.inf) \
+                < 1e-5 * la.norm(ary64.ravel(), np.inf)
+
+
 def test_element_orientation():
     from meshmode.mesh.io import generate_gmsh, FileSource
 